@@ -0,0 +1,53 @@
+import random
+from datetime import datetime, timedelta
+
+CATEGORIES = ["work", "home", "errands", "health", "finance", "study", "garden", "travel", "family", ""]
+TAGS = ["urgent", "later", "phone", "email", "waiting", "quick", "deep", "weekly", "review", "idea",
+        "meeting", "bug", "docs", "shopping", "fitness"]
+WORDS = ("report call email buy fix write review plan book pay clean order schedule check update "
+         "prepare send draft read answer renew cancel meeting invoice dentist groceries milk car "
+         "garden budget project slides notes ticket flight hotel gift birthday doctor backup server "
+         "deploy release design client contract taxes insurance laundry kitchen paint repair").split()
+
+# Fixed reference time, so a seed always produces the same tasks
+BASE_TIME = datetime(2025, 1, 1, 9, 0, 0)
+
+def _text(rng, min_words, max_words):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words)))
+
+def make_task(rng, i):
+    """Build one realistic task dict from a random generator"""
+    created = BASE_TIME - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+    done = rng.random() < 0.4
+    updated = created + timedelta(minutes=rng.randint(0, 30 * 24 * 60)) if done else created
+    due_date = None
+    if rng.random() < 0.6:
+        due_date = (BASE_TIME.date() + timedelta(days=rng.randint(-60, 120))).isoformat()
+    # Mostly short descriptions, a few long ones
+    description = "" if rng.random() < 0.3 else _text(rng, 3, 12 if rng.random() < 0.9 else 120)
+    return {
+        "id": f"{i:08x}{rng.getrandbits(96):024x}",
+        "title": _text(rng, 2, 6).capitalize(),
+        "done": done,
+        "description": description,
+        "priority": rng.choices(["high", "medium", "low"], weights=[2, 5, 3])[0],
+        "category": rng.choice(CATEGORIES),
+        "due_date": due_date,
+        "tags": rng.sample(TAGS, rng.choices([0, 1, 2, 3], weights=[4, 3, 2, 1])[0]),
+        "created_at": created.isoformat(),
+        "updated_at": updated.isoformat()
+    }
+
+def make_tasks(count, seed=0):
+    """
+    Generate a reproducible task list
+
+    Args:
+        count: Number of tasks
+        seed: Random seed; the same seed and count give the same tasks
+
+    Returns:
+        List of task dicts (in the format storage.validate_task produces)
+    """
+    rng = random.Random(seed)
+    return [make_task(rng, i) for i in range(count)]
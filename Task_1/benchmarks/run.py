@@ -0,0 +1,215 @@
+"""
+Benchmarks for core.tasks and core.storage
+
+Run from the Task_1 directory:
+
+    python -m benchmarks.run --sizes 1000,10000,100000 --output results.json
+    python -m benchmarks.run --sizes 1000,10000 --compare results.json
+
+Every operation is timed on a reproducible task list (benchmarks/generate.py)
+of each size; the best and median of --repeat runs are reported, plus the
+peak memory of one extra run traced with tracemalloc. Results are written
+as JSON so runs can be compared.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.generate import make_tasks
+from core import storage, tasks
+from core.store import TaskStore
+
+BACKENDS = ("json", "journal", "columnar", "sqlite")
+
+def _core_operations(task_list):
+    """(name, function) pairs for the in-memory operations, on a list and on a store"""
+    store = TaskStore(task_list)
+    # Build the lazy indexes once, so queries measure lookups, not builds
+    store.token_index()
+    store.field_index()
+    store.sorted_view("due_date")
+    store.statistics()
+    return [
+        ("store.build", lambda: TaskStore(task_list)),
+        ("store.token_index.build", lambda: TaskStore(task_list).token_index()),
+        ("list.filter.pending", lambda: tasks.filter_tasks(task_list, "pending")),
+        ("list.filter.overdue", lambda: tasks.filter_tasks(task_list, "overdue")),
+        ("list.filter.search", lambda: tasks.filter_tasks(task_list, "all", "invoice")),
+        ("list.sort.due_date", lambda: tasks.sort_tasks(task_list, "due_date")),
+        ("list.search.exact", lambda: tasks.search_tasks(task_list, "dentist")),
+        ("store.filter.pending", lambda: tasks.filter_tasks(store, "pending")),
+        ("store.filter.overdue", lambda: tasks.filter_tasks(store, "overdue")),
+        ("store.filter.search", lambda: tasks.filter_tasks(store, "all", "invoice")),
+        ("store.filter.category", lambda: tasks.filter_tasks(store, "pending", category="work")),
+        ("store.sort.due_date", lambda: tasks.sort_tasks(store, "due_date")),
+        ("store.search.exact", lambda: tasks.search_tasks(store, "dentist")),
+        ("store.search.fuzzy", lambda: tasks.search_tasks(store, "dentsit", mode="fuzzy")),
+        ("store.search.ranked", lambda: tasks.search_tasks(store, "invoice client", mode="ranked", limit=20)),
+        ("store.statistics", lambda: store.statistics().snapshot()),
+    ]
+
+def _use_backend(backend, directory):
+    """Point core.storage at an empty directory with the given backend"""
+    storage.DATA_DIR = directory
+    storage.FILE_PATH = os.path.join(directory, "todo.json")
+    storage.JOURNAL_PATH = os.path.join(directory, "todo.journal")
+    storage.DB_PATH = os.path.join(directory, "todo.db")
+    storage.BACKUP_DIR = os.path.join(directory, "backup")
+    storage.COLUMNAR_PATH = os.path.join(directory, "todo.col")
+    storage.STORAGE_BACKEND = backend
+    storage.invalidate_cache()
+    # The journal keeps its sequence numbers per file
+    from core import journal
+    journal._seq = None
+    journal._compacted_seq = 0
+
+def _storage_operations(task_list, backend):
+    """(name, function) pairs for a save/load round trip with one backend"""
+    def save():
+        assert storage.save_tasks(task_list)
+
+    def load():
+        # Measure parsing, not the parse cache
+        storage.invalidate_cache()
+        return storage.load_tasks()
+
+    return [(f"storage.{backend}.save", save), (f"storage.{backend}.load", load)]
+
+def measure(function, repeat, memory=True):
+    """
+    Time a function
+
+    Returns:
+        Dict with the best and median seconds of `repeat` runs and the
+        peak traced memory (bytes) of one more run
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    result = {"best": min(times), "median": statistics.median(times)}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            function()
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+def run(sizes, repeat=3, seed=0, backends=BACKENDS, only=None, memory=True, log=print):
+    """
+    Run the benchmarks
+
+    Args:
+        sizes: Task list sizes
+        repeat: Timed runs per operation
+        seed: Generator seed
+        backends: Storage backends to round-trip
+        only: Run only operations whose name contains this text
+        memory: Also record peak memory
+
+    Returns:
+        List of result dicts (size, operation, best, median, peak_bytes)
+    """
+    results = []
+
+    def record(size, name, function):
+        if only and only not in name:
+            return
+        result = {"size": size, "operation": name, **measure(function, repeat, memory)}
+        results.append(result)
+        peak = f"  peak {result['peak_bytes'] / 1e6:8.1f} MB" if "peak_bytes" in result else ""
+        log(f"{size:>9} {name:<28} best {result['best'] * 1000:10.2f} ms  "
+            f"median {result['median'] * 1000:10.2f} ms{peak}")
+
+    saved = {name: getattr(storage, name) for name in
+             ("DATA_DIR", "FILE_PATH", "JOURNAL_PATH", "DB_PATH", "BACKUP_DIR", "COLUMNAR_PATH", "STORAGE_BACKEND")}
+    try:
+        for size in sizes:
+            task_list = make_tasks(size, seed)
+            for name, function in _core_operations(task_list):
+                record(size, name, function)
+            for backend in backends:
+                with tempfile.TemporaryDirectory() as directory:
+                    _use_backend(backend, directory)
+                    for name, function in _storage_operations(task_list, backend):
+                        record(size, name, function)
+                    if backend == "sqlite":
+                        from core import sqlite_store
+                        sqlite_store.close()
+    finally:
+        for name, value in saved.items():
+            setattr(storage, name, value)
+        storage.invalidate_cache()
+    return results
+
+def compare(results, baseline):
+    """
+    Compare results with an earlier run
+
+    Returns:
+        List of (size, operation, baseline best, best, ratio) for the
+        operations present in both
+    """
+    previous = {(r["size"], r["operation"]): r for r in baseline["results"]}
+    rows = []
+    for result in results:
+        before = previous.get((result["size"], result["operation"]))
+        if before is not None and before["best"] > 0:
+            rows.append((result["size"], result["operation"], before["best"], result["best"],
+                         result["best"] / before["best"]))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark core.tasks and core.storage")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma-separated task list sizes (e.g. 1000,10000,100000,1000000)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per operation")
+    parser.add_argument("--seed", type=int, default=0, help="task generator seed")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="storage backends to round-trip")
+    parser.add_argument("--only", help="run only operations whose name contains this text")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced peak-memory run")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file for the results")
+    parser.add_argument("--compare", help="earlier results file to compare with")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    backends = [backend for backend in args.backends.split(",") if backend]
+    results = run(sizes, args.repeat, args.seed, backends, args.only, not args.no_memory)
+
+    report = {
+        "meta": {
+            "time": datetime.now().isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare} (ratio > 1 is slower):")
+        for size, name, before, after, ratio in compare(results, baseline):
+            print(f"{size:>9} {name:<28} {before * 1000:10.2f} ms -> {after * 1000:10.2f} ms  x{ratio:.2f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+# Lets pytest import the core, ui and benchmarks packages from this directory
@@ -0,0 +1,211 @@
+from array import array
+from datetime import date
+
+from core.model import PRIORITY_CODES, Task, encode_due, encode_time
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; only this module needs it
+    np = None
+
+DAY_MICROS = 86400 * 1000000
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Placeholder for timestamps that aren't valid ISO times
+NO_TIME = -(2 ** 63)
+
+COMPLETION_BINS = (0, 1, 2, 7, 14, 30, 90)
+AGE_BINS = (0, 7, 30, 90, 365)
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("core.analytics needs numpy (pip install numpy)")
+
+class TaskColumns:
+    """
+    The fields analytics need, one NumPy array per field
+
+    Built once from a task list or store (one pass over the tasks) or
+    straight from a columnar snapshot (the columns are read in place, only
+    rows with extras are decoded). Times are epoch microseconds (NO_TIME if
+    unknown), due dates day ordinals (<= 0 without one), priorities codes
+    as in core.model (-1 for other values) and categories indexes into
+    `categories`.
+    """
+
+    def __init__(self, created, updated, due, done, priority, category, categories):
+        _require_numpy()
+        self.created = created
+        self.updated = updated
+        self.due = due
+        self.done = done
+        self.priority = priority
+        self.category = category
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.done)
+
+    @classmethod
+    def from_tasks(cls, tasks):
+        """Load the columns from task dicts, Task objects or a TaskStore"""
+        _require_numpy()
+        created, updated = array("q"), array("q")
+        due, priority, category = array("i"), array("b"), array("i")
+        done = bytearray()
+        codes = {}
+        for task in tasks:
+            if isinstance(task, Task):
+                created.append(task.created if task.created is not None else NO_TIME)
+                updated.append(task.updated if task.updated is not None else NO_TIME)
+                due.append(max(task.due, 0))
+                priority.append(task.priority if task.priority >= 0 else -1)
+            else:
+                for column, field in ((created, "created_at"), (updated, "updated_at")):
+                    micros = encode_time(task.get(field))
+                    column.append(micros if micros is not None else NO_TIME)
+                due.append(max(encode_due(task.get("due_date")) or 0, 0))
+                priority.append(PRIORITY_CODES.get(task.get("priority"), -1))
+            done.append(task["done"] is True)
+            category.append(codes.setdefault(str(task.get("category", "")), len(codes)))
+        return cls(np.array(created, dtype=np.int64), np.array(updated, dtype=np.int64),
+                   np.array(due, dtype=np.int32), np.frombuffer(bytes(done), dtype=np.bool_).copy(),
+                   np.array(priority, dtype=np.int8), np.array(category, dtype=np.int32), list(codes))
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Load the columns from an open core.columnar.ColumnarSnapshot"""
+        _require_numpy()
+        count = len(snapshot)
+        done = np.unpackbits(np.frombuffer(snapshot.done, dtype=np.uint8), bitorder="little")[:count]
+        priority = np.frombuffer(snapshot.priority, dtype=np.uint8)[:count].astype(np.int8)
+        priority[priority > 2] = -1
+        string_ids, category = np.unique(np.asarray(snapshot.category, dtype=np.uint32), return_inverse=True)
+        columns = cls(np.array(snapshot.created, dtype=np.int64), np.array(snapshot.updated, dtype=np.int64),
+                      np.maximum(np.asarray(snapshot.due, dtype=np.int32), 0), done.astype(np.bool_),
+                      priority, category.astype(np.int32),
+                      [snapshot.string(int(string_id)) for string_id in string_ids])
+        # Values the columns couldn't encode live in the extras section
+        for row in snapshot.extras:
+            columns._set_row(row, snapshot.task(row))
+        return columns
+
+    def _set_row(self, row, task):
+        """Overwrite one row from a decoded task dict"""
+        for column, field in ((self.created, "created_at"), (self.updated, "updated_at")):
+            micros = encode_time(task.get(field))
+            column[row] = micros if micros is not None else NO_TIME
+        self.due[row] = max(encode_due(task.get("due_date")) or 0, 0)
+        self.done[row] = task["done"] is True
+        self.priority[row] = PRIORITY_CODES.get(task.get("priority"), -1)
+        name = str(task.get("category", ""))
+        if name not in self.categories:
+            self.categories.append(name)
+        self.category[row] = self.categories.index(name)
+
+    def days(self, times):
+        """Convert a time column to day ordinals (0 where unknown)"""
+        return np.where(times == NO_TIME, 0, times // DAY_MICROS + EPOCH_ORDINAL)
+
+def _bucket_labels(edges):
+    """Labels for the buckets [edges[i], edges[i + 1]) and [edges[-1], inf)"""
+    labels = [f"{low}-{high}d" for low, high in zip(edges, edges[1:])]
+    return labels + [f"{edges[-1]}d+"]
+
+def _bucket_counts(values, edges):
+    """Count values per bucket (values below edges[0] are left out)"""
+    positions = np.searchsorted(np.asarray(edges, dtype=np.float64), values, side="right") - 1
+    counts = np.bincount(positions[positions >= 0], minlength=len(edges))
+    return dict(zip(_bucket_labels(edges), counts.tolist()))
+
+def completion_times(columns):
+    """
+    Days from creation to completion of every completed task
+
+    A task's updated_at is taken as its completion time (the last change
+    of a done task is usually marking it done).
+
+    Returns:
+        Float array of days
+    """
+    known = columns.done & (columns.created != NO_TIME) & (columns.updated != NO_TIME)
+    return (columns.updated[known] - columns.created[known]) / DAY_MICROS
+
+def completion_time_histogram(columns, edges=COMPLETION_BINS):
+    """
+    Distribution of completion times
+
+    Returns:
+        Dict of bucket label ("0-1d", ..., "90d+") -> number of tasks
+    """
+    return _bucket_counts(completion_times(columns), edges)
+
+def daily_counts(columns):
+    """
+    Tasks created and completed per day
+
+    Returns:
+        Dict {"created": {YYYY-MM-DD: count}, "completed": {...}}
+    """
+    created = columns.days(columns.created)
+    completed = columns.days(columns.updated)[columns.done]
+    result = {}
+    for name, days in (("created", created), ("completed", completed)):
+        values, counts = np.unique(days[days > 0], return_counts=True)
+        result[name] = {date.fromordinal(int(day)).isoformat(): int(count) for day, count in zip(values, counts)}
+    return result
+
+def burndown(columns, start=None, end=None):
+    """
+    Open tasks per category at the end of each day
+
+    A task is open from the day it was created until the day it was
+    completed. Tasks created before `start` count as created on `start`.
+
+    Args:
+        start: First day (date; default: the earliest creation day)
+        end: Last day (date; default: today)
+
+    Returns:
+        Tuple (list of YYYY-MM-DD days, dict of category -> list of open counts)
+    """
+    created = columns.days(columns.created)
+    known = created > 0
+    end = (end or date.today()).toordinal()
+    if start is None:
+        start = int(created[known].min()) if known.any() else end
+    else:
+        start = start.toordinal()
+    span = max(end - start + 1, 0)
+    categories = len(columns.categories)
+    if span == 0 or categories == 0:
+        return [], {}
+
+    def per_day(days, mask):
+        # One bincount over (category, day) cells
+        mask = mask & (days <= end)
+        offsets = np.clip(days[mask], start, None) - start
+        cells = columns.category[mask].astype(np.int64) * span + offsets
+        return np.bincount(cells, minlength=categories * span).reshape(categories, span)
+
+    completed = columns.days(columns.updated)
+    opened = per_day(created, known)
+    closed = per_day(completed, known & columns.done & (completed > 0))
+    open_counts = np.cumsum(opened, axis=1) - np.cumsum(closed, axis=1)
+    days = [date.fromordinal(day).isoformat() for day in range(start, end + 1)]
+    return days, {name: open_counts[code].tolist() for code, name in enumerate(columns.categories)}
+
+def aging_buckets(columns, today=None, edges=AGE_BINS):
+    """
+    Age of the pending tasks
+
+    Args:
+        today: Date to measure from (default: today)
+
+    Returns:
+        Dict of bucket label ("0-7d", ..., "365d+") -> number of pending tasks
+    """
+    today = (today or date.today()).toordinal()
+    created = columns.days(columns.created)
+    pending = ~columns.done & (created > 0)
+    return _bucket_counts(today - created[pending], edges)
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import zlib
+from datetime import datetime
+
+from core import storage
+
+# Retention policy: the newest KEEP_LAST snapshots, plus the newest snapshot
+# of each of the last KEEP_HOURLY hours and KEEP_DAILY days
+KEEP_LAST = 10
+KEEP_HOURLY = 24
+KEEP_DAILY = 30
+
+# Content-defined chunking: a chunk ends after a task whose hash has its low
+# bits clear (about every 32 tasks), so inserting or editing a task only
+# changes the chunk around it and the other chunks are deduplicated
+CHUNK_MASK = 0x1F
+MAX_CHUNK_TASKS = 256
+
+def _objects_dir():
+    """Directory holding the compressed chunks"""
+    return os.path.join(storage.BACKUP_DIR, "objects")
+
+def _manifest_path():
+    """File listing the stored snapshots"""
+    return os.path.join(storage.BACKUP_DIR, "manifest.json")
+
+def _object_path(chunk_id):
+    """Path of a chunk, fanned out by hash prefix"""
+    return os.path.join(_objects_dir(), chunk_id[:2], chunk_id)
+
+def load_manifest():
+    """Load the list of stored snapshots, oldest first"""
+    try:
+        with open(_manifest_path(), "r", encoding='utf-8') as f:
+            return json.load(f).get("snapshots", [])
+    except (OSError, ValueError):
+        return []
+
+def _save_manifest(snapshots):
+    """Atomically replace the manifest"""
+    tmp_path = f"{_manifest_path()}.tmp"
+    with open(tmp_path, "w", encoding='utf-8') as f:
+        json.dump({"snapshots": snapshots}, f, indent=1)
+    os.replace(tmp_path, _manifest_path())
+
+def _split_chunks(tasks):
+    """Yield the serialized chunks of a task list"""
+    lines = []
+    for task in tasks:
+        line = json.dumps(task, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        lines.append(line)
+        if hashlib.sha1(line).digest()[0] & CHUNK_MASK == 0 or len(lines) >= MAX_CHUNK_TASKS:
+            yield b"\n".join(lines)
+            lines = []
+    if lines:
+        yield b"\n".join(lines)
+
+def _store_chunk(chunk):
+    """Store a chunk once, compressed, and return its content hash"""
+    chunk_id = hashlib.sha256(chunk).hexdigest()
+    path = _object_path(chunk_id)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(zlib.compress(chunk))
+        os.replace(tmp_path, path)
+    return chunk_id
+
+def snapshot(tasks, validated=False):
+    """
+    Back up a task list if it differs from the latest snapshot
+
+    Args:
+        tasks: List of tasks
+        validated: True if the tasks already went through storage.validate_tasks
+
+    Returns:
+        Snapshot id, or None if nothing changed
+    """
+    os.makedirs(_objects_dir(), exist_ok=True)
+    if not validated:
+        tasks = storage.validate_tasks(tasks)
+    chunk_ids = [_store_chunk(chunk) for chunk in _split_chunks(tasks)]
+    snapshot_id = hashlib.sha256("".join(chunk_ids).encode("ascii")).hexdigest()
+
+    snapshots = load_manifest()
+    if snapshots and snapshots[-1]["id"] == snapshot_id:
+        return None
+
+    snapshots.append({
+        "id": snapshot_id,
+        "time": datetime.now().isoformat(),
+        "total_tasks": len(tasks),
+        "chunks": chunk_ids
+    })
+    kept, pruned = apply_retention(snapshots)
+    _save_manifest(kept)
+    _delete_unreferenced(kept, pruned)
+    return snapshot_id
+
+def apply_retention(snapshots, now=None):
+    """
+    Split snapshots into (kept, pruned) according to the retention policy
+
+    Args:
+        snapshots: Snapshot records, oldest first
+        now: Reference time (defaults to the current time)
+
+    Returns:
+        Tuple (kept, pruned), both oldest first
+    """
+    now = now or datetime.now()
+    keep = set()
+    hours, days = set(), set()
+
+    newest_first = list(reversed(snapshots))
+    for position, record in enumerate(newest_first):
+        taken = datetime.fromisoformat(record["time"])
+        hour, day = taken.strftime("%Y%m%d%H"), taken.strftime("%Y%m%d")
+
+        if position < KEEP_LAST:
+            keep.add(position)
+        if hour not in hours and (now - taken).total_seconds() < KEEP_HOURLY * 3600:
+            keep.add(position)
+        if day not in days and (now.date() - taken.date()).days < KEEP_DAILY:
+            keep.add(position)
+        hours.add(hour)
+        days.add(day)
+
+    kept = [r for p, r in enumerate(newest_first) if p in keep]
+    pruned = [r for p, r in enumerate(newest_first) if p not in keep]
+    return list(reversed(kept)), list(reversed(pruned))
+
+def _delete_unreferenced(kept, pruned):
+    """Delete chunks only referenced by pruned snapshots"""
+    if not pruned:
+        return
+    referenced = {chunk_id for record in kept for chunk_id in record["chunks"]}
+    for record in pruned:
+        for chunk_id in record["chunks"]:
+            if chunk_id not in referenced:
+                try:
+                    os.remove(_object_path(chunk_id))
+                except OSError:
+                    pass
+                referenced.add(chunk_id)
+
+def restore(snapshot_id=None):
+    """
+    Rebuild the task list stored in a snapshot
+
+    Args:
+        snapshot_id: Snapshot to restore (defaults to the latest)
+
+    Returns:
+        List of tasks, or None if the snapshot does not exist
+    """
+    snapshots = load_manifest()
+    if snapshot_id is not None:
+        snapshots = [r for r in snapshots if r["id"] == snapshot_id]
+    if not snapshots:
+        return None
+
+    tasks = []
+    for chunk_id in snapshots[-1]["chunks"]:
+        with open(_object_path(chunk_id), "rb") as f:
+            chunk = zlib.decompress(f.read())
+        tasks.extend(json.loads(line) for line in chunk.split(b"\n"))
+    return tasks
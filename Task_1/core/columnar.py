@@ -0,0 +1,307 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import date
+
+from core import metrics, storage
+from core.model import (PRIORITY_CODES, PRIORITY_NAMES, TASK_FIELDS, decode_due, decode_time, encode_due,
+                        encode_time)
+
+# File layout (all offsets are from the start of the file):
+#   header   MAGIC, byte order, row count, string count, (offset, length) per section
+#   done     bitmap, one bit per task
+#   priority one byte per task (PRIORITY_CODES)
+#   due      int32 day ordinal per task (model.DUE_EMPTY / DUE_NONE, DUE_EXTRA)
+#   created  int64 microseconds since the epoch per task (TIME_EXTRA)
+#   updated  int64 microseconds since the epoch per task (TIME_EXTRA)
+#   id, title, description, category   uint32 string id per task
+#   tag offsets  uint32 per task + 1, into tag ids
+#   tag ids      uint32 string ids
+#   string offsets  uint32 per string + 1, into string data
+#   string data     UTF-8 bytes of the deduplicated string table
+#   extras   JSON {row: {field: value}} for values the columns can't encode
+MAGIC = b"TODOCOL2"
+SECTIONS = ["done", "priority", "due", "created", "updated", "id", "title", "description",
+            "category", "tag_offsets", "tag_ids", "string_offsets", "string_data", "extras"]
+HEADER = struct.Struct(f"<8sBII{2 * len(SECTIONS)}Q")
+
+PRIORITY_EXTRA = 255
+DUE_EXTRA = -2
+TIME_EXTRA = -(2 ** 63)
+
+_BYTE_ORDER = {"little": 0, "big": 1}[sys.byteorder]
+
+def write_snapshot(tasks, path, validated=False):
+    """
+    Write tasks to a columnar snapshot file
+
+    Args:
+        tasks: List of tasks
+        path: Destination file (written via a temp file and os.replace)
+        validated: True if the tasks already went through storage.validate_tasks
+    """
+    strings = {}
+
+    def intern(value):
+        if not isinstance(value, str):
+            return None
+        string_id = strings.get(value)
+        if string_id is None:
+            string_id = strings[value] = len(strings)
+        return string_id
+
+    # Id 0 is the empty string, also used as a placeholder for extras
+    intern("")
+    if not validated:
+        tasks = storage.validate_tasks(tasks)
+    count = len(tasks)
+    done = bytearray((count + 7) // 8)
+    priority = bytearray(count)
+    due = array("i")
+    created, updated = array("q"), array("q")
+    ids, title, description, category = array("I"), array("I"), array("I"), array("I")
+    tag_offsets, tag_ids = array("I", [0]), array("I")
+    extras = {}
+
+    for row, task in enumerate(tasks):
+        extra = {}
+
+        if task["done"] is True:
+            done[row >> 3] |= 1 << (row & 7)
+        elif task["done"] is not False:
+            extra["done"] = task["done"]
+
+        code = PRIORITY_CODES.get(task["priority"])
+        if code is None:
+            code = PRIORITY_EXTRA
+            extra["priority"] = task["priority"]
+        priority[row] = code
+
+        ordinal = encode_due(task["due_date"])
+        if ordinal is None:
+            ordinal = DUE_EXTRA
+            extra["due_date"] = task["due_date"]
+        due.append(ordinal)
+
+        for column, field in ((created, "created_at"), (updated, "updated_at")):
+            micros = encode_time(task[field])
+            if micros is None:
+                micros = TIME_EXTRA
+                extra[field] = task[field]
+            column.append(micros)
+
+        for column, field in ((ids, "id"), (title, "title"), (description, "description"),
+                              (category, "category")):
+            string_id = intern(task[field])
+            if string_id is None:
+                string_id = strings[""]
+                extra[field] = task[field]
+            column.append(string_id)
+
+        tag_string_ids = [intern(tag) for tag in task["tags"]]
+        if None in tag_string_ids:
+            tag_string_ids = []
+            extra["tags"] = task["tags"]
+        tag_ids.extend(tag_string_ids)
+        tag_offsets.append(len(tag_ids))
+
+        for field in task:
+            if field not in TASK_FIELDS:
+                extra[field] = task[field]
+
+        if extra:
+            extras[str(row)] = extra
+
+    string_offsets, string_data = array("I", [0]), bytearray()
+    for value in strings:
+        string_data += value.encode("utf-8")
+        string_offsets.append(len(string_data))
+
+    sections = [bytes(done), bytes(priority), due.tobytes(), created.tobytes(),
+                updated.tobytes(), ids.tobytes(), title.tobytes(), description.tobytes(), category.tobytes(),
+                tag_offsets.tobytes(), tag_ids.tobytes(), string_offsets.tobytes(),
+                bytes(string_data), json.dumps(extras, ensure_ascii=False).encode("utf-8")]
+
+    # Align every section to 8 bytes so it can be cast in place
+    layout, body, position = [], bytearray(), HEADER.size
+    for section in sections:
+        padding = -position % 8
+        body += b"\0" * padding
+        position += padding
+        layout += [position, len(section)]
+        body += section
+        position += len(section)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, _BYTE_ORDER, count, len(strings), *layout))
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    metrics.add("bytes_written", HEADER.size + len(body))
+    os.replace(tmp_path, path)
+
+class ColumnarSnapshot:
+    """Read-only, memory-mapped view of a columnar snapshot"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        metrics.add("bytes_read", len(self._mmap))
+        self._view = memoryview(self._mmap)
+
+        magic, byte_order, self.count, self.string_count, *layout = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"Not a columnar task snapshot: {path}")
+        self._swap = byte_order != _BYTE_ORDER
+        self._sections = {name: (layout[2 * i], layout[2 * i] + layout[2 * i + 1])
+                          for i, name in enumerate(SECTIONS)}
+
+        self.done = self._section("done")
+        self.priority = self._section("priority")
+        self.due = self._column("due", "i")
+        self.created = self._column("created", "q")
+        self.updated = self._column("updated", "q")
+        self.ids = self._column("id", "I")
+        self.title = self._column("title", "I")
+        self.description = self._column("description", "I")
+        self.category = self._column("category", "I")
+        self.tag_offsets = self._column("tag_offsets", "I")
+        self.tag_ids = self._column("tag_ids", "I")
+        self.string_offsets = self._column("string_offsets", "I")
+        self.string_data = self._section("string_data")
+        self._extras = None
+        self._strings = {}
+
+    def _section(self, name):
+        """Return the raw bytes of a section"""
+        start, end = self._sections[name]
+        return self._view[start:end]
+
+    def _column(self, name, typecode):
+        """Return a typed column, zero-copy when the byte order matches"""
+        raw = self._section(name)
+        if not self._swap:
+            return raw.cast(typecode)
+        column = array(typecode, raw.tobytes())
+        column.byteswap()
+        return column
+
+    @property
+    def extras(self):
+        """Per-row values stored outside the columns"""
+        if self._extras is None:
+            start, end = self._sections["extras"]
+            self._extras = {int(row): values for row, values in
+                            json.loads(bytes(self._view[start:end]).decode("utf-8")).items()}
+        return self._extras
+
+    def string(self, string_id):
+        """Decode one entry of the string table (each entry is decoded once)"""
+        value = self._strings.get(string_id)
+        if value is None:
+            start, end = self.string_offsets[string_id], self.string_offsets[string_id + 1]
+            value = self._strings[string_id] = str(self.string_data[start:end], "utf-8")
+        return value
+
+    def is_done(self, row):
+        """Return the done flag of a row, without decoding it"""
+        return bool(self.done[row >> 3] & (1 << (row & 7)))
+
+    def task(self, row):
+        """Decode a single task"""
+        due = self.due[row]
+        task = {
+            "id": self.string(self.ids[row]),
+            "title": self.string(self.title[row]),
+            "done": self.is_done(row),
+            "description": self.string(self.description[row]),
+            "priority": PRIORITY_NAMES.get(self.priority[row], "medium"),
+            "category": self.string(self.category[row]),
+            "due_date": decode_due(due) if due != DUE_EXTRA else None,
+            "tags": [self.string(self.tag_ids[i])
+                     for i in range(self.tag_offsets[row], self.tag_offsets[row + 1])],
+            "created_at": decode_time(self.created[row]) if self.created[row] != TIME_EXTRA else None,
+            "updated_at": decode_time(self.updated[row]) if self.updated[row] != TIME_EXTRA else None
+        }
+        task.update(self.extras.get(row, {}))
+        return task
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for row in range(self.count):
+            yield self.task(row)
+
+    def statistics(self):
+        """
+        Compute get_task_statistics() straight from the columns
+
+        Only rows with values in the extras section are decoded.
+
+        Returns:
+            Same dict as storage.get_task_statistics
+        """
+        extras = self.extras
+        today = date.today().toordinal()
+        completed = bin(int.from_bytes(self.done, "little")).count("1")
+        pending_by_priority = [0, 0, 0]
+        overdue = 0
+        done, priority, due = self.done, self.priority, self.due
+
+        for row in range(self.count):
+            if done[row >> 3] & (1 << (row & 7)) or row in extras:
+                continue
+            code = priority[row]
+            if code < 3:
+                pending_by_priority[code] += 1
+            # Same rule as get_task_statistics: due at midnight before now
+            if 0 < due[row] <= today:
+                overdue += 1
+
+        stats = {
+            "total": self.count,
+            "completed": completed,
+            "high_priority": pending_by_priority[PRIORITY_CODES["high"]],
+            "medium_priority": pending_by_priority[PRIORITY_CODES["medium"]],
+            "low_priority": pending_by_priority[PRIORITY_CODES["low"]],
+            "overdue": overdue
+        }
+
+        # Rows with extras: take the column-level done bit back out and count
+        # the fully decoded task instead
+        for row in extras:
+            stats["completed"] -= self.is_done(row)
+            extra_stats = storage.get_task_statistics([self.task(row)])
+            for key in ("completed", "high_priority", "medium_priority", "low_priority", "overdue"):
+                stats[key] += extra_stats[key]
+
+        stats["pending"] = stats["total"] - stats["completed"]
+        stats["completion_rate"] = (stats["completed"] / stats["total"] * 100) if stats["total"] > 0 else 0
+        return stats
+
+    def close(self):
+        """Release the memory map"""
+        for name in ("done", "priority", "due", "created", "updated", "ids", "title", "description",
+                     "category", "tag_offsets", "tag_ids", "string_offsets", "string_data"):
+            column = getattr(self, name, None)
+            if isinstance(column, memoryview):
+                column.release()
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def read_tasks(path):
+    """Decode every task of a snapshot into a list"""
+    with ColumnarSnapshot(path) as snapshot:
+        return list(snapshot)
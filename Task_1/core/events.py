@@ -0,0 +1,43 @@
+ADDED = "added"
+UPDATED = "updated"
+REMOVED = "removed"
+
+EVENT_KINDS = (ADDED, UPDATED, REMOVED)
+
+class TaskEvent:
+    """
+    One change to a task in a TaskStore, sent to its subscribers
+
+    Events are sent after the store has changed: `task` is the added or
+    updated task, or the task that was removed. For an update, `changes`
+    maps each field whose value changed to its (old, new) values, so a
+    subscriber can apply the delta without keeping its own copy.
+    """
+
+    __slots__ = ("kind", "task_id", "task", "changes", "rank")
+
+    def __init__(self, kind, task, changes=None, rank=None):
+        """
+        Args:
+            kind: ADDED, UPDATED or REMOVED
+            task: The task (for REMOVED, as it was when removed)
+            changes: For UPDATED, {field: (old value, new value)}
+            rank: Display rank of the task (for REMOVED, the one it had)
+        """
+        self.kind = kind
+        self.task_id = task["id"]
+        self.task = task
+        self.changes = changes or {}
+        self.rank = rank
+
+    def __repr__(self):
+        return f"TaskEvent({self.kind!r}, {self.task_id!r}, changes={sorted(self.changes)})"
+
+def diff(old, new, fields):
+    """Return {field: (old value, new value)} for the fields that differ"""
+    changes = {}
+    for field in fields:
+        before, after = old.get(field), new.get(field)
+        if before != after:
+            changes[field] = (before, after)
+    return changes
@@ -0,0 +1,138 @@
+from collections import deque
+from contextlib import contextmanager
+
+from core.events import ADDED, REMOVED, diff
+from core.model import TASK_FIELDS
+
+# Number of actions kept for undo
+MAX_ACTIONS = 1000
+
+class History:
+    """
+    Undo/redo log of task store changes
+
+    Changes made inside `with history.action():` are recorded as the
+    before and after state of each touched task, so an action costs memory
+    proportional to the tasks it changed, never to the size of the list.
+    The store reports changes as events (core/events.py); undo() and redo()
+    put the recorded states back (a deleted task returns to its former
+    position) and return the changes they made, so only those tasks need
+    to be saved.
+    """
+
+    def __init__(self, store, max_actions=MAX_ACTIONS):
+        self._store = store
+        self._undo = deque(maxlen=max_actions)
+        self._redo = []
+        self._touched = None
+        self._depth = 0
+        store.subscribe(self._record)
+
+    def _record(self, event):
+        """Keep the state a task had before the current action first touched it"""
+        if self._touched is None or event.task_id in self._touched:
+            return
+        if event.kind == ADDED:
+            before = None
+        elif event.kind == REMOVED:
+            before = (event.task.copy(), event.rank)
+        else:
+            task = event.task.copy()
+            for field, (old, _) in event.changes.items():
+                if old is None and field not in TASK_FIELDS:
+                    # An extra field (e.g. "occurrences") the task didn't have
+                    task.pop(field, None)
+                else:
+                    task[field] = old
+            before = (task, event.rank)
+        self._touched[event.task_id] = before
+
+    @contextmanager
+    def action(self):
+        """Record the changes made inside the block as one undoable action"""
+        if self._depth == 0:
+            self._touched = {}
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                touched, self._touched = self._touched, None
+                self._commit(touched)
+
+    def _commit(self, touched):
+        """Turn the touched tasks into a (before, after) entry list"""
+        entries = []
+        for task_id, before in touched.items():
+            task = self._store.get(task_id)
+            after = (task.copy(), self._store.rank(task_id)) if task is not None else None
+            if before is not None or after is not None:
+                entries.append((task_id, before, after))
+        if not entries:
+            return
+        self._undo.append(entries)
+        self._redo.clear()
+
+    def can_undo(self):
+        """True if there is an action to undo"""
+        return bool(self._undo)
+
+    def can_redo(self):
+        """True if there is an undone action to redo"""
+        return bool(self._redo)
+
+    def undo(self):
+        """
+        Revert the last action
+
+        Returns:
+            List of the changes made, as (op, task id, data) in the form of
+            storage.save_change: "add" with [task dict], "update" with the
+            changed fields, "delete" with None; "restore" with [task dict]
+            for a task put back before later tasks. Empty if there was
+            nothing to undo.
+        """
+        if not self._undo:
+            return []
+        entries = self._undo.pop()
+        changes = [self._apply(task_id, before) for task_id, before, _ in reversed(entries)]
+        self._redo.append(entries)
+        return [change for change in changes if change is not None]
+
+    def redo(self):
+        """
+        Re-apply the last undone action
+
+        Returns:
+            List of the changes made, as for undo()
+        """
+        if not self._redo:
+            return []
+        entries = self._redo.pop()
+        changes = [self._apply(task_id, after) for task_id, _, after in entries]
+        self._undo.append(entries)
+        return [change for change in changes if change is not None]
+
+    def _apply(self, task_id, state):
+        """
+        Make the store hold a recorded task state (None: no task)
+
+        Returns:
+            The change as (op, task id, data), or None if nothing changed
+        """
+        store = self._store
+        if state is None:
+            return ("delete", task_id, None) if store.delete(task_id) is not None else None
+        task, rank = state
+        if task_id not in store:
+            store.restore(task.copy(), rank)
+            # Back in the middle of the list: an appended "add" would lose the position
+            op = "add" if store.last().id == task_id else "restore"
+            return (op, task_id, [task.to_dict()])
+        old = store.replace(task.copy())
+        # Fields the recorded state doesn't have are cleared
+        changes = diff(old, task, set(old) | set(task))
+        if not changes:
+            return None
+        return ("update", task_id, {field: new for field, (_, new) in changes.items()})
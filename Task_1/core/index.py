@@ -0,0 +1,503 @@
+import heapq
+import math
+import re
+from bisect import bisect_left, insort
+
+from core.model import due_ordinal
+from core.symbols import SymbolTable
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Bit per searchable field; filter_tasks only searches title and description
+TITLE = 1
+DESCRIPTION = 2
+CATEGORY = 4
+TAGS = 8
+TEXT_FIELDS = TITLE | DESCRIPTION
+ALL_FIELDS = TITLE | DESCRIPTION | CATEGORY | TAGS
+
+# Ranked search counts a title occurrence like several in the other fields
+FIELD_WEIGHTS = ((TITLE, 3), (DESCRIPTION, 1), (CATEGORY, 1), (TAGS, 1))
+
+# A posting packs the weighted term frequency above the four field bits
+_FIELD_BITS = 4
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def tokenize(text):
+    """Split text into lowercase word tokens"""
+    return _TOKEN_RE.findall(text.lower()) if isinstance(text, str) else []
+
+def trigrams(word):
+    """Return the padded trigrams of a word ("milk" -> "  m", " mi", "mil", "ilk", "lk ")"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def max_typos(word):
+    """Edits a fuzzy match may need: none for very short words, more for long ones"""
+    if len(word) <= 2:
+        return 0
+    return 1 if len(word) <= 5 else 2
+
+def edit_distance(a, b, limit):
+    """
+    Levenshtein distance between two words, giving up early
+
+    Returns:
+        The distance, or limit + 1 once it is known to exceed limit
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
+def _field_tokens(task):
+    """Yield (field bit, token) for every word of the searchable fields of a task"""
+    for field, bit in (("title", TITLE), ("description", DESCRIPTION), ("category", CATEGORY)):
+        for token in tokenize(task.get(field)):
+            yield bit, token
+    tags = task.get("tags")
+    if isinstance(tags, (list, tuple)):
+        for tag in tags:
+            for token in tokenize(tag):
+                yield TAGS, token
+
+def _task_tokens(task):
+    """
+    Return the postings of a task and its weighted length
+
+    Returns:
+        Tuple ({token: weighted frequency << _FIELD_BITS | field bits}, weighted length)
+    """
+    weights = dict(FIELD_WEIGHTS)
+    tokens = {}
+    length = 0
+    for bit, token in _field_tokens(task):
+        weight = weights[bit]
+        tokens[token] = (tokens.get(token, 0) | bit) + (weight << _FIELD_BITS)
+        length += weight
+    return tokens, length
+
+class TokenIndex:
+    """
+    Inverted index: word token -> {task id: posting}
+
+    A posting holds the field bits the token occurs in and its weighted
+    term frequency; with the weighted task lengths this is all BM25 needs.
+
+    The vocabulary is also kept sorted, so a query word matches every token
+    it is a prefix of with a bisect instead of a scan, and indexed by
+    trigram for fuzzy matching. A TaskStore keeps the index current through
+    add(), remove() and its update hooks.
+    """
+
+    def __init__(self, tasks=()):
+        self.rebuild(tasks)
+
+    def rebuild(self, tasks, task_ids=None):
+        """
+        Index a whole task collection, sorting the vocabulary once
+
+        Args:
+            tasks: Tasks to index
+            task_ids: Ids to index them under (default: each task's "id")
+        """
+        self._postings = {}
+        self._lengths = {}
+        self._total_length = 0
+        if task_ids is None:
+            task_ids = (task["id"] for task in tasks)
+        for task, task_id in zip(tasks, task_ids):
+            tokens, length = _task_tokens(task)
+            for token, posting in tokens.items():
+                self._postings.setdefault(token, {})[task_id] = posting
+            self._lengths[task_id] = length
+            self._total_length += length
+        self._vocabulary = sorted(self._postings)
+        self._trigrams = {}
+        for token in self._vocabulary:
+            self._add_trigrams(token)
+
+    def _add_trigrams(self, token):
+        for gram in trigrams(token):
+            self._trigrams.setdefault(gram, set()).add(token)
+
+    def _remove_trigrams(self, token):
+        for gram in trigrams(token):
+            tokens = self._trigrams.get(gram)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._trigrams[gram]
+
+    def add(self, task):
+        """Index a task under its id"""
+        task_id = task["id"]
+        tokens, length = _task_tokens(task)
+        for token, posting in tokens.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                insort(self._vocabulary, token)
+                self._add_trigrams(token)
+            postings[task_id] = posting
+        self._lengths[task_id] = length
+        self._total_length += length
+
+    def remove(self, task):
+        """Drop a task indexed with its current field values"""
+        task_id = task["id"]
+        length = self._lengths.pop(task_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for token in _task_tokens(task)[0]:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(task_id, None)
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect_left(self._vocabulary, token)]
+                self._remove_trigrams(token)
+
+    def _prefix_matches(self, prefix, fields):
+        """Return ids of tasks with a token starting with prefix in one of fields"""
+        matches = set()
+        vocabulary = self._vocabulary
+        position = bisect_left(vocabulary, prefix)
+        while position < len(vocabulary) and vocabulary[position].startswith(prefix):
+            for task_id, bits in self._postings[vocabulary[position]].items():
+                if bits & fields:
+                    matches.add(task_id)
+            position += 1
+        return matches
+
+    def search(self, query, fields=ALL_FIELDS):
+        """
+        Find tasks matching every word of a query
+
+        Args:
+            query: Search text; each word matches as a token prefix
+            fields: Field bits to search (default: all fields)
+
+        Returns:
+            Set of matching task ids, or None if the query has no words
+        """
+        words = tokenize(query)
+        if not words:
+            return None
+        # Longest (most selective) word first keeps the intersections small
+        result = None
+        for word in sorted(set(words), key=len, reverse=True):
+            matches = self._prefix_matches(word, fields)
+            result = matches if result is None else result & matches
+            if not result:
+                break
+        return result
+
+    def ranked_search(self, query, fields=ALL_FIELDS, limit=None, rank=None):
+        """
+        Rank tasks against a query with BM25
+
+        Each query word matches the tokens it is a prefix of; a task does not
+        need to match every word, it just scores higher the more it does.
+        Term frequencies are field-weighted (FIELD_WEIGHTS), so title
+        matches rank above description and tag matches.
+
+        Args:
+            query: Search text
+            fields: Field bits to search (default: all fields)
+            limit: Return only the best `limit` tasks
+            rank: Function of a task id breaking score ties (e.g. display position)
+
+        Returns:
+            List of (score, task id), best first, or None if the query has no words
+        """
+        words = tokenize(query)
+        if not words:
+            return None
+        count = len(self._lengths)
+        if not count:
+            return []
+        average_length = self._total_length / count or 1
+        scores = {}
+        vocabulary = self._vocabulary
+        for word in set(words):
+            position = bisect_left(vocabulary, word)
+            while position < len(vocabulary) and vocabulary[position].startswith(word):
+                postings = self._postings[vocabulary[position]]
+                position += 1
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for task_id, posting in postings.items():
+                    if not posting & fields:
+                        continue
+                    frequency = posting >> _FIELD_BITS
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[task_id] / average_length)
+                    scores[task_id] = (scores.get(task_id, 0.0)
+                                       + idf * frequency * (BM25_K1 + 1) / (frequency + norm))
+        ranked = ((score, task_id) for task_id, score in scores.items())
+        if rank is None:
+            key = lambda item: -item[0]
+        else:
+            key = lambda item: (-item[0], rank(item[1]))
+        if limit is not None:
+            return heapq.nsmallest(limit, ranked, key=key)
+        return sorted(ranked, key=key)
+
+    def _similar_tokens(self, word):
+        """
+        Return {token: edit distance} for vocabulary tokens within max_typos(word)
+
+        Candidates must share enough trigrams with the word (each edit
+        changes at most three), so only those are compared character by
+        character.
+        """
+        limit = max_typos(word)
+        if limit == 0:
+            return {word: 0} if word in self._postings else {}
+        grams = trigrams(word)
+        needed = len(grams) - 3 * limit
+        if needed <= 0:
+            # Too short to prune by trigrams; compare every token of a similar length
+            candidates = [token for token in self._vocabulary if abs(len(token) - len(word)) <= limit]
+        else:
+            shared = {}
+            for gram in grams:
+                for token in self._trigrams.get(gram, ()):
+                    shared[token] = shared.get(token, 0) + 1
+            candidates = [token for token, count in shared.items() if count >= needed]
+
+        similar = {}
+        for token in candidates:
+            distance = edit_distance(word, token, limit)
+            if distance <= limit:
+                similar[token] = distance
+        return similar
+
+    def fuzzy_search(self, query, fields=ALL_FIELDS):
+        """
+        Find tasks matching every word of a query, allowing typos
+
+        Args:
+            query: Search text
+            fields: Field bits to search (default: all fields)
+
+        Returns:
+            Dict task id -> total edit distance, or None if the query has no words
+        """
+        words = tokenize(query)
+        if not words:
+            return None
+        result = None
+        for word in sorted(set(words), key=len, reverse=True):
+            distances = {}
+            for token, distance in self._similar_tokens(word).items():
+                for task_id, bits in self._postings[token].items():
+                    if bits & fields and distance < distances.get(task_id, distance + 1):
+                        distances[task_id] = distance
+            if result is None:
+                result = distances
+            else:
+                result = {task_id: total + distances[task_id]
+                          for task_id, total in result.items() if task_id in distances}
+            if not result:
+                break
+        return result
+
+class FieldIndex:
+    """
+    Secondary indexes over task fields
+
+    Keeps the ids of done, pending and recurring tasks, buckets by priority, symbol
+    tables of the categories and tags in use, and (due ordinal, rank, id)
+    entries sorted with bisect, so status, category, tag and priority filters
+    become set intersections, category and tag counts cost O(#names) and
+    due-date views become range lookups. The rank breaks ties between tasks
+    due the same day, so ids (which may mix types) are never compared.
+    """
+
+    def __init__(self, rank, tasks=()):
+        """
+        Args:
+            rank: Function returning the insertion number of a task id
+            tasks: Tasks to index
+        """
+        self._rank = rank
+        self.rebuild(tasks)
+
+    def rebuild(self, tasks):
+        """Index a whole task collection, sorting the due dates once"""
+        self.done = set()
+        self.pending = set()
+        self.recurring = set()
+        self.category_symbols = SymbolTable()
+        self.tag_symbols = SymbolTable()
+        self._priorities = {}
+        self._due = []
+        for task in tasks:
+            self._add(task, sorted_insert=False)
+        self._due.sort()
+
+    def add(self, task):
+        """Index a task under its id"""
+        self._add(task, sorted_insert=True)
+
+    def _add(self, task, sorted_insert):
+        task_id = task["id"]
+        (self.done if task["done"] else self.pending).add(task_id)
+        if task.get("recurrence"):
+            self.recurring.add(task_id)
+        self.category_symbols.add(task.get("category"), task_id)
+        for tag in _tag_names(task):
+            self.tag_symbols.add(tag, task_id)
+        self._priorities.setdefault(_fold(task.get("priority")), set()).add(task_id)
+        due = due_ordinal(task)
+        if due is None:
+            return
+        entry = (due, self._rank(task_id), task_id)
+        if sorted_insert:
+            insort(self._due, entry)
+        else:
+            self._due.append(entry)
+
+    def remove(self, task):
+        """Drop a task indexed with its current field values"""
+        task_id = task["id"]
+        self.done.discard(task_id)
+        self.pending.discard(task_id)
+        self.recurring.discard(task_id)
+        self.category_symbols.discard(task.get("category"), task_id)
+        for tag in _tag_names(task):
+            self.tag_symbols.discard(tag, task_id)
+        _discard(self._priorities, _fold(task.get("priority")), task_id)
+        due = due_ordinal(task)
+        if due is not None:
+            entry = (due, self._rank(task_id), task_id)
+            position = bisect_left(self._due, entry)
+            if position < len(self._due) and self._due[position] == entry:
+                del self._due[position]
+
+    def categories(self):
+        """Return the non-empty categories in use, sorted"""
+        return sorted(category for category in self.category_symbols.counts()
+                      if isinstance(category, str) and category)
+
+    def category_counts(self):
+        """Return {category: number of tasks}, sorted by category"""
+        counts = self.category_symbols.counts()
+        return {category: counts[category] for category in sorted(counts, key=str)}
+
+    def tag_counts(self):
+        """Return {tag: number of tasks}, sorted by tag"""
+        counts = self.tag_symbols.counts()
+        return {tag: counts[tag] for tag in sorted(counts)}
+
+    def with_category(self, category, ignore_case=False):
+        """Return ids of tasks in a category"""
+        return self.category_symbols.ids(category, ignore_case)
+
+    def with_tag(self, tag, ignore_case=False):
+        """Return ids of tasks carrying a tag"""
+        return self.tag_symbols.ids(tag, ignore_case)
+
+    def with_priority(self, priority):
+        """Return ids of tasks with a priority (case-insensitive)"""
+        return set(self._priorities.get(priority.lower(), ()))
+
+    def due_between(self, start, end):
+        """Return ids of tasks due on day ordinals start <= due < end"""
+        first = bisect_left(self._due, (start,))
+        last = bisect_left(self._due, (end,))
+        return {task_id for _, _, task_id in self._due[first:last]}
+
+    def overdue(self, today):
+        """Return ids of pending tasks due before the day ordinal today"""
+        return self.due_between(1, today) & self.pending
+
+    def due_within(self, today, days):
+        """Return ids of pending tasks due in the `days` days starting today"""
+        return self.due_between(today, today + days) & self.pending
+
+def _fold(value):
+    """Lowercase strings; other values are indexed as-is"""
+    return value.lower() if isinstance(value, str) else value
+
+def _tag_names(task):
+    """Distinct tags of a task; tags that aren't a list of strings are not indexed"""
+    tags = task.get("tags")
+    if not isinstance(tags, (list, tuple)):
+        return ()
+    return {tag for tag in tags if isinstance(tag, str)}
+
+def _discard(buckets, key, task_id):
+    """Remove an id from a bucket, dropping the bucket once empty"""
+    bucket = buckets.get(key)
+    if bucket is not None:
+        bucket.discard(task_id)
+        if not bucket:
+            del buckets[key]
+
+class SortedView:
+    """
+    Tasks kept in one sort order
+
+    Entries are (key, rank, task) with rank the task's insertion number, so
+    ties keep display order, exactly like a stable sort. Each change costs
+    one insort/removal and reading the first k tasks costs O(k).
+    """
+
+    def __init__(self, key, rank, tasks=()):
+        """
+        Args:
+            key: Sort key function (see core.query.sort_key)
+            rank: Function returning the insertion number of a task id
+        """
+        self._key = key
+        self._rank = rank
+        self.rebuild(tasks)
+
+    def _entry(self, task):
+        return (self._key(task), self._rank(task["id"]), task)
+
+    def rebuild(self, tasks):
+        """Sort a whole task collection once"""
+        # (key, rank) is unique, so comparisons never reach the task itself
+        self._entries = sorted(map(self._entry, tasks))
+
+    def add(self, task):
+        """Insert a task at its sorted position"""
+        insort(self._entries, self._entry(task))
+
+    def remove(self, task):
+        """Drop a task indexed with its current field values"""
+        probe = self._entry(task)[:2]
+        position = bisect_left(self._entries, probe)
+        if position < len(self._entries) and self._entries[position][:2] == probe:
+            del self._entries[position]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def iter(self, reverse=False):
+        """Yield tasks in order; reversed order keeps ties in display order like sorted(reverse=True)"""
+        if not reverse:
+            for entry in self._entries:
+                yield entry[2]
+            return
+        end = len(self._entries)
+        while end > 0:
+            start = bisect_left(self._entries, (self._entries[end - 1][0],), 0, end)
+            for entry in self._entries[start:end]:
+                yield entry[2]
+            end = start
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+from core import metrics, storage
+from core.store import TaskStore
+
+# Compact the journal into the snapshot once it grows past this size
+COMPACT_THRESHOLD = 256 * 1024
+
+# Serializes journal appends and snapshot replacement
+_lock = threading.RLock()
+_seq = None
+_compacted_seq = 0
+_compacting = False
+
+def _dumps(record):
+    """Serialize a journal record as one compact line"""
+    return json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+
+def _read_records():
+    """Read journal records, ignoring a torn last line from a crash"""
+    if not os.path.exists(storage.JOURNAL_PATH):
+        return []
+
+    records = []
+    if metrics.ENABLED:
+        metrics.add("bytes_read", os.path.getsize(storage.JOURNAL_PATH))
+    with open(storage.JOURNAL_PATH, "r", encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return records
+
+def _current_seq():
+    """Return the sequence number of the last appended record"""
+    global _seq
+    if _seq is None:
+        _seq = max((r.get("seq", 0) for r in _read_records()), default=0)
+    return _seq
+
+def apply_record(tasks, record):
+    """
+    Apply one journal record to a task store in place
+
+    Records address tasks by "id"; older records use a list "index".
+
+    Args:
+        tasks: TaskStore
+        record: Journal record dict
+
+    Returns:
+        Updated task store
+    """
+    op = record.get("op")
+    task_id = record.get("id")
+    if task_id is None and record.get("index") is not None:
+        task_id = tasks.id_at(record["index"])
+
+    if op == "add":
+        tasks.extend(storage.validate_tasks(record.get("data", [])))
+    elif op == "update" and task_id in tasks:
+        tasks.get(task_id).update(record.get("data", {}))
+    elif op == "delete" and task_id in tasks:
+        tasks.delete(task_id)
+
+    return tasks
+
+def load_tasks():
+    """Load the last snapshot and replay the journal on top of it"""
+    global _seq, _compacted_seq
+
+    with _lock:
+        snapshot = b""
+        if os.path.exists(storage.FILE_PATH):
+            with open(storage.FILE_PATH, "rb") as f:
+                snapshot = f.read()
+            metrics.add("bytes_read", len(snapshot))
+
+        missing_ids = False
+        try:
+            raw = json.loads(snapshot) if snapshot else []
+            tasks = TaskStore(storage.validate_tasks(raw))
+            missing_ids = isinstance(raw, list) and any(isinstance(task, dict) and not task.get("id")
+                                                        for task in raw)
+        except (json.JSONDecodeError, UnicodeDecodeError, ValueError) as e:
+            print(f"Error loading snapshot: {e}")
+            tasks = TaskStore()
+            # Keep the corrupted file; the next compaction replaces todo.json
+            backup_path = f"{storage.FILE_PATH}.backup.{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            os.rename(storage.FILE_PATH, backup_path)
+            print(f"Created backup of corrupted file: {backup_path}")
+
+        records = _read_records()
+
+        # Skip records already folded into the snapshot by a finished compaction
+        digest = hashlib.sha1(snapshot).hexdigest()
+        base_seq = 0
+        for record in records:
+            if record.get("op") == "checkpoint" and record.get("digest") == digest:
+                base_seq = record["seq"]
+
+        for record in records:
+            if record.get("op") != "checkpoint" and record.get("seq", 0) > base_seq:
+                apply_record(tasks, record)
+
+        _seq = max((r.get("seq", 0) for r in records), default=0)
+        _compacted_seq = base_seq
+        loaded = tasks.to_dicts()
+        if missing_ids:
+            # The ids given above are new on every load; save them now so
+            # the id-keyed records appended from here on still match later
+            compact(loaded)
+        return loaded
+
+def append(op, index=None, data=None, task_id=None, task_ids=None):
+    """
+    Append change records to the journal in one write
+
+    Args:
+        op: "add", "update" or "delete"
+        index: Index of the changed task (update/delete), if it has no id
+        data: List of added tasks (add) or dict of changed fields (update)
+        task_id: Id of the changed task (update/delete)
+        task_ids: Ids of several tasks changed the same way (one record each)
+    """
+    global _seq
+
+    if task_ids is not None and op != "add":
+        records = [{"op": op, "id": changed_id} for changed_id in task_ids]
+        if not records:
+            return
+    else:
+        record = {"op": op}
+        if task_id is not None:
+            record["id"] = task_id
+        elif index is not None:
+            record["index"] = index
+        records = [record]
+    for record in records:
+        if op == "add":
+            record["data"] = storage.validate_tasks(list(data or []))
+        elif data is not None:
+            record["data"] = data
+
+    with _lock:
+        _seq = _current_seq()
+        lines = []
+        for record in records:
+            _seq += 1
+            record["seq"] = _seq
+            lines.append(_dumps(record))
+        content = "".join(lines).encode("utf-8")
+        with open(storage.JOURNAL_PATH, "ab") as f:
+            f.write(content)
+        metrics.add("bytes_written", len(content))
+
+def journal_size():
+    """Return the current journal size in bytes"""
+    try:
+        return os.path.getsize(storage.JOURNAL_PATH)
+    except OSError:
+        return 0
+
+def compact(tasks, background=False):
+    """
+    Write tasks as the new snapshot and drop the journal records it contains
+
+    Args:
+        tasks: Full, current task list
+        background: Write the snapshot from a worker thread
+
+    Returns:
+        True if the compaction succeeded (or was started)
+    """
+    global _compacting
+
+    with _lock:
+        # Copy the state now so later mutations don't leak into this snapshot
+        snapshot = storage.validate_tasks(tasks)
+        for task in snapshot:
+            task["tags"] = list(task["tags"])
+        seq = _current_seq()
+        _compacting = True
+
+    if not background:
+        return _write_compaction(snapshot, seq)
+
+    worker = threading.Thread(target=_write_compaction, args=(snapshot, seq), daemon=True)
+    worker.start()
+    return True
+
+def maybe_compact(tasks):
+    """Start a background compaction once the journal passes the threshold"""
+    if not _compacting and journal_size() > COMPACT_THRESHOLD:
+        compact(tasks, background=True)
+
+def _write_compaction(snapshot, seq):
+    """Replace the snapshot file and rewrite the journal without old records"""
+    global _compacted_seq, _compacting
+
+    try:
+        content = json.dumps(snapshot, indent=4, ensure_ascii=False).encode("utf-8")
+        digest = hashlib.sha1(content).hexdigest()
+        tmp_path = f"{storage.FILE_PATH}.tmp"
+
+        with _lock:
+            # A newer compaction already finished; this snapshot is stale
+            if seq < _compacted_seq:
+                return True
+
+            # The checkpoint lets recovery skip folded records even if we
+            # crash after replacing the snapshot but before trimming the log
+            with open(storage.JOURNAL_PATH, "a", encoding='utf-8') as f:
+                f.write(_dumps({"op": "checkpoint", "seq": seq, "digest": digest}))
+
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            metrics.add("bytes_written", len(content))
+            os.replace(tmp_path, storage.FILE_PATH)
+            _compacted_seq = seq
+
+            remaining = [r for r in _read_records() if r.get("seq", 0) > seq]
+            with open(tmp_path, "w", encoding='utf-8') as f:
+                f.writelines(_dumps(r) for r in remaining)
+                if metrics.ENABLED:
+                    metrics.add("bytes_written", f.tell())
+            os.replace(tmp_path, storage.JOURNAL_PATH)
+        return True
+    except Exception as e:
+        print(f"Error compacting journal: {e}")
+        return False
+    finally:
+        _compacting = False
@@ -0,0 +1,203 @@
+import atexit
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from array import array
+
+# TODO_METRICS turns the instrumentation on: "1" prints a summary to
+# stderr at exit, a file path writes it there instead (Prometheus text for
+# a .prom file, JSON otherwise). Unset, nothing is wrapped or counted.
+ENV_VAR = "TODO_METRICS"
+ENABLED = False
+
+# Latency samples kept per function; beyond this a uniform random sample
+# is kept, so memory stays bounded and percentiles stay unbiased
+MAX_SAMPLES = 10000
+QUANTILES = (0.5, 0.95, 0.99)
+
+_lock = threading.Lock()
+_timers = {}
+_counters = {}
+_rng = random.Random()
+_destination = None
+
+class _Timer:
+    """Call count, total time and a sample of the durations of one function"""
+
+    __slots__ = ("calls", "total", "samples")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.samples = array("d")
+
+    def record(self, seconds):
+        self.calls += 1
+        self.total += seconds
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+        else:
+            slot = _rng.randrange(self.calls)
+            if slot < MAX_SAMPLES:
+                self.samples[slot] = seconds
+
+def enable(destination=None):
+    """
+    Start collecting metrics
+
+    Args:
+        destination: None to print a summary to stderr at exit, or a file
+            to write it to (.prom for Prometheus text, JSON otherwise)
+    """
+    global ENABLED, _destination
+    if not ENABLED:
+        atexit.register(_report)
+    ENABLED = True
+    _destination = destination
+
+def disable():
+    """Stop collecting metrics (functions wrapped so far stay wrapped)"""
+    global ENABLED
+    ENABLED = False
+
+def reset():
+    """Forget everything collected so far"""
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+def _enable_from_env():
+    value = os.environ.get(ENV_VAR, "").strip()
+    if value and value.lower() not in ("0", "false", "no", "off"):
+        enable(None if value.lower() in ("1", "true", "yes", "on", "stderr") else value)
+
+def add(name, amount=1):
+    """Add to a counter (e.g. "bytes_read"); does nothing unless enabled"""
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+def timed(name, function):
+    """Wrap a function so each call records its duration under name"""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not ENABLED:
+            return function(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            with _lock:
+                timer = _timers.get(name)
+                if timer is None:
+                    timer = _timers[name] = _Timer()
+                timer.record(seconds)
+    return wrapper
+
+def instrument(namespace, names, prefix):
+    """
+    Time a module's entry points when metrics are enabled
+
+    Called at the end of a module with its globals(), so callers that
+    import the functions afterwards get the timed versions. When metrics
+    are off nothing is wrapped and calls cost nothing extra.
+
+    Args:
+        namespace: Module globals
+        names: Names of the functions to time
+        prefix: Metric name prefix (e.g. "storage")
+    """
+    if not ENABLED:
+        return
+    for name in names:
+        namespace[name] = timed(f"{prefix}.{name}", namespace[name])
+
+def _quantile(ordered, q):
+    """Nearest-rank quantile of a sorted sequence"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))]
+
+def summary():
+    """
+    Return what was collected
+
+    Returns:
+        Dict {"functions": {name: {"calls", "total", "p50", "p95", "p99"}},
+        "counters": {name: value}}, times in seconds
+    """
+    with _lock:
+        timers = {name: (timer.calls, timer.total, sorted(timer.samples)) for name, timer in _timers.items()}
+        counters = dict(_counters)
+
+    functions = {}
+    for name, (calls, total, ordered) in sorted(timers.items()):
+        functions[name] = {"calls": calls, "total": total}
+        for q in QUANTILES:
+            functions[name][f"p{round(q * 100)}"] = _quantile(ordered, q)
+    return {"functions": functions, "counters": dict(sorted(counters.items()))}
+
+def to_prometheus(data=None):
+    """Format a summary as Prometheus text exposition"""
+    data = data or summary()
+    lines = ["# TYPE todo_function_seconds summary"]
+    for name, stats in data["functions"].items():
+        for q in QUANTILES:
+            lines.append(f'todo_function_seconds{{function="{name}",quantile="{q}"}} '
+                         f'{stats[f"p{round(q * 100)}"]:.9f}')
+        lines.append(f'todo_function_seconds_sum{{function="{name}"}} {stats["total"]:.9f}')
+        lines.append(f'todo_function_seconds_count{{function="{name}"}} {stats["calls"]}')
+    for name, value in data["counters"].items():
+        lines.append(f"# TYPE todo_{name}_total counter")
+        lines.append(f"todo_{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+def format_summary(data=None):
+    """Format a summary as a readable table"""
+    data = data or summary()
+    lines = [f"{'function':<32} {'calls':>8} {'total ms':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+    for name, stats in data["functions"].items():
+        lines.append(f"{name:<32} {stats['calls']:>8} {stats['total'] * 1000:>10.2f} "
+                     f"{stats['p50'] * 1000:>9.3f} {stats['p95'] * 1000:>9.3f} {stats['p99'] * 1000:>9.3f}")
+    for name, value in data["counters"].items():
+        lines.append(f"{name:<32} {value:>8}")
+    return "\n".join(lines)
+
+def write(path):
+    """
+    Write the summary to a file
+
+    Args:
+        path: .prom for Prometheus text, anything else for JSON
+
+    Returns:
+        True if the file was written
+    """
+    try:
+        data = summary()
+        with open(path, "w", encoding='utf-8') as f:
+            if path.endswith(".prom"):
+                f.write(to_prometheus(data))
+            else:
+                json.dump(data, f, indent=2)
+        return True
+    except OSError as e:
+        print(f"Error writing metrics: {e}")
+        return False
+
+def _report():
+    """Exit hook: print or write the summary"""
+    if not (_timers or _counters):
+        return
+    if _destination:
+        write(_destination)
+    else:
+        print(format_summary(), file=sys.stderr)
+
+_enable_from_env()
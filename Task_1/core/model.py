@@ -0,0 +1,282 @@
+import sys
+from collections.abc import MutableMapping
+from datetime import date, datetime, timedelta
+
+PRIORITY_CODES = {"low": 0, "medium": 1, "high": 2}
+PRIORITY_NAMES = {code: name for name, code in PRIORITY_CODES.items()}
+
+# Due dates are day ordinals; these values stand for the non-date cases
+DUE_EMPTY = 0
+DUE_NONE = -1
+
+# Marks a field whose original value could not be encoded and is kept as-is
+RAW = -2
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Field order of task dicts, as written by storage.validate_task
+TASK_FIELDS = ("id", "title", "done", "description", "priority", "category",
+               "due_date", "tags", "created_at", "updated_at")
+
+def encode_due(value):
+    """Encode a YYYY-MM-DD due date as a day ordinal, or None if it isn't one"""
+    if value == "":
+        return DUE_EMPTY
+    if value is None:
+        return DUE_NONE
+    try:
+        parsed = datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+    return parsed.toordinal() if parsed.isoformat() == value else None
+
+def decode_due(ordinal):
+    """Decode a due-date ordinal (or DUE_EMPTY / DUE_NONE)"""
+    if ordinal == DUE_EMPTY:
+        return ""
+    if ordinal == DUE_NONE:
+        return None
+    return date.fromordinal(ordinal).isoformat()
+
+def encode_time(value):
+    """Encode a naive ISO timestamp as epoch microseconds, or None if it isn't one"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is not None or parsed.isoformat() != value:
+        return None
+    delta = parsed - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+def decode_time(micros):
+    """Decode epoch microseconds back into the ISO timestamp"""
+    return (_EPOCH + timedelta(microseconds=micros)).isoformat()
+
+def due_ordinal(task):
+    """
+    Return the due date of a task (Task or dict) as a day ordinal
+
+    Returns:
+        Ordinal, or None if the task has no valid due date
+    """
+    if isinstance(task, Task):
+        return task.due if task.due > 0 else None
+    ordinal = encode_due(task.get("due_date"))
+    return ordinal if ordinal and ordinal > 0 else None
+
+def _encode_tags(value):
+    """Encode tags as a tuple of interned strings, or None if they aren't strings"""
+    if not isinstance(value, (list, tuple)) or not all(isinstance(tag, str) for tag in value):
+        return None
+    return tuple(sys.intern(tag) for tag in value)
+
+class TagList(list):
+    """
+    Read-only list of a Task's tags
+
+    A Task keeps its tags as a tuple; changing this list could not reach
+    the task (or its indexes), so every in-place change raises TypeError.
+    Assign a new list instead: task["tags"] = task["tags"] + ["new"].
+    """
+
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Task tags are read-only; assign a new list to task['tags']")
+
+    append = extend = insert = remove = pop = clear = sort = reverse = _read_only
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+
+class Task(MutableMapping):
+    """
+    Compact in-memory task
+
+    Dates are stored as integers (day ordinals, epoch microseconds), the
+    priority as a small int and tags as a tuple of interned strings, so
+    filters and sorts compare ints instead of re-parsing strings. The
+    mapping interface gives the same keys and values as a task dict, which
+    is still what storage reads and writes. Values that don't fit the
+    compact encoding are kept unchanged.
+    """
+
+    __slots__ = ("id", "title", "done", "description", "priority", "category",
+                 "due", "tags", "created", "updated", "_raw", "_extra")
+
+    def __init__(self, fields=None, **kwargs):
+        self.id = None
+        self.title = "Untitled Task"
+        self.done = False
+        self.description = ""
+        self.priority = PRIORITY_CODES["medium"]
+        self.category = ""
+        self.due = DUE_EMPTY
+        self.tags = ()
+        self.created = self.updated = None
+        self._raw = None
+        self._extra = None
+        if fields is not None:
+            self.update(fields)
+        if kwargs:
+            self.update(kwargs)
+
+        # Timestamps default to now, like storage.validate_task
+        for attr, key in (("created", "created_at"), ("updated", "updated_at")):
+            if getattr(self, attr) is None and not (self._raw and key in self._raw):
+                setattr(self, attr, encode_time(datetime.now().isoformat()))
+
+    @classmethod
+    def from_dict(cls, task):
+        """Build a Task from a task dict (or return it unchanged if it already is one)"""
+        if isinstance(task, Task):
+            return task
+        return cls(task)
+
+    def to_dict(self):
+        """Convert back to a plain task dict"""
+        task = dict(self.items())
+        if isinstance(task["tags"], TagList):
+            task["tags"] = list(task["tags"])
+        return task
+
+    def copy(self):
+        """Return an independent copy"""
+        clone = Task.__new__(Task)
+        for name in Task.__slots__:
+            setattr(clone, name, getattr(self, name))
+        clone._raw = dict(self._raw) if self._raw else None
+        clone._extra = dict(self._extra) if self._extra else None
+        return clone
+
+    def _set_raw(self, key, value):
+        if self._raw is None:
+            self._raw = {}
+        self._raw[key] = value
+
+    def _clear_raw(self, key):
+        if self._raw:
+            self._raw.pop(key, None)
+
+    def __getitem__(self, key):
+        getter = _GETTERS.get(key)
+        if getter is not None:
+            return getter(self)
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        setter = _SETTERS.get(key)
+        if setter is not None:
+            setter(self, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in _GETTERS:
+            raise KeyError(f"Task field '{key}' cannot be deleted")
+        if not self._extra or key not in self._extra:
+            raise KeyError(key)
+        del self._extra[key]
+
+    def __iter__(self):
+        yield from TASK_FIELDS
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return len(TASK_FIELDS) + (len(self._extra) if self._extra else 0)
+
+    def __repr__(self):
+        return f"Task({self.to_dict()!r})"
+
+def _get_priority(task):
+    if task.priority == RAW:
+        return task._raw["priority"]
+    return PRIORITY_NAMES[task.priority]
+
+def _set_priority(task, value):
+    code = PRIORITY_CODES.get(value) if isinstance(value, str) else None
+    if code is None:
+        task.priority = RAW
+        task._set_raw("priority", value)
+    else:
+        task.priority = code
+        task._clear_raw("priority")
+
+def _get_due(task):
+    if task.due == RAW:
+        return task._raw["due_date"]
+    return decode_due(task.due)
+
+def _set_due(task, value):
+    ordinal = encode_due(value)
+    if ordinal is None:
+        task.due = RAW
+        task._set_raw("due_date", value)
+    else:
+        task.due = ordinal
+        task._clear_raw("due_date")
+
+def _get_tags(task):
+    if task.tags is None:
+        return task._raw["tags"]
+    # A list, like a task dict loaded from storage, but one that refuses
+    # in-place changes (they would be lost)
+    return TagList(task.tags)
+
+def _set_tags(task, value):
+    task.tags = _encode_tags(value)
+    if task.tags is None:
+        task._set_raw("tags", value)
+    else:
+        task._clear_raw("tags")
+
+def _time_accessors(attr, key):
+    def getter(task):
+        micros = getattr(task, attr)
+        return task._raw[key] if micros is None else decode_time(micros)
+
+    def setter(task, value):
+        micros = encode_time(value)
+        setattr(task, attr, micros)
+        if micros is None:
+            task._set_raw(key, value)
+        else:
+            task._clear_raw(key)
+
+    return getter, setter
+
+def _category_setter(task, value):
+    task.category = sys.intern(value) if isinstance(value, str) else value
+
+_get_created, _set_created = _time_accessors("created", "created_at")
+_get_updated, _set_updated = _time_accessors("updated", "updated_at")
+
+_GETTERS = {
+    "id": lambda task: task.id,
+    "title": lambda task: task.title,
+    "done": lambda task: task.done,
+    "description": lambda task: task.description,
+    "priority": _get_priority,
+    "category": lambda task: task.category,
+    "due_date": _get_due,
+    "tags": _get_tags,
+    "created_at": _get_created,
+    "updated_at": _get_updated,
+}
+
+_SETTERS = {
+    "id": lambda task, value: setattr(task, "id", value),
+    "title": lambda task, value: setattr(task, "title", value),
+    "done": lambda task, value: setattr(task, "done", value),
+    "description": lambda task, value: setattr(task, "description", value),
+    "priority": _set_priority,
+    "category": _category_setter,
+    "due_date": _set_due,
+    "tags": _set_tags,
+    "created_at": _set_created,
+    "updated_at": _set_updated,
+}
@@ -0,0 +1,238 @@
+import heapq
+from datetime import date, datetime
+from itertools import islice
+
+from core.index import ALL_FIELDS, CATEGORY, DESCRIPTION, TAGS, TITLE
+from core.model import due_ordinal
+from core.store import TaskStore
+
+STATUSES = ("all", "pending", "completed", "overdue", "due_week")
+
+ORDERS = ("created", "due_date", "priority", "title", "category")
+
+_PRIORITY_ORDER = {"high": 3, "medium": 2, "low": 1}
+_NO_DUE = "9999-12-31"
+
+def sort_key(sort_by, compact=False):
+    """
+    Build the key function for an ordering, resolving sort_by once
+
+    Args:
+        sort_by: created, due_date, priority, title, category
+        compact: Keys may read Task attributes directly (all tasks are Task objects)
+
+    Returns:
+        Key function for sort()/heapq
+    """
+    if sort_by == "due_date":
+        if compact:
+            # Tasks without a due date sort last
+            return lambda task: task.due if task.due > 0 else date.max.toordinal() + 1
+        return lambda task: task.get("due_date") or _NO_DUE
+    if sort_by == "priority":
+        if compact:
+            # Task priorities are 0 (low) .. 2 (high); other values rank as medium
+            return lambda task: task.priority + 1 if task.priority >= 0 else 2
+        return lambda task: _PRIORITY_ORDER.get(task.get("priority", "medium"), 2)
+    if sort_by == "title":
+        return lambda task: task["title"].lower()
+    if sort_by == "category":
+        return lambda task: task.get("category", "").lower()
+    if compact:
+        # Epoch microseconds; timestamps that could not be parsed sort first
+        return lambda task: task.created if task.created is not None else -2 ** 63
+    return lambda task: task.get("created_at", "")
+
+def _as_ordinal(value):
+    """Accept a date, datetime, ISO date string or day ordinal"""
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    return datetime.strptime(value, "%Y-%m-%d").date().toordinal()
+
+class Query:
+    """
+    Composable task query, compiled once and run in a single pass
+
+    On a TaskStore the status, category, priority, tag, text and due-date
+    criteria are answered from its indexes and only the matching tasks are
+    visited; on a plain list every task is tested once against the
+    compiled predicates. Ordered results come from the store's maintained
+    sorted view when most tasks match; otherwise, with a limit, only the
+    requested page is kept (heapq top-k) instead of sorting every match.
+    """
+
+    def __init__(self, status="all", category="", priority="", text="", due_from=None, due_to=None,
+                 tags=(), order_by=None, reverse=False, limit=None, offset=0, text_fields=ALL_FIELDS):
+        """
+        Args:
+            status: all, pending, completed, overdue or due_week
+            category: Category (case-insensitive)
+            priority: high, medium or low (case-insensitive)
+            text: Search text (word prefixes on a TaskStore, substring on a list)
+            due_from: First due date to include (date or YYYY-MM-DD)
+            due_to: Last due date to include (date or YYYY-MM-DD)
+            tags: Tags every match must carry (case-insensitive)
+            order_by: created, due_date, priority, title or category (default: display order)
+            reverse: Reverse the ordering
+            limit: Maximum number of tasks to return
+            offset: Number of matches to skip
+            text_fields: Field bits (core.index) the text is matched against
+        """
+        if status not in STATUSES:
+            status = "all"
+        self.status = status
+        self.category = category
+        self.priority = priority
+        self.text = text
+        self.due_from = _as_ordinal(due_from)
+        self.due_to = _as_ordinal(due_to)
+        self.tags = [tag.lower() for tag in tags]
+        self.order_by = order_by
+        self.reverse = reverse
+        self.limit = limit
+        self.offset = offset
+        self.text_fields = text_fields
+
+    def _predicates(self, today, indexed):
+        """Compile the criteria not answered by indexes into predicate functions"""
+        predicates = []
+        if not indexed:
+            if self.status == "pending":
+                predicates.append(lambda task: not task["done"])
+            elif self.status == "completed":
+                predicates.append(lambda task: task["done"])
+            elif self.status == "overdue":
+                predicates.append(lambda task: not task["done"] and (due_ordinal(task) or today) < today)
+            elif self.status == "due_week":
+                predicates.append(lambda task: not task["done"] and
+                                  today <= (due_ordinal(task) or 0) < today + 7)
+
+            if self.due_from is not None or self.due_to is not None:
+                low = self.due_from if self.due_from is not None else 1
+                high = self.due_to if self.due_to is not None else date.max.toordinal()
+                predicates.append(lambda task: low <= (due_ordinal(task) or 0) <= high)
+
+            if self.category:
+                category = self.category.lower()
+                predicates.append(lambda task: task.get("category", "").lower() == category)
+            if self.priority:
+                priority = self.priority.lower()
+                predicates.append(lambda task: task.get("priority", "").lower() == priority)
+
+            if self.tags:
+                wanted = set(self.tags)
+                predicates.append(lambda task: wanted.issubset(tag.lower() for tag in task.get("tags", [])))
+
+        if self.text and not indexed:
+            predicates.append(self._text_predicate(self.text.lower()))
+        return predicates
+
+    def _text_predicate(self, term):
+        """Substring match over the selected fields"""
+        fields = self.text_fields
+
+        def matches(task):
+            if fields & TITLE and term in task["title"].lower():
+                return True
+            if fields & DESCRIPTION and term in task.get("description", "").lower():
+                return True
+            if fields & CATEGORY and term in task.get("category", "").lower():
+                return True
+            return bool(fields & TAGS) and any(term in tag.lower() for tag in task.get("tags", []))
+
+        return matches
+
+    def _candidates(self, store, today):
+        """
+        Look the indexed criteria up in a store
+
+        Returns:
+            Tuple (candidate ids or None for all tasks, text answered from the index)
+        """
+        sets = []
+        needs_fields = (self.status != "all" or self.category or self.priority or self.tags
+                        or self.due_from is not None or self.due_to is not None)
+        fields = store.field_index() if needs_fields else None
+        if self.status == "pending":
+            sets.append(fields.pending)
+        elif self.status == "completed":
+            sets.append(fields.done)
+        elif self.status == "overdue":
+            sets.append(fields.overdue(today))
+        elif self.status == "due_week":
+            sets.append(fields.due_within(today, 7))
+
+        if self.due_from is not None or self.due_to is not None:
+            low = self.due_from if self.due_from is not None else 1
+            high = self.due_to if self.due_to is not None else date.max.toordinal()
+            sets.append(fields.due_between(low, high + 1))
+        if self.category:
+            sets.append(fields.with_category(self.category, ignore_case=True))
+        if self.priority:
+            sets.append(fields.with_priority(self.priority))
+        for tag in self.tags:
+            sets.append(fields.with_tag(tag, ignore_case=True))
+
+        text_indexed = False
+        if self.text:
+            matches = store.token_index().search(self.text, self.text_fields)
+            # A query without words (e.g. only punctuation) falls back to a scan
+            if matches is not None:
+                sets.append(matches)
+                text_indexed = True
+
+        if not sets:
+            return None, text_indexed
+        sets.sort(key=len)
+        return set(sets[0]).intersection(*sets[1:]), text_indexed
+
+    def run(self, tasks):
+        """
+        Run the query
+
+        Args:
+            tasks: TaskStore or iterable of task dicts
+
+        Returns:
+            List of matching tasks
+        """
+        today = datetime.now().date().toordinal()
+        stop = None if self.limit is None else self.offset + self.limit
+        indexed = isinstance(tasks, TaskStore)
+        if indexed:
+            store = tasks
+            task_ids, text_indexed = self._candidates(store, today)
+            predicates = self._predicates(today, indexed=True)
+            if self.text and not text_indexed:
+                predicates.append(self._text_predicate(self.text.lower()))
+
+            # Most tasks match: walk the maintained sorted view instead of sorting
+            if self.order_by and (task_ids is None or len(task_ids) * 8 > len(store)):
+                ordered = store.sorted_view(self.order_by).iter(self.reverse)
+                if task_ids is not None:
+                    ordered = (task for task in ordered if task.id in task_ids)
+                if predicates:
+                    ordered = (task for task in ordered if all(predicate(task) for predicate in predicates))
+                return list(islice(ordered, self.offset, stop))
+            tasks = store if task_ids is None else store.select(task_ids)
+        else:
+            predicates = self._predicates(today, indexed=False)
+
+        if predicates:
+            matches = (task for task in tasks if all(predicate(task) for predicate in predicates))
+        else:
+            matches = iter(tasks)
+
+        if self.order_by:
+            key = sort_key(self.order_by, compact=indexed)
+            if stop is not None:
+                pick = heapq.nlargest if self.reverse else heapq.nsmallest
+                ordered = pick(stop, matches, key=key)
+            else:
+                ordered = sorted(matches, key=key, reverse=self.reverse)
+            return ordered[self.offset:stop]
+        return list(islice(matches, self.offset, stop))
@@ -0,0 +1,162 @@
+import calendar
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+FREQUENCIES = ("daily", "weekly", "monthly", "yearly")
+
+# Separates the series id from the occurrence date in an occurrence id
+OCCURRENCE_SEPARATOR = "@"
+
+def make_rule(freq, interval=1, weekdays=None, until=None, count=None):
+    """
+    Build a recurrence rule to store on a task (under "recurrence")
+
+    Args:
+        freq: daily, weekly, monthly or yearly
+        interval: Repeat every `interval` days/weeks/months/years
+        weekdays: For weekly rules, weekdays to repeat on (0 = Monday)
+        until: Last possible occurrence date (YYYY-MM-DD)
+        count: Maximum number of occurrences
+
+    Returns:
+        Rule dict
+
+    Raises:
+        ValueError: If the rule is invalid
+    """
+    if freq not in FREQUENCIES:
+        raise ValueError(f"Unknown frequency: {freq}")
+    if not isinstance(interval, int) or interval < 1:
+        raise ValueError("Interval must be a positive integer")
+    rule = {"freq": freq, "interval": interval}
+    if weekdays:
+        if freq != "weekly" or not all(isinstance(day, int) and 0 <= day <= 6 for day in weekdays):
+            raise ValueError("Weekdays (0-6) only apply to weekly rules")
+        rule["weekdays"] = sorted(set(weekdays))
+    if until:
+        datetime.strptime(until, "%Y-%m-%d")
+        rule["until"] = until
+    if count is not None:
+        if not isinstance(count, int) or count < 1:
+            raise ValueError("Count must be a positive integer")
+        rule["count"] = count
+    return rule
+
+def iter_dates(rule, start):
+    """
+    Generate the occurrence dates of a rule, lazily and in order
+
+    Monthly and yearly rules keep the day of `start`, moved back to the
+    last day of shorter months (Jan 31 -> Feb 28 -> Mar 31).
+
+    Args:
+        rule: Rule dict (see make_rule)
+        start: Date of the first occurrence
+
+    Yields:
+        Dates
+    """
+    interval = rule.get("interval", 1)
+    until = rule.get("until")
+    until = datetime.strptime(until, "%Y-%m-%d").date() if until else date.max
+    dates = _dates(rule["freq"], interval, rule.get("weekdays"), start)
+    if rule.get("count"):
+        dates = islice(dates, rule["count"])
+    for day in dates:
+        if day > until:
+            return
+        yield day
+
+def _dates(freq, interval, weekdays, start):
+    """Unbounded date sequence of a rule"""
+    if freq == "daily":
+        step = timedelta(days=interval)
+        day = start
+        while True:
+            yield day
+            day += step
+    elif freq == "weekly":
+        days = weekdays or [start.weekday()]
+        week = start - timedelta(days=start.weekday())
+        while True:
+            for weekday in days:
+                day = week + timedelta(days=weekday)
+                if day >= start:
+                    yield day
+            week += timedelta(weeks=interval)
+    else:
+        months = interval if freq == "monthly" else 12 * interval
+        n = 0
+        while True:
+            yield _add_months(start, n)
+            n += months
+
+def _add_months(start, months):
+    """Same day `months` months later, clamped to the end of the month"""
+    year, month = divmod(start.month - 1 + months, 12)
+    year += start.year
+    return date(year, month + 1, min(start.day, calendar.monthrange(year, month + 1)[1]))
+
+def series_start(task):
+    """Date of the first occurrence of a recurring task (its due date), or None"""
+    try:
+        return datetime.strptime(task.get("due_date") or "", "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+def occurrences(task, start, end):
+    """
+    Generate the occurrences of a recurring task due between two dates
+
+    Occurrences are virtual tasks: copies of the series task with their own
+    id ("<series id>@<date>"), due date and "recurring_id", with any fields
+    saved for that date in the task's "occurrences" overrides applied. An
+    override of {"deleted": True} drops the occurrence.
+
+    Args:
+        task: Task with a "recurrence" rule
+        start: First due date to include
+        end: Last due date to include
+
+    Yields:
+        Occurrence task dicts
+    """
+    rule = task.get("recurrence")
+    first = series_start(task)
+    if not rule or first is None:
+        return
+    overrides = task.get("occurrences") or {}
+    fields = {key: value for key, value in task.items() if key not in ("recurrence", "occurrences")}
+    for day in iter_dates(rule, first):
+        if day > end:
+            return
+        if day < start:
+            continue
+        due_date = day.isoformat()
+        override = overrides.get(due_date, {})
+        if override.get("deleted"):
+            continue
+        occurrence = dict(fields, **override)
+        occurrence["tags"] = list(occurrence.get("tags", []))
+        occurrence.update(id=f"{task['id']}{OCCURRENCE_SEPARATOR}{due_date}", due_date=due_date,
+                          done=bool(override.get("done", False)), recurring_id=task["id"])
+        yield occurrence
+
+def next_pending(task):
+    """Return the earliest occurrence of a recurring task that isn't done, or None"""
+    first = series_start(task)
+    if first is None:
+        return None
+    return next((occurrence for occurrence in occurrences(task, first, date.max) if not occurrence["done"]), None)
+
+def split_occurrence_id(occurrence_id):
+    """
+    Split an occurrence id into (series id, YYYY-MM-DD)
+
+    Returns:
+        Tuple, or None if the id is not an occurrence id
+    """
+    if not isinstance(occurrence_id, str) or OCCURRENCE_SEPARATOR not in occurrence_id:
+        return None
+    task_id, _, due_date = occurrence_id.rpartition(OCCURRENCE_SEPARATOR)
+    return task_id, due_date
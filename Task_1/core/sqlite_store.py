@@ -0,0 +1,300 @@
+import json
+import os
+import re
+import sqlite3
+from datetime import datetime, timedelta
+
+from core import storage
+
+TASK_COLUMNS = ["title", "done", "description", "priority", "category",
+                "due_date", "tags", "created_at", "updated_at", "recurrence", "occurrences"]
+
+# Columns holding JSON text; recurrence and occurrences are NULL for
+# tasks that don't repeat
+JSON_COLUMNS = ("tags", "recurrence", "occurrences")
+OPTIONAL_COLUMNS = ("recurrence", "occurrences")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    uid TEXT,
+    title TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    description TEXT NOT NULL DEFAULT '',
+    priority TEXT NOT NULL DEFAULT 'medium',
+    category TEXT NOT NULL DEFAULT '',
+    due_date TEXT,
+    tags TEXT NOT NULL DEFAULT '[]',
+    created_at TEXT,
+    updated_at TEXT,
+    recurrence TEXT,
+    occurrences TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_done ON tasks(done);
+CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks(priority);
+CREATE INDEX IF NOT EXISTS idx_tasks_category ON tasks(category COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks(due_date);
+"""
+
+# External-content FTS table kept in sync with triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+    title, description, content='tasks', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS tasks_ai AFTER INSERT ON tasks BEGIN
+    INSERT INTO tasks_fts(rowid, title, description)
+    VALUES (new.id, new.title, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_ad AFTER DELETE ON tasks BEGIN
+    INSERT INTO tasks_fts(tasks_fts, rowid, title, description)
+    VALUES ('delete', old.id, old.title, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_au AFTER UPDATE OF title, description ON tasks BEGIN
+    INSERT INTO tasks_fts(tasks_fts, rowid, title, description)
+    VALUES ('delete', old.id, old.title, old.description);
+    INSERT INTO tasks_fts(rowid, title, description)
+    VALUES (new.id, new.title, new.description);
+END;
+"""
+
+_connections = {}
+_has_fts = {}
+
+def connect():
+    """Return a (cached) connection to the task database, creating the schema"""
+    path = storage.DB_PATH
+    conn = _connections.get(path)
+    if conn is not None:
+        return conn
+
+    storage.ensure_data_dir()
+    is_new = not os.path.exists(path)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    _migrate(conn)
+    try:
+        conn.executescript(FTS_SCHEMA)
+        _has_fts[path] = True
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5; searches fall back to LIKE
+        _has_fts[path] = False
+    conn.commit()
+
+    _connections[path] = conn
+
+    # Migrate existing JSON data into a freshly created database
+    if is_new and os.path.exists(storage.FILE_PATH):
+        imported = storage.import_tasks(storage.FILE_PATH)
+        if imported:
+            save_tasks(imported)
+    return conn
+
+def _migrate(conn):
+    """Add the columns missing from databases created before they existed"""
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(tasks)")}
+    if "uid" not in columns:
+        conn.execute("ALTER TABLE tasks ADD COLUMN uid TEXT")
+        conn.execute("UPDATE tasks SET uid = lower(hex(randomblob(16))) WHERE uid IS NULL")
+    for column in OPTIONAL_COLUMNS:
+        if column not in columns:
+            conn.execute(f"ALTER TABLE tasks ADD COLUMN {column} TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_uid ON tasks(uid)")
+
+def close():
+    """Close all cached connections"""
+    for conn in _connections.values():
+        conn.close()
+    _connections.clear()
+    _has_fts.clear()
+
+def _json(value):
+    """Encode a JSON column value (None stays NULL)"""
+    return None if value is None else json.dumps(value, ensure_ascii=False)
+
+def _to_row(task):
+    """Convert a validated task dict into column values"""
+    return (
+        task["id"], task["title"], int(bool(task["done"])), task["description"],
+        task["priority"], task["category"], task["due_date"],
+        json.dumps(task["tags"], ensure_ascii=False),
+        task["created_at"], task["updated_at"],
+        _json(task.get("recurrence")), _json(task.get("occurrences"))
+    )
+
+def _to_task(row):
+    """Convert a database row into a task dict"""
+    task = {"id": row["uid"]}
+    task.update((column, row[column]) for column in TASK_COLUMNS if column not in OPTIONAL_COLUMNS)
+    task["done"] = bool(task["done"])
+    try:
+        task["tags"] = json.loads(task["tags"])
+    except (TypeError, ValueError):
+        task["tags"] = []
+    for column in OPTIONAL_COLUMNS:
+        if row[column] is not None:
+            try:
+                task[column] = json.loads(row[column])
+            except ValueError:
+                pass
+    return task
+
+def _select(where="", params=(), order_by="id"):
+    """Run a task query and return the matching task dicts"""
+    sql = f"SELECT * FROM tasks {where} ORDER BY {order_by}"
+    return [_to_task(row) for row in connect().execute(sql, params)]
+
+def _insert(conn, tasks):
+    """Insert validated tasks"""
+    placeholders = ", ".join("?" * (len(TASK_COLUMNS) + 1))
+    conn.executemany(
+        f"INSERT INTO tasks (uid, {', '.join(TASK_COLUMNS)}) VALUES ({placeholders})",
+        (_to_row(task) for task in storage.validate_tasks(list(tasks)))
+    )
+
+def _id_at(conn, index):
+    """Return the row id of the task at a list position"""
+    row = conn.execute("SELECT id FROM tasks ORDER BY id LIMIT 1 OFFSET ?", (index,)).fetchone()
+    return row["id"] if row else None
+
+def load_tasks():
+    """Load all tasks in insertion order"""
+    return _select()
+
+def count_tasks():
+    """Return the number of stored tasks"""
+    return connect().execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+def save_tasks(tasks):
+    """Replace all stored tasks in a single transaction"""
+    conn = connect()
+    with conn:
+        conn.execute("DELETE FROM tasks")
+        _insert(conn, tasks)
+    return True
+
+def apply_change(op, index=None, data=None, task_id=None, task_ids=None):
+    """
+    Apply one change without rewriting the table
+
+    Args:
+        op: "add", "update" or "delete"
+        index: Index of the changed task (update/delete), if task_id is unknown
+        data: List of added tasks (add) or dict of changed fields (update)
+        task_id: Id of the changed task (update/delete)
+        task_ids: Ids of several tasks changed the same way (one transaction)
+    """
+    conn = connect()
+    with conn:
+        if op == "add":
+            _insert(conn, data or [])
+            return
+
+        if task_ids is not None:
+            row_ids = []
+            for changed_id in task_ids:
+                row = conn.execute("SELECT id FROM tasks WHERE uid = ?", (changed_id,)).fetchone()
+                if row:
+                    row_ids.append(row["id"])
+        elif task_id is not None:
+            row = conn.execute("SELECT id FROM tasks WHERE uid = ?", (task_id,)).fetchone()
+            row_ids = [row["id"]] if row else []
+        else:
+            row_id = _id_at(conn, index) if index is not None else None
+            row_ids = [row_id] if row_id is not None else []
+        if not row_ids:
+            return
+
+        if op == "delete":
+            conn.executemany("DELETE FROM tasks WHERE id = ?", ((row_id,) for row_id in row_ids))
+        elif op == "update":
+            fields = {k: v for k, v in (data or {}).items() if k in TASK_COLUMNS}
+            for column in JSON_COLUMNS:
+                if column in fields:
+                    fields[column] = _json(fields[column])
+            if "done" in fields:
+                fields["done"] = int(bool(fields["done"]))
+            if fields:
+                assignments = ", ".join(f"{column} = ?" for column in fields)
+                conn.executemany(f"UPDATE tasks SET {assignments} WHERE id = ?",
+                                 ((*fields.values(), row_id) for row_id in row_ids))
+
+def _match_clause(term):
+    """Build a WHERE clause and parameters matching term in title/description"""
+    words = re.findall(r"\w+", term.lower())
+    if _has_fts.get(storage.DB_PATH) and words:
+        query = " ".join(f'"{word}"*' for word in words)
+        return "id IN (SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ?)", [query]
+
+    pattern = f"%{term.lower()}%"
+    return "(lower(title) LIKE ? OR lower(description) LIKE ?)", [pattern, pattern]
+
+def filter_tasks(filter_type="all", search_term="", category="", priority=""):
+    """
+    Filter stored tasks, same criteria as core.tasks.filter_tasks
+
+    Note: search terms match word prefixes when FTS5 is available
+    """
+    connect()
+    clauses, params = [], []
+    due_filter = filter_type in ("overdue", "due_week")
+    if due_filter:
+        # Recurring tasks are due through their occurrences, expanded below
+        clauses.append("recurrence IS NULL")
+
+    if filter_type == "pending":
+        clauses.append("done = 0")
+    elif filter_type == "completed":
+        clauses.append("done = 1")
+    elif filter_type == "overdue":
+        clauses.append("done = 0 AND due_date IS NOT NULL AND due_date != '' AND due_date < ?")
+        params.append(datetime.now().strftime("%Y-%m-%d"))
+    elif filter_type == "due_week":
+        today = datetime.now().date()
+        clauses.append("done = 0 AND due_date >= ? AND due_date < ?")
+        params += [today.isoformat(), (today + timedelta(days=7)).isoformat()]
+
+    if search_term:
+        clause, clause_params = _match_clause(search_term)
+        clauses.append(clause)
+        params.extend(clause_params)
+
+    if category:
+        clauses.append("category = ? COLLATE NOCASE")
+        params.append(category)
+
+    if priority:
+        clauses.append("priority = ?")
+        params.append(priority.lower())
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    matches = _select(where, params)
+    if not due_filter:
+        return matches
+
+    from core.tasks import due_occurrences
+    series = _select("WHERE recurrence IS NOT NULL AND done = 0")
+    return matches + due_occurrences(series, filter_type, search_term, category, priority)
+
+def search_tasks(query):
+    """Search tasks by title, description, tags, or category"""
+    if not query:
+        return load_tasks()
+
+    connect()
+    clause, params = _match_clause(query)
+    pattern = f"%{query.lower()}%"
+    where = f"WHERE {clause} OR lower(category) LIKE ? OR lower(tags) LIKE ?"
+    return _select(where, params + [pattern, pattern])
+
+def get_categories():
+    """Get all unique categories"""
+    rows = connect().execute(
+        "SELECT DISTINCT category FROM tasks WHERE category != '' ORDER BY category"
+    )
+    return [row["category"] for row in rows]
+
+def get_tasks_by_category(category):
+    """Get tasks in the specified category"""
+    # The NOCASE comparison lets SQLite use idx_tasks_category
+    return _select("WHERE category = ? COLLATE NOCASE AND category = ?", (category, category))
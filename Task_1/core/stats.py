@@ -0,0 +1,135 @@
+import heapq
+from datetime import datetime
+
+from core.events import ADDED, REMOVED
+from core.model import due_ordinal, encode_due
+
+PRIORITIES = ("high", "medium", "low")
+
+class TaskStats:
+    """
+    Task statistics kept current as a TaskStore changes
+
+    Counts are adjusted from the store's change events, so each change
+    costs O(1) (plus O(log n) for a pending task with a due date) and
+    reading the statistics costs O(1). Overdue tasks are found through a
+    heap of (due ordinal, rank, id) for the pending tasks (the rank breaks
+    ties, so ids of mixed types are never compared): entries are moved to
+    the overdue set as their day passes, and entries made stale by a
+    change are skipped when they reach the top.
+    """
+
+    def __init__(self, store):
+        self._store = store
+        self.rebuild()
+        store.subscribe(self._apply)
+
+    def rebuild(self):
+        """Recount everything from the store"""
+        self.total = 0
+        self.completed = 0
+        self.pending_by_priority = dict.fromkeys(PRIORITIES, 0)
+        self._due = {}
+        self._heap = []
+        self._overdue = set()
+        self._today = None
+        for task in self._store:
+            self._count(task["id"], task["done"], task.get("priority"), due_ordinal(task), 1)
+
+    def _apply(self, event):
+        """Store subscriber: take a change into account"""
+        task = event.task
+        task_id = event.task_id
+        if event.kind == ADDED:
+            self._count(task_id, task["done"], task.get("priority"), due_ordinal(task), 1)
+            return
+        if event.kind == REMOVED:
+            self._count(task_id, task["done"], task.get("priority"), due_ordinal(task), -1)
+            return
+
+        changes = event.changes
+        if not ("done" in changes or "priority" in changes or "due_date" in changes):
+            return
+        done = changes["done"][0] if "done" in changes else task["done"]
+        priority = changes["priority"][0] if "priority" in changes else task.get("priority")
+        if "due_date" in changes:
+            due = encode_due(changes["due_date"][0])
+            due = due if due and due > 0 else None
+        else:
+            due = due_ordinal(task)
+        self._count(task_id, done, priority, due, -1)
+        self._count(task_id, task["done"], task.get("priority"), due_ordinal(task), 1)
+
+    def _count(self, task_id, done, priority, due, sign):
+        """Add (sign 1) or take out (sign -1) one task's contribution"""
+        self.total += sign
+        if done:
+            self.completed += sign
+            return
+        if priority in self.pending_by_priority:
+            self.pending_by_priority[priority] += sign
+        if due is None:
+            return
+        if sign > 0:
+            self._due[task_id] = due
+            rank = self._store.rank
+            heapq.heappush(self._heap, (due, rank(task_id), task_id))
+            if len(self._heap) > 2 * len(self._due) + 64:
+                # Mostly stale entries: start over from the live ones
+                self._heap = [(due, rank(task_id), task_id) for task_id, due in self._due.items()
+                              if task_id not in self._overdue]
+                heapq.heapify(self._heap)
+        else:
+            # The heap entry goes stale and is dropped when it reaches the top
+            self._due.pop(task_id, None)
+            self._overdue.discard(task_id)
+
+    def _advance(self, today):
+        """Move the pending tasks due on or before today into the overdue set"""
+        if self._today is not None and today < self._today:
+            # The clock went back: overdue tasks may no longer be overdue
+            self.rebuild()
+        self._today = today
+        heap = self._heap
+        while heap and heap[0][0] <= today:
+            due, _, task_id = heapq.heappop(heap)
+            if self._due.get(task_id) == due:
+                self._overdue.add(task_id)
+
+    def overdue(self, today=None):
+        """Return the number of pending tasks due on or before today (a day ordinal)"""
+        self._advance(today if today is not None else datetime.now().date().toordinal())
+        return len(self._overdue)
+
+    def snapshot(self):
+        """
+        Return the statistics
+
+        Returns:
+            Same dict as storage.get_task_statistics
+        """
+        total = self.total
+        completed = self.completed
+        return {
+            "total": total,
+            "completed": completed,
+            "pending": total - completed,
+            "completion_rate": (completed / total * 100) if total > 0 else 0,
+            "high_priority": self.pending_by_priority["high"],
+            "medium_priority": self.pending_by_priority["medium"],
+            "low_priority": self.pending_by_priority["low"],
+            "overdue": self.overdue()
+        }
+
+    def verify(self):
+        """
+        Check the counts against a full recount, rebuilding them on a mismatch
+
+        Returns:
+            True if the counts were consistent
+        """
+        from core import storage
+        if self.snapshot() == storage.get_task_statistics(self._store):
+            return True
+        self.rebuild()
+        return False
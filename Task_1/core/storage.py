@@ -1,28 +1,108 @@
 import json
 import os
+from collections.abc import Mapping
 from datetime import datetime
 
+from core import metrics
+from core.model import due_ordinal
+from core.store import new_task_id
+
 # Create data directory if it doesn't exist
 DATA_DIR = "data"
 FILE_PATH = os.path.join(DATA_DIR, "todo.json")
+JOURNAL_PATH = os.path.join(DATA_DIR, "todo.journal")
+DB_PATH = os.path.join(DATA_DIR, "todo.db")
+BACKUP_DIR = os.path.join(DATA_DIR, "backup")
+COLUMNAR_PATH = os.path.join(DATA_DIR, "todo.col")
+
+# Storage backend: "json" rewrites the whole file on every save,
+# "journal" appends one record per change (see core/journal.py),
+# "sqlite" keeps tasks in an indexed database (see core/sqlite_store.py),
+# "columnar" saves a binary snapshot read through mmap (see core/columnar.py)
+STORAGE_BACKEND = os.environ.get("TODO_STORAGE", "json").lower()
+
+# Write-behind saver used by save_change (see core/writer.py)
+_saver = None
+
+# Parsed-file cache: path -> ((mtime_ns, size), validated tasks), least
+# recently used first. Files larger than CACHE_MAX_BYTES are streamed but
+# never cached, and only the CACHE_MAX_FILES most recently read files are
+# kept (the data file plus an import or two).
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_MAX_FILES = 3
+_cache = {}
 
 def ensure_data_dir():
     """Create data directory if it doesn't exist"""
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
 
+def _file_key(path):
+    """Return (mtime_ns, size) identifying the current contents of a file"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _copy_tasks(tasks):
+    """Copy tasks so callers can mutate them without touching the cache"""
+    return [dict(task, tags=list(task["tags"])) for task in tasks]
+
+def _cached_tasks(path):
+    """Return a copy of the cached tasks for path, or None if the file changed"""
+    entry = _cache.pop(path, None)
+    if entry is None or entry[0] != _file_key(path):
+        return None
+    # Put back as the most recently used
+    _cache[path] = entry
+    return _copy_tasks(entry[1])
+
+def _cache_tasks(path, key, tasks):
+    """Cache tasks (not shared with any caller) parsed from path if the file still matches key"""
+    if key is not None and key[1] <= CACHE_MAX_BYTES and _file_key(path) == key:
+        _cache.pop(path, None)
+        _cache[path] = (key, tasks)
+        while len(_cache) > CACHE_MAX_FILES:
+            _cache.pop(next(iter(_cache)), None)
+
+def invalidate_cache(path=None):
+    """Forget cached tasks for one file, or for all files"""
+    if path is None:
+        _cache.clear()
+    else:
+        _cache.pop(path, None)
+
 def load_tasks():
     """Load tasks from JSON file with error handling"""
     ensure_data_dir()
+    flush()
+    
+    if STORAGE_BACKEND == "journal":
+        from core import journal
+        return journal.load_tasks()
+    if STORAGE_BACKEND == "sqlite":
+        from core import sqlite_store
+        return sqlite_store.load_tasks()
+    if STORAGE_BACKEND == "columnar" and os.path.exists(COLUMNAR_PATH):
+        from core import columnar
+        try:
+            tasks = _cached_tasks(COLUMNAR_PATH)
+            if tasks is None:
+                key = _file_key(COLUMNAR_PATH)
+                tasks = columnar.read_tasks(COLUMNAR_PATH)
+                _cache_tasks(COLUMNAR_PATH, key, _copy_tasks(tasks))
+            return tasks
+        except Exception as e:
+            # Fall back to the JSON file below
+            print(f"Error loading columnar snapshot: {e}")
     
     if not os.path.exists(FILE_PATH):
         return []
     
     try:
-        with open(FILE_PATH, "r", encoding='utf-8') as f:
-            tasks = json.load(f)
-            # Validate tasks structure
-            return validate_tasks(tasks)
+        # Parse and validate one task at a time (iter_tasks uses the cache)
+        return list(iter_tasks(FILE_PATH))
     except (json.JSONDecodeError, KeyError, ValueError) as e:
         print(f"Error loading tasks: {e}")
         # Create backup of corrupted file
@@ -39,54 +119,356 @@ def save_tasks(tasks):
     """Save tasks to JSON file with error handling and backup"""
     ensure_data_dir()
     
+    invalidate_cache()
+    
+    # This full save supersedes any changes still waiting to be written
+    if _saver is not None:
+        _saver.discard()
+    
+    if STORAGE_BACKEND == "journal":
+        from core import journal
+        return journal.compact(tasks)
+    if STORAGE_BACKEND == "sqlite":
+        from core import sqlite_store
+        return sqlite_store.save_tasks(tasks)
+    
+    return _write_tasks(tasks)
+
+def _write_tasks(tasks, validated=False):
+    """
+    Write the whole task list atomically (json and columnar backends)
+    
+    Args:
+        tasks: Task list
+        validated: True if the tasks are already validated copies (the
+            write-behind saver's), so they are not validated again
+    """
+    ensure_data_dir()
+    invalidate_cache()
+    
     try:
-        # Create backup before saving
-        if os.path.exists(FILE_PATH):
-            backup_path = f"{FILE_PATH}.backup.{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            os.rename(FILE_PATH, backup_path)
-        
         # Validate tasks before saving
-        validated_tasks = validate_tasks(tasks)
+        validated_tasks = tasks if validated else validate_tasks(tasks)
+        
+        if STORAGE_BACKEND == "columnar":
+            from core import columnar
+            columnar.write_snapshot(validated_tasks, COLUMNAR_PATH, validated=True)
+        else:
+            # Write to a temp file first so a crash never leaves a truncated file
+            tmp_path = f"{FILE_PATH}.tmp"
+            with open(tmp_path, "w", encoding='utf-8') as f:
+                json.dump(validated_tasks, f, indent=4, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+                if metrics.ENABLED:
+                    metrics.add("bytes_written", f.tell())
+            os.replace(tmp_path, FILE_PATH)
         
-        with open(FILE_PATH, "w", encoding='utf-8') as f:
-            json.dump(validated_tasks, f, indent=4, ensure_ascii=False)
+        # Keep a deduplicated backup of the saved version
+        try:
+            from core import backup
+            backup.snapshot(validated_tasks, validated=True)
+        except Exception as e:
+            print(f"Error backing up tasks: {e}")
         
         return True
     except Exception as e:
         print(f"Error saving tasks: {e}")
         return False
 
+def _write_validated(tasks):
+    """Write-behind save function: tasks are validated copies"""
+    return _write_tasks(tasks, validated=True)
+
+def _changed_ids(op, data=None, task_id=None, task_ids=None):
+    """Return (changed ids, removed ids) of a change, with None if they aren't known"""
+    if op == "add":
+        ids = [task.get("id") for task in data or []]
+        return (ids, ()) if all(ids) else (None, ())
+    if task_ids is None:
+        if task_id is None:
+            # Addressed by position only
+            return None, ()
+        task_ids = [task_id]
+    return (task_ids, ()) if op == "update" else ((), task_ids)
+
+def _get_saver():
+    """Return the process-wide write-behind saver, creating it on first use"""
+    global _saver
+    if _saver is None:
+        from core.writer import WriteBehindSaver
+        _saver = WriteBehindSaver(_write_validated, copy=validate_task)
+    return _saver
+
+def flush():
+    """
+    Write any changes still pending from save_change
+    
+    Returns:
+        True if nothing was pending or the write succeeded
+    """
+    return _saver.flush() if _saver is not None else True
+
+def query_tasks(tasks, filter_type="all", search_term="", category="", priority=""):
+    """
+    Filter tasks, running the query in the database when the sqlite backend is active
+    
+    Returns:
+        Filtered list of tasks
+    """
+    if STORAGE_BACKEND == "sqlite":
+        from core import sqlite_store
+        return sqlite_store.filter_tasks(filter_type, search_term, category, priority)
+    
+    from core import tasks as task_ops
+    return task_ops.filter_tasks(tasks, filter_type, search_term, category, priority)
+
+def save_change(tasks, op, index=None, data=None, task_id=None, task_ids=None):
+    """
+    Persist a single change to the task list
+    
+    Args:
+        tasks: Full task list (or TaskStore) after the change was applied
+        op: "add", "update" or "delete"
+        index: Index of the changed task (update/delete), if task_id is unknown
+        data: List of added tasks (add) or dict of changed fields (update)
+        task_id: Id of the changed task (update/delete)
+        task_ids: Ids of several tasks changed the same way (update/delete),
+            saved in a single write
+    
+    Returns:
+        True if the change was saved (or, for the json and columnar
+        backends, scheduled; call flush() to force the write)
+    """
+    if STORAGE_BACKEND == "sqlite":
+        from core import sqlite_store
+        try:
+            sqlite_store.apply_change(op, index=index, data=data, task_id=task_id, task_ids=task_ids)
+            return True
+        except Exception as e:
+            print(f"Error saving change: {e}")
+            return False
+    
+    if STORAGE_BACKEND != "journal":
+        # Whole-file backends coalesce changes into one delayed write
+        changed, removed = _changed_ids(op, data, task_id, task_ids)
+        _get_saver().mark_dirty(tasks, changed, removed)
+        return True
+    
+    ensure_data_dir()
+    from core import journal
+    try:
+        journal.append(op, index=index, data=data, task_id=task_id, task_ids=task_ids)
+    except Exception as e:
+        print(f"Error saving change: {e}")
+        return False
+    journal.maybe_compact(tasks)
+    return True
+
+def save_batch(tasks, op, changed, fields=()):
+    """
+    Persist the result of a batch mutation (core.tasks.add_tasks,
+    update_where, mark_done_where, delete_where) with a single write
+    
+    Args:
+        tasks: Full task list (or TaskStore) after the change was applied
+        op: "add", "update" or "delete"
+        changed: The added, updated or deleted tasks
+        fields: Names of the updated fields (update; updated_at is implied)
+    
+    Returns:
+        True if the change was saved (or scheduled, like save_change)
+    """
+    if not changed:
+        return True
+    if op == "add":
+        return save_change(tasks, "add", data=changed)
+    
+    data = None
+    if op == "update":
+        # A batch update sets the same values on every task
+        data = {field: changed[0][field] for field in (*fields, "updated_at")}
+    return save_change(tasks, op, data=data, task_ids=[task["id"] for task in changed])
+
+def iter_tasks(filename=None):
+    """
+    Parse and validate tasks one at a time
+    
+    Reads a JSON task list, or an export file with a "tasks" array,
+    incrementally so peak memory stays at one task plus a read buffer.
+    
+    Args:
+        filename: JSON file to read (defaults to the active task storage)
+    
+    Yields:
+        Validated task dicts
+    
+    Raises:
+        json.JSONDecodeError: If the file is not valid JSON
+    """
+    if filename is None:
+        flush()
+        if STORAGE_BACKEND != "json":
+            yield from load_tasks()
+            return
+        filename = FILE_PATH
+    
+    cached = _cached_tasks(filename)
+    if cached is not None:
+        yield from cached
+        return
+    
+    key = _file_key(filename)
+    if key is None:
+        return
+    
+    # Small files are kept for the next load; large ones stay streamed
+    parsed = [] if key[1] <= CACHE_MAX_BYTES else None
+    metrics.add("bytes_read", key[1])
+    with open(filename, "r", encoding='utf-8') as f:
+        for item in _JsonStream(f).iter_task_items():
+            task = validate_task(item)
+            if task is not None:
+                if parsed is not None:
+                    parsed.append(dict(task, tags=list(task["tags"])))
+                yield task
+    
+    if parsed is not None:
+        _cache_tasks(filename, key, parsed)
+
+class _JsonStream:
+    """Minimal incremental reader for a JSON array of objects"""
+    
+    CHUNK_SIZE = 64 * 1024
+    _decoder = json.JSONDecoder()
+    
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+    
+    def _read_more(self):
+        """Append the next chunk to the buffer, dropping consumed text"""
+        chunk = self.f.read(self.CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+    
+    def _peek(self):
+        """Return the next non-whitespace character without consuming it"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._read_more():
+                return ""
+    
+    def _expect(self, char):
+        """Consume one structural character"""
+        if self._peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buf, self.pos)
+        self.pos += 1
+    
+    def _value(self):
+        """Decode the next complete JSON value"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+                # A number may continue in the next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._read_more()
+    
+    def _iter_array(self):
+        """Yield the items of the array starting at the current position"""
+        self._expect("[")
+        if self._peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._peek() == ",":
+                self.pos += 1
+                continue
+            self._expect("]")
+            return
+    
+    def iter_task_items(self):
+        """Yield raw task items from a task list or an export file"""
+        first = self._peek()
+        if first == "[":
+            yield from self._iter_array()
+        elif first == "{":
+            self.pos += 1
+            while self._peek() not in ("}", ""):
+                key = self._value()
+                self._expect(":")
+                if key == "tasks" and self._peek() == "[":
+                    yield from self._iter_array()
+                else:
+                    self._value()
+                if self._peek() == ",":
+                    self.pos += 1
+            self._expect("}")
+        elif first:
+            # Any other JSON value holds no tasks, but must still be valid
+            self._value()
+
 def validate_tasks(tasks):
-    """Validate and fix task structure"""
-    if not isinstance(tasks, list):
+    """Validate and fix task structure (tasks may be a list or a TaskStore)"""
+    if isinstance(tasks, (dict, str, bytes)) or not hasattr(tasks, "__iter__"):
         return []
     
     validated_tasks = []
     for task in tasks:
-        if not isinstance(task, dict):
-            continue
-            
-        # Ensure basic structure
-        validated_task = {
-            "title": task.get("title", "Untitled Task"),
-            "done": task.get("done", False),
-            "description": task.get("description", ""),
-            "priority": task.get("priority", "medium"),
-            "category": task.get("category", ""),
-            "due_date": task.get("due_date", ""),
-            "tags": task.get("tags", []),
-            "created_at": task.get("created_at", datetime.now().isoformat()),
-            "updated_at": task.get("updated_at", datetime.now().isoformat())
-        }
-        
-        # Validate types
-        if not isinstance(validated_task["tags"], list):
-            validated_task["tags"] = []
-        
-        validated_tasks.append(validated_task)
+        validated_task = validate_task(task)
+        if validated_task is not None:
+            validated_tasks.append(validated_task)
     
     return validated_tasks
 
+def validate_task(task):
+    """Validate and fix a single task (dict or Task), returning None if it is unusable"""
+    if not isinstance(task, Mapping):
+        return None
+    
+    # Ensure basic structure
+    validated_task = {
+        "id": task.get("id") or new_task_id(),
+        "title": task.get("title", "Untitled Task"),
+        "done": task.get("done", False),
+        "description": task.get("description", ""),
+        "priority": task.get("priority", "medium"),
+        "category": task.get("category", ""),
+        "due_date": task.get("due_date", ""),
+        "tags": task.get("tags", []),
+        "created_at": task.get("created_at", datetime.now().isoformat()),
+        "updated_at": task.get("updated_at", datetime.now().isoformat())
+    }
+    
+    # Validate types (a plain list, also for a Task's read-only tags)
+    if isinstance(validated_task["tags"], list):
+        validated_task["tags"] = list(validated_task["tags"])
+    else:
+        validated_task["tags"] = []
+    
+    # Recurring tasks keep their rule and the occurrences saved separately
+    for key in ("recurrence", "occurrences"):
+        if isinstance(task.get(key), dict):
+            validated_task[key] = task[key]
+    
+    return validated_task
+
 def export_tasks(tasks, filename):
     """Export tasks to a specific file"""
     try:
@@ -99,6 +481,8 @@ def export_tasks(tasks, filename):
         
         with open(filename, "w", encoding='utf-8') as f:
             json.dump(export_data, f, indent=4, ensure_ascii=False)
+            if metrics.ENABLED:
+                metrics.add("bytes_written", f.tell())
         return True
     except Exception as e:
         print(f"Error exporting tasks: {e}")
@@ -110,40 +494,38 @@ def import_tasks(filename):
         if not os.path.exists(filename):
             return []
         
-        with open(filename, "r", encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Handle different export formats
-        if isinstance(data, list):
-            return validate_tasks(data)
-        elif isinstance(data, dict) and "tasks" in data:
-            return validate_tasks(data["tasks"])
-        else:
-            return []
+        return list(iter_tasks(filename))
     except Exception as e:
         print(f"Error importing tasks: {e}")
         return []
 
 def get_task_statistics(tasks):
-    """Calculate and return task statistics"""
-    total = len(tasks)
-    completed = len([t for t in tasks if t["done"]])
-    pending = total - completed
-    
-    high_priority = len([t for t in tasks if t.get("priority") == "high" and not t["done"]])
-    medium_priority = len([t for t in tasks if t.get("priority") == "medium" and not t["done"]])
-    low_priority = len([t for t in tasks if t.get("priority") == "low" and not t["done"]])
-    
-    # Calculate overdue tasks
+    """Calculate and return task statistics in a single pass over any iterable of tasks"""
+    total = 0
+    completed = 0
+    pending_by_priority = {"high": 0, "medium": 0, "low": 0}
     overdue = 0
+    today = datetime.now().date().toordinal()
+    
     for task in tasks:
-        if task.get("due_date") and not task["done"]:
-            try:
-                due_date = datetime.strptime(task["due_date"], "%Y-%m-%d")
-                if due_date < datetime.now():
-                    overdue += 1
-            except ValueError:
-                continue
+        total += 1
+        if task["done"]:
+            completed += 1
+            continue
+        
+        priority = task.get("priority")
+        if priority in pending_by_priority:
+            pending_by_priority[priority] += 1
+        
+        # Calculate overdue tasks (due at midnight before now)
+        due = due_ordinal(task)
+        if due is not None and due <= today:
+            overdue += 1
+    
+    pending = total - completed
+    high_priority = pending_by_priority["high"]
+    medium_priority = pending_by_priority["medium"]
+    low_priority = pending_by_priority["low"]
     
     # Calculate completion percentage
     completion_rate = (completed / total * 100) if total > 0 else 0
@@ -157,4 +539,25 @@ def get_task_statistics(tasks):
         "medium_priority": medium_priority,
         "low_priority": low_priority,
         "overdue": overdue
-    }
\ No newline at end of file
+    }
+
+def get_stored_statistics():
+    """
+    Calculate statistics for the stored tasks without loading them
+    
+    Uses the columnar snapshot's columns directly when that backend is
+    active, and otherwise streams the tasks through get_task_statistics.
+    """
+    if STORAGE_BACKEND == "columnar" and os.path.exists(COLUMNAR_PATH):
+        from core import columnar
+        try:
+            with columnar.ColumnarSnapshot(COLUMNAR_PATH) as snapshot:
+                return snapshot.statistics()
+        except Exception as e:
+            print(f"Error reading columnar snapshot: {e}")
+    
+    return get_task_statistics(iter_tasks())
+
+metrics.instrument(globals(), ("load_tasks", "save_tasks", "_write_tasks", "flush", "query_tasks", "save_change",
+                               "save_batch", "validate_tasks", "export_tasks", "import_tasks",
+                               "get_task_statistics", "get_stored_statistics"), "storage")
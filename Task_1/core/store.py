@@ -0,0 +1,331 @@
+import uuid
+from datetime import datetime
+
+from core.events import ADDED, EVENT_KINDS, REMOVED, UPDATED, TaskEvent, diff
+from core.index import ALL_FIELDS, FieldIndex, SortedView, TokenIndex
+from core.model import Task
+
+def new_task_id():
+    """Generate a stable, unique task id"""
+    return uuid.uuid4().hex
+
+class TaskStore:
+    """
+    Task collection addressed by stable task ids
+
+    Tasks live in an id -> task dict, so lookup, update and delete are O(1)
+    while iteration still follows insertion order. Positional access
+    (store[i], id_at) is kept for the index-based helpers in core.tasks.
+    Tasks are held as compact Task objects (see core/model.py).
+
+    Indexes (see core/index.py) are kept current on every add, update and
+    delete, so tasks should be changed through the store, not in place.
+    Subscribers receive a TaskEvent (see core/events.py) for every change.
+    """
+
+    def __init__(self, tasks=()):
+        self._tasks = {}
+        self._order = None
+        self._rank = {}
+        self._next_rank = 0
+        self._indexes = []
+        self._token_index = None
+        self._field_index = None
+        self._sorted_views = {}
+        self._subscribers = []
+        self._statistics = None
+        for task in tasks:
+            self.add(task)
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def __iter__(self):
+        return iter(self._tasks.values())
+
+    def __contains__(self, task_id):
+        return task_id in self._tasks
+
+    def __getitem__(self, index):
+        """Return the task at a display position (or a list for a slice)"""
+        return self._ordered_tasks()[index]
+
+    def _ordered_tasks(self):
+        """Positional view, rebuilt lazily after the store changes"""
+        if self._order is None:
+            self._order = list(self._tasks.values())
+        return self._order
+
+    def get(self, task_id):
+        """Return the task with this id, or None"""
+        return self._tasks.get(task_id)
+
+    def rank(self, task_id):
+        """Return the insertion number of a task, which orders the display"""
+        return self._rank[task_id]
+
+    def last(self):
+        """Return the most recently added task, or None"""
+        if not self._tasks:
+            return None
+        return next(reversed(self._tasks.values()))
+
+    def ids(self):
+        """Return all task ids in display order"""
+        return list(self._tasks)
+
+    def id_at(self, index):
+        """Return the id of the task at a display position, or None"""
+        tasks = self._ordered_tasks()
+        if 0 <= index < len(tasks):
+            return tasks[index]["id"]
+        return None
+
+    def resolve(self, key):
+        """
+        Return the task id for a task id or a display position, or None
+
+        A key that is a task id wins, so imported tasks keeping a foreign
+        integer id are found by it rather than by position.
+        """
+        if key in self._tasks:
+            return key
+        if isinstance(key, str):
+            return None
+        return self.id_at(key)
+
+    def add(self, task):
+        """
+        Add a task, assigning an id if it has none
+
+        Task dicts are converted to Task objects.
+
+        Returns:
+            The task id
+        """
+        task = Task.from_dict(task)
+        task_id = task.id
+        if not task_id or task_id in self._tasks:
+            task_id = task["id"] = new_task_id()
+        self._tasks[task_id] = task
+        self._rank[task_id] = self._next_rank
+        self._next_rank += 1
+        self._order = None
+        for index in self._indexes:
+            index.add(task)
+        if self._subscribers:
+            self._emit(TaskEvent(ADDED, task, rank=self._rank[task_id]))
+        return task_id
+
+    def append(self, task):
+        """List-compatible alias for add()"""
+        self.add(task)
+
+    def extend(self, tasks):
+        """
+        Add several tasks
+
+        Returns:
+            List of their task ids
+        """
+        return [self.add(task) for task in tasks]
+
+    def update(self, task_id, **fields):
+        """
+        Update task fields and refresh updated_at
+
+        Returns:
+            The updated task, or None if the id is unknown
+        """
+        task = self._tasks.get(task_id)
+        if task is None:
+            return None
+        fields.pop("id", None)
+        fields.setdefault("updated_at", datetime.now().isoformat())
+        old = {field: task.get(field) for field in fields} if self._subscribers else None
+        for index in self._indexes:
+            index.remove(task)
+        task.update(fields)
+        for index in self._indexes:
+            index.add(task)
+        if old is not None:
+            self._emit(TaskEvent(UPDATED, task, diff(old, task, fields), self._rank[task_id]))
+        return task
+
+    def replace(self, task):
+        """
+        Swap in a new version of a stored task (same id)
+
+        Returns:
+            The previous version, or None if the id is unknown
+        """
+        old = self._tasks.get(task.id)
+        if old is None:
+            return None
+        for index in self._indexes:
+            index.remove(old)
+        self._tasks[task.id] = task
+        self._order = None
+        for index in self._indexes:
+            index.add(task)
+        if self._subscribers:
+            fields = set(old) | set(task)
+            self._emit(TaskEvent(UPDATED, task, diff(old, task, fields), self._rank[task.id]))
+        return old
+
+    def restore(self, task, rank):
+        """Put a deleted task back at its former display position"""
+        task_id = task.id
+        if task_id in self._tasks:
+            return
+        later = bool(self._tasks) and self._rank[next(reversed(self._tasks))] > rank
+        if later:
+            # Display order is insertion order: copy the tasks over with
+            # this one in front of the first later task (one pass, no sort)
+            items = iter(self._tasks.items())
+            tasks = {}
+            for other_id, other in items:
+                if self._rank[other_id] > rank:
+                    tasks[task_id] = task
+                    tasks[other_id] = other
+                    break
+                tasks[other_id] = other
+            tasks.update(items)
+            self._tasks = tasks
+        else:
+            self._tasks[task_id] = task
+        self._rank[task_id] = rank
+        self._order = None
+        for index in self._indexes:
+            index.add(task)
+        if self._subscribers:
+            self._emit(TaskEvent(ADDED, task, rank=rank))
+
+    def toggle(self, task_id):
+        """Toggle the done flag of a task"""
+        task = self._tasks.get(task_id)
+        if task is None:
+            return None
+        return self.update(task_id, done=not task["done"])
+
+    def delete(self, task_id):
+        """
+        Remove a task
+
+        Returns:
+            The removed task, or None if the id is unknown
+        """
+        task = self._tasks.pop(task_id, None)
+        if task is not None:
+            self._order = None
+            for index in self._indexes:
+                index.remove(task)
+            rank = self._rank.pop(task_id)
+            if self._subscribers:
+                self._emit(TaskEvent(REMOVED, task, rank=rank))
+        return task
+
+    def add_index(self, index):
+        """Register an index (with rebuild/add/remove methods) and fill it with the current tasks"""
+        index.rebuild(self._tasks.values())
+        self._indexes.append(index)
+        return index
+
+    def subscribe(self, callback, kinds=EVENT_KINDS):
+        """
+        Call `callback(event)` after every change of the given kinds
+
+        Returns:
+            The callback, for unsubscribe()
+        """
+        self._subscribers.append((callback, frozenset(kinds)))
+        return callback
+
+    def unsubscribe(self, callback):
+        """Stop sending events to a callback"""
+        self._subscribers = [(subscriber, kinds) for subscriber, kinds in self._subscribers
+                             if subscriber is not callback]
+
+    def _emit(self, event):
+        for callback, kinds in list(self._subscribers):
+            if event.kind in kinds:
+                callback(event)
+
+    def token_index(self):
+        """Return the search index, building it on first use"""
+        if self._token_index is None:
+            self._token_index = self.add_index(TokenIndex())
+        return self._token_index
+
+    def field_index(self):
+        """Return the status/category/priority/due-date indexes, building them on first use"""
+        if self._field_index is None:
+            self._field_index = self.add_index(FieldIndex(self._rank.__getitem__))
+        return self._field_index
+
+    def statistics(self):
+        """Return the statistics accumulator (core.stats.TaskStats), created on first use"""
+        if self._statistics is None:
+            from core.stats import TaskStats
+            self._statistics = TaskStats(self)
+        return self._statistics
+
+    def sorted_view(self, sort_by):
+        """Return the maintained view for an ordering (see core.query.sort_key), building it on first use"""
+        from core.query import ORDERS, sort_key
+        if sort_by not in ORDERS:
+            sort_by = "created"
+        view = self._sorted_views.get(sort_by)
+        if view is None:
+            view = self._sorted_views[sort_by] = self.add_index(
+                SortedView(sort_key(sort_by, compact=True), self._rank.__getitem__))
+        return view
+
+    def select(self, task_ids):
+        """Return the tasks with the given ids, in display order"""
+        if len(task_ids) * 8 > len(self._tasks):
+            return [task for task_id, task in self._tasks.items() if task_id in task_ids]
+        return [self._tasks[task_id] for task_id in sorted(task_ids, key=self._rank.__getitem__)]
+
+    def search(self, query, fields=ALL_FIELDS):
+        """
+        Search tasks through the token index
+
+        Returns:
+            Matching tasks in display order, or None if the query has no words
+        """
+        task_ids = self.token_index().search(query, fields)
+        return None if task_ids is None else self.select(task_ids)
+
+    def fuzzy_search(self, query, fields=ALL_FIELDS):
+        """
+        Typo-tolerant search through the token index
+
+        Returns:
+            Matching tasks, closest first (ties in display order), or None if the query has no words
+        """
+        distances = self.token_index().fuzzy_search(query, fields)
+        if distances is None:
+            return None
+        ranked = sorted(distances, key=lambda task_id: (distances[task_id], self._rank[task_id]))
+        return [self._tasks[task_id] for task_id in ranked]
+
+    def ranked_search(self, query, fields=ALL_FIELDS, limit=None):
+        """
+        BM25-ranked search through the token index
+
+        Returns:
+            Matching tasks, best first (ties in display order), or None if the query has no words
+        """
+        ranked = self.token_index().ranked_search(query, fields, limit, rank=self._rank.__getitem__)
+        if ranked is None:
+            return None
+        return [self._tasks[task_id] for _, task_id in ranked]
+
+    def to_list(self):
+        """Return the tasks as a plain list in display order"""
+        return list(self._tasks.values())
+
+    def to_dicts(self):
+        """Return the tasks as plain task dicts in display order"""
+        return [task.to_dict() for task in self._tasks.values()]
@@ -0,0 +1,71 @@
+import sys
+
+class SymbolTable:
+    """
+    Interned names (categories, tags) with the tasks using each one
+
+    Every distinct name gets a small integer code, assigned once and kept for
+    the life of the table; the ids of the tasks carrying it are kept per code,
+    so counts and listings cost O(#names) and a lookup (also case-insensitive)
+    costs O(1) instead of scanning the tasks.
+    """
+
+    def __init__(self):
+        self._codes = {}
+        self._folded = {}
+        self.names = []
+        self._members = []
+
+    def __len__(self):
+        """Number of names in use by at least one task"""
+        return sum(1 for members in self._members if members)
+
+    def intern(self, name):
+        """Return the code of a name, assigning the next free one if it is new"""
+        code = self._codes.get(name)
+        if code is None:
+            if isinstance(name, str):
+                name = sys.intern(name)
+            code = len(self.names)
+            self._codes[name] = code
+            self._folded.setdefault(_fold(name), []).append(code)
+            self.names.append(name)
+            self._members.append(set())
+        return code
+
+    def code(self, name):
+        """Return the code of a name, or None if it was never used"""
+        return self._codes.get(name)
+
+    def add(self, name, task_id):
+        """Record that a task carries a name"""
+        self._members[self.intern(name)].add(task_id)
+
+    def discard(self, name, task_id):
+        """Record that a task no longer carries a name"""
+        code = self._codes.get(name)
+        if code is not None:
+            self._members[code].discard(task_id)
+
+    def count(self, name):
+        """Number of tasks carrying a name"""
+        code = self._codes.get(name)
+        return 0 if code is None else len(self._members[code])
+
+    def counts(self):
+        """Return {name: number of tasks} for the names in use"""
+        return {name: len(members) for name, members in zip(self.names, self._members) if members}
+
+    def ids(self, name, ignore_case=False):
+        """Return the ids of the tasks carrying a name"""
+        if not ignore_case:
+            code = self._codes.get(name)
+            return set() if code is None else set(self._members[code])
+        matches = set()
+        for code in self._folded.get(_fold(name), ()):
+            matches |= self._members[code]
+        return matches
+
+def _fold(value):
+    """Lowercase strings; other values are matched as-is"""
+    return value.lower() if isinstance(value, str) else value
@@ -1,22 +1,70 @@
-from datetime import datetime
+from collections import Counter
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+import hashlib
 import re
 
-def add_task(task_list, title, description="", category="", priority="medium", due_date=None, tags=None):
+from core import metrics
+from core.index import TEXT_FIELDS, TokenIndex
+from core.model import TASK_FIELDS
+from core.query import Query, sort_key
+from core.recurrence import make_rule, occurrences, series_start, split_occurrence_id
+from core.store import TaskStore, new_task_id
+
+def _update_fields(task_list, index, fields):
+    """
+    Apply field changes to one task
+    
+    Args:
+        task_list: List of tasks or TaskStore
+        index: Position of the task, or its id for a TaskStore
+        fields: Dict of changed fields
+    
+    Returns:
+        The updated task, or None if there is no such task
+    """
+    if isinstance(task_list, TaskStore):
+        return task_list.update(task_list.resolve(index), **fields)
+    
+    if 0 <= index < len(task_list):
+        task_list[index].update(fields)
+        return task_list[index]
+    return None
+
+def _get_task(task_list, index):
+    """Return the task at a position (or with an id for a TaskStore), or None"""
+    if isinstance(task_list, TaskStore):
+        return task_list.get(task_list.resolve(index))
+    if 0 <= index < len(task_list):
+        return task_list[index]
+    return None
+
+def add_task(task_list, title, description="", category="", priority="medium", due_date=None, tags=None,
+             recurrence=None):
     """
     Add a new task to the task list with advanced properties
     
     Args:
-        task_list: List of existing tasks
+        task_list: List of existing tasks or TaskStore
         title: Task title (required)
         description: Task description
         category: Task category
         priority: Priority level (high/medium/low)
         due_date: Due date in YYYY-MM-DD format
         tags: List of tags
+        recurrence: Recurrence rule (see core.recurrence.make_rule) or frequency
+            name; the due date (default: today) is the first occurrence
     
     Returns:
         Updated task list
     """
+    now = datetime.now().isoformat()
+    task_list.append(_build_task(now, title, description, category, priority, due_date, tags, recurrence))
+    return task_list
+
+def _build_task(now, title, description="", category="", priority="medium", due_date=None, tags=None,
+                recurrence=None):
+    """Validate add_task arguments and build a task created at `now` (raises ValueError without a title)"""
     if not title or not title.strip():
         raise ValueError("Task title cannot be empty")
     
@@ -38,6 +86,7 @@ def add_task(task_list, title, description="", category="", priority="medium", d
         tags = [tag.strip() for tag in tags.split(",") if tag.strip()]
     
     task = {
+        "id": new_task_id(),
         "title": title.strip(),
         "description": description.strip(),
         "category": category.strip(),
@@ -45,25 +94,28 @@ def add_task(task_list, title, description="", category="", priority="medium", d
         "due_date": due_date,
         "tags": tags,
         "done": False,
-        "created_at": datetime.now().isoformat(),
-        "updated_at": datetime.now().isoformat()
+        "created_at": now,
+        "updated_at": now
     }
-    
-    task_list.append(task)
-    return task_list
+    if recurrence:
+        task["recurrence"] = make_rule(recurrence) if isinstance(recurrence, str) else make_rule(**recurrence)
+        task["due_date"] = due_date or now[:10]
+    return task
 
 def delete_task(task_list, index):
     """
     Delete a task by index
     
     Args:
-        task_list: List of tasks
-        index: Index of task to delete
+        task_list: List of tasks or TaskStore
+        index: Index of task to delete (or its id for a TaskStore)
     
     Returns:
         Updated task list
     """
-    if 0 <= index < len(task_list):
+    if isinstance(task_list, TaskStore):
+        task_list.delete(task_list.resolve(index))
+    elif 0 <= index < len(task_list):
         task_list.pop(index)
     return task_list
 
@@ -72,15 +124,13 @@ def mark_done(task_list, index):
     Mark a task as done
     
     Args:
-        task_list: List of tasks
-        index: Index of task to mark as done
+        task_list: List of tasks or TaskStore
+        index: Index of task to mark as done (or its id for a TaskStore)
     
     Returns:
         Updated task list
     """
-    if 0 <= index < len(task_list):
-        task_list[index]["done"] = True
-        task_list[index]["updated_at"] = datetime.now().isoformat()
+    _update_fields(task_list, index, {"done": True, "updated_at": datetime.now().isoformat()})
     return task_list
 
 def mark_pending(task_list, index):
@@ -88,15 +138,13 @@ def mark_pending(task_list, index):
     Mark a task as pending (not done)
     
     Args:
-        task_list: List of tasks
-        index: Index of task to mark as pending
+        task_list: List of tasks or TaskStore
+        index: Index of task to mark as pending (or its id for a TaskStore)
     
     Returns:
         Updated task list
     """
-    if 0 <= index < len(task_list):
-        task_list[index]["done"] = False
-        task_list[index]["updated_at"] = datetime.now().isoformat()
+    _update_fields(task_list, index, {"done": False, "updated_at": datetime.now().isoformat()})
     return task_list
 
 def toggle_task(task_list, index):
@@ -104,15 +152,15 @@ def toggle_task(task_list, index):
     Toggle task completion status
     
     Args:
-        task_list: List of tasks
-        index: Index of task to toggle
+        task_list: List of tasks or TaskStore
+        index: Index of task to toggle (or its id for a TaskStore)
     
     Returns:
         Updated task list
     """
-    if 0 <= index < len(task_list):
-        task_list[index]["done"] = not task_list[index]["done"]
-        task_list[index]["updated_at"] = datetime.now().isoformat()
+    task = _get_task(task_list, index)
+    if task is not None:
+        _update_fields(task_list, index, {"done": not task["done"], "updated_at": datetime.now().isoformat()})
     return task_list
 
 def update_task(task_list, index, **kwargs):
@@ -120,24 +168,25 @@ def update_task(task_list, index, **kwargs):
     Update task properties
     
     Args:
-        task_list: List of tasks
-        index: Index of task to update
+        task_list: List of tasks or TaskStore
+        index: Index of task to update (or its id for a TaskStore)
         **kwargs: Task properties to update
     
     Returns:
         Updated task list
     """
-    if 0 <= index < len(task_list):
-        task = task_list[index]
-        
+    task = _get_task(task_list, index)
+    if task is not None:
         # Update provided fields
+        fields = {}
         for key, value in kwargs.items():
-            if key in task and key not in ["created_at", "updated_at"]:
+            if key in task and key not in ["id", "created_at", "updated_at"]:
                 if key == "tags" and isinstance(value, str):
                     value = [tag.strip() for tag in value.split(",") if tag.strip()]
-                task[key] = value
+                fields[key] = value
         
-        task["updated_at"] = datetime.now().isoformat()
+        fields["updated_at"] = datetime.now().isoformat()
+        _update_fields(task_list, index, fields)
     
     return task_list
 
@@ -145,9 +194,13 @@ def filter_tasks(task_list, filter_type="all", search_term="", category="", prio
     """
     Filter tasks based on various criteria
     
+    On a TaskStore the criteria are answered from its indexes; the search
+    term is looked up in the token index, where each word matches as a
+    word prefix.
+    
     Args:
         task_list: List of tasks to filter
-        filter_type: all, pending, completed, overdue
+        filter_type: all, pending, completed, overdue, due_week
         search_term: Text to search in title and description
         category: Filter by category
         priority: Filter by priority
@@ -155,42 +208,86 @@ def filter_tasks(task_list, filter_type="all", search_term="", category="", prio
     Returns:
         Filtered list of tasks
     """
-    filtered_tasks = task_list.copy()
-    
-    # Apply status filter
-    if filter_type == "pending":
-        filtered_tasks = [task for task in filtered_tasks if not task["done"]]
-    elif filter_type == "completed":
-        filtered_tasks = [task for task in filtered_tasks if task["done"]]
-    elif filter_type == "overdue":
-        today = datetime.now().strftime("%Y-%m-%d")
-        filtered_tasks = [task for task in filtered_tasks 
-                         if task.get("due_date") and not task["done"] 
-                         and task["due_date"] < today]
-    
-    # Apply search filter
-    if search_term:
-        search_term = search_term.lower()
-        filtered_tasks = [task for task in filtered_tasks 
-                         if (search_term in task["title"].lower() or 
-                             search_term in task.get("description", "").lower())]
-    
-    # Apply category filter
-    if category:
-        filtered_tasks = [task for task in filtered_tasks 
-                         if task.get("category", "").lower() == category.lower()]
-    
-    # Apply priority filter
-    if priority:
-        filtered_tasks = [task for task in filtered_tasks 
-                         if task.get("priority", "").lower() == priority.lower()]
-    
-    return filtered_tasks
+    query = Query(filter_type, category, priority, search_term, text_fields=TEXT_FIELDS)
+    matches = query.run(task_list)
+    if filter_type not in ("overdue", "due_week"):
+        return matches
+    
+    # Recurring tasks are due through their occurrences, not their first due date
+    series = _recurring_tasks(task_list)
+    if not series:
+        return matches
+    matches = [task for task in matches if not task.get("recurrence")]
+    return matches + due_occurrences(series, filter_type, search_term, category, priority)
+
+def due_occurrences(series, filter_type, search_term="", category="", priority=""):
+    """
+    Pending occurrences of recurring tasks for the "overdue" or "due_week" view
+    
+    Args:
+        series: Recurring tasks
+        filter_type: overdue or due_week
+        search_term, category, priority: As for filter_tasks
+    
+    Returns:
+        Matching occurrences, earliest first
+    """
+    today = datetime.now().date()
+    end = today - timedelta(days=1) if filter_type == "overdue" else today + timedelta(days=6)
+    due = []
+    for task in series:
+        if task["done"]:
+            # A completed series has no more occurrences
+            continue
+        start = today if filter_type == "due_week" else series_start(task)
+        due.extend(occurrence for occurrence in occurrences(task, start or today, end) if not occurrence["done"])
+    return Query("all", category, priority, search_term, order_by="due_date", text_fields=TEXT_FIELDS).run(due)
+
+def _recurring_tasks(task_list):
+    """Return the tasks that have a recurrence rule"""
+    if isinstance(task_list, TaskStore):
+        return task_list.select(task_list.field_index().recurring)
+    return [task for task in task_list if task.get("recurrence")]
+
+def update_occurrence(task_list, occurrence_id, **fields):
+    """
+    Change one occurrence of a recurring task
+    
+    The changed fields are saved on the series task under "occurrences",
+    keyed by the occurrence date; other occurrences stay virtual.
+    
+    Args:
+        task_list: List of tasks or TaskStore
+        occurrence_id: Occurrence id ("<series id>@<YYYY-MM-DD>")
+        **fields: Fields to set on the occurrence (e.g. done=True, or
+            deleted=True to drop it)
+    
+    Returns:
+        The updated series task, or None if there is no such occurrence
+    """
+    parts = split_occurrence_id(occurrence_id)
+    if parts is None:
+        return None
+    task_id, due_date = parts
+    if isinstance(task_list, TaskStore):
+        key = task_id if task_id in task_list else None
+    else:
+        key = next((index for index, task in enumerate(task_list) if task.get("id") == task_id), None)
+    if key is None:
+        return None
+    
+    task = _get_task(task_list, key)
+    overrides = dict(task.get("occurrences") or {})
+    overrides[due_date] = dict(overrides.get(due_date, {}), **fields)
+    return _update_fields(task_list, key, {"occurrences": overrides, "updated_at": datetime.now().isoformat()})
 
 def sort_tasks(task_list, sort_by="created", reverse=False):
     """
     Sort tasks by various criteria
     
+    A TaskStore is read from a maintained sorted view instead of being
+    re-sorted.
+    
     Args:
         task_list: List of tasks to sort
         sort_by: created, due_date, priority, title, category
@@ -202,36 +299,24 @@ def sort_tasks(task_list, sort_by="created", reverse=False):
     if not task_list:
         return task_list
     
-    sorted_tasks = task_list.copy()
-    
-    # Priority order for sorting
-    priority_order = {"high": 3, "medium": 2, "low": 1}
-    
-    def get_sort_key(task):
-        if sort_by == "created":
-            return task.get("created_at", "")
-        elif sort_by == "due_date":
-            due_date = task.get("due_date", "9999-12-31")  # Put tasks without due date last
-            return due_date
-        elif sort_by == "priority":
-            return priority_order.get(task.get("priority", "medium"), 2)
-        elif sort_by == "title":
-            return task["title"].lower()
-        elif sort_by == "category":
-            return task.get("category", "").lower()
-        else:
-            return task.get("created_at", "")
-    
-    sorted_tasks.sort(key=get_sort_key, reverse=reverse)
-    return sorted_tasks
+    if isinstance(task_list, TaskStore):
+        return list(task_list.sorted_view(sort_by).iter(reverse))
+    return sorted(task_list, key=sort_key(sort_by), reverse=reverse)
 
-def search_tasks(task_list, query):
+def search_tasks(task_list, query, mode="exact", limit=None):
     """
     Search tasks by title, description, tags, or category
     
+    On a TaskStore the query is looked up in its token index, where each
+    word matches as a word prefix.
+    
     Args:
         task_list: List of tasks to search
         query: Search query
+        mode: "exact", "fuzzy" to tolerate typos in each query word
+            (closest match first) or "ranked" for BM25 relevance ranking
+            (best match first; title matches weigh most)
+        limit: Maximum number of results in ranked mode
     
     Returns:
         List of matching tasks
@@ -239,6 +324,19 @@ def search_tasks(task_list, query):
     if not query:
         return task_list
     
+    if mode == "fuzzy":
+        results = _fuzzy_search(task_list, query)
+        if results is not None:
+            return results
+    elif mode == "ranked":
+        results = _ranked_search(task_list, query, limit)
+        if results is not None:
+            return results
+    elif isinstance(task_list, TaskStore):
+        results = task_list.search(query)
+        if results is not None:
+            return results
+    
     query = query.lower()
     results = []
     
@@ -266,6 +364,32 @@ def search_tasks(task_list, query):
     
     return results
 
+def _fuzzy_search(task_list, query):
+    """Fuzzy search_tasks; a plain list is indexed by position for this one query"""
+    if isinstance(task_list, TaskStore):
+        return task_list.fuzzy_search(query)
+    
+    task_list = list(task_list)
+    index = TokenIndex()
+    index.rebuild(task_list, range(len(task_list)))
+    distances = index.fuzzy_search(query)
+    if distances is None:
+        return None
+    return [task_list[position] for position in sorted(distances, key=lambda p: (distances[p], p))]
+
+def _ranked_search(task_list, query, limit):
+    """Ranked search_tasks; a plain list is indexed by position for this one query"""
+    if isinstance(task_list, TaskStore):
+        return task_list.ranked_search(query, limit=limit)
+    
+    task_list = list(task_list)
+    index = TokenIndex()
+    index.rebuild(task_list, range(len(task_list)))
+    ranked = index.ranked_search(query, limit=limit, rank=int)
+    if ranked is None:
+        return None
+    return [task_list[position] for _, position in ranked]
+
 def get_categories(task_list):
     """
     Get all unique categories from task list
@@ -273,6 +397,9 @@ def get_categories(task_list):
     Returns:
         List of unique categories
     """
+    if isinstance(task_list, TaskStore):
+        return task_list.field_index().categories()
+    
     categories = set()
     for task in task_list:
         if task.get("category"):
@@ -286,8 +413,36 @@ def get_tasks_by_category(task_list, category):
     Returns:
         List of tasks in the specified category
     """
+    if isinstance(task_list, TaskStore):
+        return task_list.select(task_list.field_index().with_category(category))
     return [task for task in task_list if task.get("category") == category]
 
+def get_category_counts(task_list):
+    """
+    Count the tasks in each category
+    
+    Returns:
+        Dict of category -> number of tasks, sorted by category
+    """
+    if isinstance(task_list, TaskStore):
+        return task_list.field_index().category_counts()
+    
+    counts = Counter(task.get("category", "") for task in task_list)
+    return {category: counts[category] for category in sorted(counts, key=str)}
+
+def get_tag_counts(task_list):
+    """
+    Count the tasks carrying each tag
+    
+    Returns:
+        Dict of tag -> number of tasks, sorted by tag
+    """
+    if isinstance(task_list, TaskStore):
+        return task_list.field_index().tag_counts()
+    
+    counts = Counter(tag for task in task_list for tag in set(task.get("tags", [])))
+    return {tag: counts[tag] for tag in sorted(counts)}
+
 def clear_completed_tasks(task_list):
     """
     Remove all completed tasks from the list
@@ -295,26 +450,271 @@ def clear_completed_tasks(task_list):
     Returns:
         Updated task list with only pending tasks
     """
+    if isinstance(task_list, TaskStore):
+        for task in [task for task in task_list if task["done"]]:
+            task_list.delete(task["id"])
+        return task_list
     return [task for task in task_list if not task["done"]]
 
 def duplicate_task(task_list, index):
     """
     Duplicate a task
     
+    A TaskStore appends the copy at the end in O(1); a list inserts it
+    right after the original.
+    
     Returns:
         Updated task list with duplicated task
     """
-    if 0 <= index < len(task_list):
-        original_task = task_list[index]
+    original_task = _get_task(task_list, index)
+    if original_task is not None:
         new_task = original_task.copy()
+        new_task["id"] = new_task_id()
+        new_task["tags"] = list(original_task.get("tags", []))
         new_task["title"] = f"{original_task['title']} (Copy)"
         new_task["created_at"] = datetime.now().isoformat()
         new_task["updated_at"] = datetime.now().isoformat()
         new_task["done"] = False
-        task_list.insert(index + 1, new_task)
+        if isinstance(task_list, TaskStore):
+            task_list.add(new_task)
+        else:
+            task_list.insert(index + 1, new_task)
     
     return task_list
 
+def _matching(task_list, where):
+    """
+    Resolve a batch selector to (position or id, task) pairs
+    
+    Args:
+        task_list: List of tasks or TaskStore
+        where: Predicate taking a task, or an iterable of positions (ids for a TaskStore)
+    """
+    if callable(where):
+        if isinstance(task_list, TaskStore):
+            return [(task["id"], task) for task in task_list if where(task)]
+        return [(index, task) for index, task in enumerate(task_list) if where(task)]
+    
+    matches = []
+    for key in dict.fromkeys(where):
+        task = _get_task(task_list, key)
+        if task is not None:
+            matches.append((task["id"] if isinstance(task_list, TaskStore) else key, task))
+    return matches
+
+def add_tasks(task_list, items):
+    """
+    Add several tasks at once
+    
+    Every item is validated before any task is added, and all new tasks
+    share one timestamp.
+    
+    Args:
+        task_list: List of existing tasks or TaskStore
+        items: Iterable of dicts with add_task arguments (title, description, ...)
+    
+    Returns:
+        Tuple (updated task list, list of added tasks)
+    
+    Raises:
+        ValueError: If an item has no title (nothing is added)
+    """
+    now = datetime.now().isoformat()
+    new_tasks = [_build_task(now, **item) for item in items]
+    if isinstance(task_list, TaskStore):
+        return task_list, [task_list.get(task_id) for task_id in task_list.extend(new_tasks)]
+    task_list.extend(new_tasks)
+    return task_list, new_tasks
+
+def update_where(task_list, where, **kwargs):
+    """
+    Update the same properties on every matching task
+    
+    Args:
+        task_list: List of tasks or TaskStore
+        where: Predicate taking a task, or an iterable of positions (ids for a TaskStore)
+        **kwargs: Task properties to update (id and timestamps are ignored)
+    
+    Returns:
+        Tuple (updated task list, list of updated tasks)
+    """
+    fields = {}
+    for key, value in kwargs.items():
+        if key in TASK_FIELDS and key not in ["id", "created_at", "updated_at"]:
+            if key == "tags" and isinstance(value, str):
+                value = [tag.strip() for tag in value.split(",") if tag.strip()]
+            fields[key] = value
+    fields["updated_at"] = datetime.now().isoformat()
+    
+    updated = []
+    for key, _ in _matching(task_list, where):
+        if "tags" in fields:
+            # Every task gets its own tags list
+            fields["tags"] = list(fields["tags"])
+        updated.append(_update_fields(task_list, key, fields))
+    return task_list, updated
+
+def mark_done_where(task_list, where):
+    """
+    Mark every matching pending task as done
+    
+    Returns:
+        Tuple (updated task list, list of tasks that were marked done)
+    """
+    pending = [key for key, task in _matching(task_list, where) if not task["done"]]
+    return update_where(task_list, pending, done=True)
+
+def delete_where(task_list, where):
+    """
+    Delete every matching task
+    
+    A plain list is rebuilt once instead of popping task by task.
+    
+    Returns:
+        Tuple (updated task list, list of deleted tasks)
+    """
+    matches = _matching(task_list, where)
+    if isinstance(task_list, TaskStore):
+        for task_id, _ in matches:
+            task_list.delete(task_id)
+        return task_list, [task for _, task in matches]
+    
+    doomed = {index for index, _ in matches}
+    task_list[:] = [task for index, task in enumerate(task_list) if index not in doomed]
+    return task_list, [task for _, task in matches]
+
+DUPLICATE_POLICIES = ("skip", "merge", "update")
+
+def _normalize(value):
+    """Casefold a text field and collapse its whitespace"""
+    return " ".join(str(value).split()).casefold() if value else ""
+
+def task_fingerprint(task):
+    """
+    Hash the content of a task
+    
+    Title, description, category, due date and tags are normalized (case,
+    whitespace, tag order), so the same task exported and imported again
+    gets the same fingerprint; id, status, priority and timestamps are
+    not part of it.
+    
+    Returns:
+        16-byte digest
+    """
+    tags = task.get("tags")
+    tags = sorted({_normalize(tag) for tag in tags}) if isinstance(tags, (list, tuple)) else []
+    parts = (_normalize(task.get("title")), _normalize(task.get("description")),
+             _normalize(task.get("category")), str(task.get("due_date") or ""), *tags)
+    return hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=16).digest()
+
+def _merged_fields(task, item):
+    """Fields to change so a task also carries what a duplicate of it adds"""
+    fields = {}
+    if item.get("done") and not task["done"]:
+        fields["done"] = True
+    for key in ("description", "category", "due_date"):
+        if item.get(key) and not task.get(key):
+            fields[key] = item[key]
+    tags = task.get("tags", [])
+    present = {_normalize(tag) for tag in tags}
+    new_tags = [tag for tag in item.get("tags") or [] if _normalize(tag) not in present]
+    if new_tags and isinstance(tags, list):
+        fields["tags"] = tags + new_tags
+    return fields
+
+def _replaced_fields(task, item):
+    """Fields to change so a task takes the values of a duplicate of it"""
+    fields = {key: item[key] for key in TASK_FIELDS
+              if key in item and key not in ["id", "created_at", "updated_at"] and item[key] != task.get(key)}
+    if isinstance(fields.get("tags"), list):
+        fields["tags"] = list(fields["tags"])
+    return fields
+
+def merge_tasks(task_list, items, on_duplicate="skip"):
+    """
+    Import tasks, recognizing ones that are already in the list
+    
+    An imported task is a duplicate if a task with its id exists, or one
+    with the same content fingerprint (see task_fingerprint) - including a
+    task added earlier in the same import. Fingerprints are kept in a hash
+    set, so an import costs O(existing + imported) and importing the same
+    export twice changes nothing.
+    
+    Args:
+        task_list: List of existing tasks or TaskStore
+        items: Iterable of task dicts (e.g. the "tasks" of an export)
+        on_duplicate: "skip" ignores duplicates, "merge" adds what they
+            add (done status, tags, empty fields), "update" overwrites the
+            existing task with their values
+    
+    Returns:
+        Tuple (updated task list, dict with the "added" and "updated"
+        tasks and the "skipped" items)
+    
+    Raises:
+        ValueError: If on_duplicate is not a known policy
+    """
+    if on_duplicate not in DUPLICATE_POLICIES:
+        raise ValueError(f"Unknown duplicate policy: {on_duplicate}")
+    
+    is_store = isinstance(task_list, TaskStore)
+    # Keys are ids for a TaskStore and positions for a list
+    if is_store:
+        known = {task_fingerprint(task): task["id"] for task in task_list}
+    else:
+        known = {task_fingerprint(task): index for index, task in enumerate(task_list)}
+        positions = {task.get("id"): index for index, task in enumerate(task_list)}
+    
+    now = datetime.now().isoformat()
+    added = []
+    updated = {}
+    skipped = []
+    for item in items:
+        if not isinstance(item, Mapping) or not item.get("title"):
+            skipped.append(item)
+            continue
+        
+        fingerprint = task_fingerprint(item)
+        item_id = item.get("id")
+        if is_store:
+            key = item_id if item_id in task_list else known.get(fingerprint)
+        else:
+            key = positions.get(item_id) if item_id else None
+            if key is None:
+                key = known.get(fingerprint)
+        
+        if key is None:
+            if is_store:
+                key = task_list.add(item)
+                task = task_list.get(key)
+            else:
+                from core.storage import validate_task
+                task = validate_task(item)
+                key = len(task_list)
+                task_list.append(task)
+                positions[task["id"]] = key
+            known[fingerprint] = key
+            added.append(task)
+            continue
+        
+        task = _get_task(task_list, key)
+        if on_duplicate == "skip":
+            fields = {}
+        elif on_duplicate == "merge":
+            fields = _merged_fields(task, item)
+        else:
+            fields = _replaced_fields(task, item)
+        if not fields:
+            skipped.append(item)
+            continue
+        
+        fields["updated_at"] = now
+        task = _update_fields(task_list, key, fields)
+        known[task_fingerprint(task)] = key
+        updated[task["id"]] = task
+    
+    return task_list, {"added": added, "updated": list(updated.values()), "skipped": skipped}
+
 def validate_task_data(task):
     """
     Validate task data structure
@@ -340,4 +740,10 @@ def validate_task_data(task):
         except ValueError:
             return False, "Due date must be in YYYY-MM-DD format"
     
-    return True, "Valid"
\ No newline at end of file
+    return True, "Valid"
+
+metrics.instrument(globals(), ("add_task", "add_tasks", "update_task", "update_occurrence", "delete_task", "mark_done",
+                               "mark_pending", "toggle_task", "duplicate_task", "clear_completed_tasks",
+                               "filter_tasks", "sort_tasks", "search_tasks", "get_categories",
+                               "get_tasks_by_category", "get_category_counts", "get_tag_counts", "update_where",
+                               "mark_done_where", "delete_where", "merge_tasks", "validate_task_data"), "tasks")
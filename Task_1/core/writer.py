@@ -0,0 +1,148 @@
+import atexit
+import threading
+import time
+
+# Seconds without further changes before pending changes are written
+SAVE_DELAY = 1.0
+
+class WriteBehindSaver:
+    """
+    Coalesce many task-list changes into one write
+
+    mark_dirty() only records the change and (re)starts a debounce timer;
+    the save function runs once the list has been quiet for `delay`
+    seconds, on flush(), or at interpreter exit.
+
+    The write may run on the timer thread while the caller goes on
+    changing its tasks, so with a `copy` function the saver writes its own
+    copies instead of the live tasks. The copies are kept between writes
+    and mark_dirty() only copies the tasks it is told changed, so a change
+    costs O(changed tasks) on the caller's thread.
+    """
+
+    def __init__(self, save, delay=SAVE_DELAY, copy=None):
+        """
+        Args:
+            save: Function taking the task list and returning True on success
+            delay: Debounce interval in seconds
+            copy: Function returning an independent copy of one task
+                (default: write the caller's task list itself)
+        """
+        self._save = save
+        self._copy = copy
+        self.delay = delay
+        # _lock guards the pending state, _write_lock keeps writes in order
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._pending = None
+        self._dirty = False
+        self._generation = 0
+        self._source = None
+        self._copies = None
+        self._timer = None
+        self._last_change = 0.0
+        atexit.register(self.flush)
+
+    @property
+    def dirty(self):
+        """True while changes are waiting to be written"""
+        return self._dirty
+
+    def mark_dirty(self, tasks, changed=None, removed=()):
+        """
+        Record that tasks changed and schedule a write
+
+        Args:
+            tasks: Full task list (or TaskStore) after the change
+            changed: Ids of the added or updated tasks, or None if not
+                known (every task is copied again)
+            removed: Ids of the deleted tasks
+        """
+        with self._lock:
+            if self._copy is None:
+                self._pending = tasks
+            else:
+                self._update_copies(tasks, changed, removed)
+            self._dirty = True
+            self._last_change = time.monotonic()
+            if self._timer is None:
+                self._start_timer(self.delay)
+
+    def _update_copies(self, tasks, changed, removed):
+        """Bring the copies up to date with tasks (lock held)"""
+        # Only a TaskStore looks tasks up by id; plain lists are copied whole
+        get = getattr(tasks, "get", None)
+        if self._copies is None or tasks is not self._source or changed is None or get is None:
+            if get is None:
+                self._copies = dict(enumerate(self._copy(task) for task in tasks))
+            else:
+                self._copies = {task["id"]: self._copy(task) for task in tasks}
+            self._source = tasks
+            return
+        for task_id in removed:
+            self._copies.pop(task_id, None)
+        for task_id in changed:
+            task = get(task_id)
+            if task is not None:
+                self._copies[task_id] = self._copy(task)
+
+    def _start_timer(self, delay):
+        """Start the debounce timer (lock held)"""
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        """Write once no change arrived for a full interval, else wait again"""
+        with self._lock:
+            self._timer = None
+            remaining = self._last_change + self.delay - time.monotonic()
+            if remaining > 0:
+                self._start_timer(remaining)
+                return
+        self.flush()
+
+    def flush(self):
+        """
+        Write pending changes now
+
+        Returns:
+            True if nothing was pending or the write succeeded
+        """
+        with self._write_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return True
+                if self._copy is None:
+                    tasks, self._pending = self._pending, None
+                else:
+                    tasks = [task for task in self._copies.values() if task is not None]
+                self._dirty = False
+                generation = self._generation
+
+            # Changes marked from here on are written by the next flush
+            if self._save(tasks):
+                return True
+            with self._lock:
+                # Keep the changes so the next flush retries them, unless
+                # a newer full save made them obsolete
+                if generation == self._generation:
+                    if self._copy is None and self._pending is None:
+                        self._pending = tasks
+                    self._dirty = True
+            return False
+
+    def discard(self):
+        """Drop pending changes, e.g. after a newer full save"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._pending = None
+            self._dirty = False
+            self._generation += 1
+            self._source = None
+            self._copies = None
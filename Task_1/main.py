@@ -36,9 +36,10 @@ def get_app_statistics():
     """Display application statistics"""
     try:
         from core import storage
-        tasks = storage.load_tasks()
-        total_tasks = len(tasks)
-        completed = len([t for t in tasks if t["done"]])
+        # Computed without materializing the task list
+        stats = storage.get_stored_statistics()
+        total_tasks = stats["total"]
+        completed = stats["completed"]
         
         print("\n📊 Application Statistics:")
         print(f"   • Total tasks in database: {total_tasks}")
@@ -88,29 +89,36 @@ def check_data_health():
     """Check the health of the data file"""
     try:
         from core import storage
-        tasks = storage.load_tasks()
         
-        if not tasks:
-            print("💡 Tip: No tasks found. Start by adding some tasks!")
-            return True
-            
-        # Check for tasks without titles
-        invalid_tasks = [t for t in tasks if not t.get("title") or not t["title"].strip()]
-        if invalid_tasks:
-            print("⚠️  Warning: Found tasks with empty titles")
-            
-        # Check for overdue tasks
+        # Single streaming pass over the stored tasks
         from datetime import datetime
+        total = 0
+        invalid_tasks = 0
         overdue = 0
-        for task in tasks:
+        now = datetime.now()
+        for task in storage.iter_tasks():
+            total += 1
+            
+            # Check for tasks without titles
+            if not task.get("title") or not task["title"].strip():
+                invalid_tasks += 1
+            
+            # Check for overdue tasks
             if task.get("due_date") and not task["done"]:
                 try:
                     due = datetime.strptime(task["due_date"], "%Y-%m-%d")
-                    if due < datetime.now():
+                    if due < now:
                         overdue += 1
                 except:
                     pass
         
+        if not total:
+            print("💡 Tip: No tasks found. Start by adding some tasks!")
+            return True
+            
+        if invalid_tasks:
+            print("⚠️  Warning: Found tasks with empty titles")
+            
         if overdue > 0:
             print(f"⏰ You have {overdue} overdue task(s)!")
             
@@ -122,21 +130,15 @@ def check_data_health():
 def backup_data():
     """Create a backup of the data file"""
     try:
-        from core import storage
-        import shutil
-        import time
+        from core import storage, backup
         
-        data_file = "data/todo.json"
-        if os.path.exists(data_file):
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            backup_file = f"data/backup/todo_backup_{timestamp}.json"
-            
-            # Create backup directory if it doesn't exist
-            os.makedirs("data/backup", exist_ok=True)
-            
-            shutil.copy2(data_file, backup_file)
-            print(f"✅ Backup created: {backup_file}")
-            return True
+        tasks = storage.load_tasks()
+        snapshot_id = backup.snapshot(tasks)
+        if snapshot_id:
+            print(f"✅ Backup created: {snapshot_id[:12]} ({len(tasks)} tasks)")
+        else:
+            print("✅ No changes since the last backup")
+        return True
     except Exception as e:
         print(f"❌ Backup failed: {e}")
         return False
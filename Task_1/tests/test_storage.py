@@ -0,0 +1,508 @@
+# test_storage.py
+import json
+import pytest
+
+from datetime import date, datetime, timedelta
+
+from core import backup, columnar, journal, storage, tasks
+from core.store import TaskStore
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(storage, "FILE_PATH", str(tmp_path / "todo.json"))
+    monkeypatch.setattr(storage, "JOURNAL_PATH", str(tmp_path / "todo.journal"))
+    monkeypatch.setattr(storage, "BACKUP_DIR", str(tmp_path / "backup"))
+    monkeypatch.setattr(storage, "COLUMNAR_PATH", str(tmp_path / "todo.col"))
+    monkeypatch.setattr(journal, "_seq", None)
+    monkeypatch.setattr(journal, "_compacted_seq", 0)
+    return tmp_path
+
+
+@pytest.fixture
+def journal_backend(data_dir, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", "journal")
+    return data_dir
+
+
+def test_save_and_load_roundtrip(data_dir):
+    task_list = tasks.add_task([], "Write report", category="work", tags="a, b")
+    assert storage.save_tasks(task_list)
+    loaded = storage.load_tasks()
+    assert loaded[0]["title"] == "Write report"
+    assert loaded[0]["tags"] == ["a", "b"]
+
+
+def test_journal_replays_changes(journal_backend):
+    task_list = []
+    for title in ["one", "two", "three"]:
+        task_list = tasks.add_task(task_list, title)
+        storage.save_change(task_list, "add", data=task_list[-1:])
+
+    task_list = tasks.toggle_task(task_list, 1)
+    storage.save_change(task_list, "update", 1, {"done": True})
+    task_list = tasks.delete_task(task_list, 0)
+    storage.save_change(task_list, "delete", 0)
+
+    assert not (journal_backend / "todo.json").exists()
+    loaded = storage.load_tasks()
+    assert [t["title"] for t in loaded] == ["two", "three"]
+    assert loaded[0]["done"] is True
+
+
+@pytest.mark.parametrize("backend", ["journal_backend", "sqlite_backend"])
+def test_batch_changes_are_saved_together(request, backend):
+    request.getfixturevalue(backend)
+    store = TaskStore()
+    store, added = tasks.add_tasks(store, [{"title": f"task {i}", "category": "work" if i % 2 else "home"}
+                                           for i in range(6)])
+    assert storage.save_batch(store, "add", added)
+    store, updated = tasks.update_where(store, lambda t: t["category"] == "work", priority="high")
+    assert storage.save_batch(store, "update", updated, ["priority"])
+    store, done = tasks.mark_done_where(store, [added[0]["id"], added[1]["id"]])
+    assert storage.save_batch(store, "update", done, ["done"])
+    store, deleted = tasks.delete_where(store, lambda t: t["title"] == "task 5")
+    assert storage.save_batch(store, "delete", deleted)
+
+    loaded = storage.load_tasks()
+    assert [(t["title"], t["priority"], t["done"]) for t in loaded] == \
+        [(t["title"], t["priority"], t["done"]) for t in store]
+    assert [t["id"] for t in loaded] == store.ids()
+
+
+def test_journal_saves_ids_given_to_a_snapshot_without_them(journal_backend):
+    (journal_backend / "todo.json").write_text(json.dumps([{"title": "one"}, {"title": "two"}]))
+    task_list = storage.load_tasks()
+    storage.save_change(task_list, "update", data={"done": True}, task_id=task_list[0]["id"])
+    storage.save_change(task_list, "delete", task_id=task_list[1]["id"])
+
+    loaded = storage.load_tasks()
+    assert [(t["title"], t["done"]) for t in loaded] == [("one", True)]
+    assert loaded[0]["id"] == task_list[0]["id"]
+
+
+@pytest.mark.parametrize("backend", ["journal_backend", "sqlite_backend"])
+def test_undo_and_redo_save_only_the_changed_tasks(request, backend, monkeypatch):
+    from core.history import History
+    from ui.cli import save_history_changes
+
+    request.getfixturevalue(backend)
+    store, _ = tasks.add_tasks(TaskStore(), [{"title": t} for t in ("a", "b", "c")])
+    assert storage.save_tasks(store)
+    history = History(store)
+    with history.action():
+        tasks.delete_task(store, store.ids()[2])
+        tasks.update_task(store, store.ids()[0], title="A")
+        tasks.add_task(store, "d")
+    assert storage.save_tasks(store)
+
+    # No full rewrite while restored tasks go back at the end
+    full_save = storage.save_tasks
+    monkeypatch.setattr(storage, "save_tasks", None)
+    save_history_changes(store, history.undo())
+    assert [t["title"] for t in storage.load_tasks()] == [t["title"] for t in store] == ["a", "b", "c"]
+    save_history_changes(store, history.redo())
+    assert [t["title"] for t in storage.load_tasks()] == ["A", "b", "d"]
+
+    # A task restored in the middle keeps its position after a reload
+    monkeypatch.setattr(storage, "save_tasks", full_save)
+    middle = store.ids()[1]
+    with history.action():
+        tasks.delete_task(store, middle)
+    storage.save_change(store, "delete", task_id=middle)
+    save_history_changes(store, history.undo())
+    assert [t["title"] for t in storage.load_tasks()] == [t["title"] for t in store] == ["A", "b", "d"]
+
+
+def test_journal_keeps_a_corrupted_snapshot(journal_backend):
+    (journal_backend / "todo.json").write_text('[{"title": "important"')
+    assert storage.load_tasks() == []
+    backups = list(journal_backend.glob("todo.json.backup.*"))
+    assert len(backups) == 1 and "important" in backups[0].read_text()
+
+    task_list = tasks.add_task([], "new")
+    assert storage.save_tasks(task_list)
+    assert "important" in backups[0].read_text()
+    assert [t["title"] for t in storage.load_tasks()] == ["new"]
+
+
+def test_journal_compaction_keeps_later_records(journal_backend):
+    task_list = tasks.add_task([], "one")
+    storage.save_change(task_list, "add", data=task_list[-1:])
+    assert storage.save_tasks(task_list)
+    assert journal.journal_size() == 0
+
+    task_list = tasks.add_task(task_list, "two")
+    storage.save_change(task_list, "add", data=task_list[-1:])
+    assert [t["title"] for t in storage.load_tasks()] == ["one", "two"]
+
+
+def test_journal_checkpoint_skips_folded_records(journal_backend, monkeypatch):
+    task_list = tasks.add_task([], "one")
+    storage.save_change(task_list, "add", data=task_list[-1:])
+
+    # Simulate a crash after the snapshot was replaced but before the
+    # journal was trimmed
+    with monkeypatch.context() as m:
+        m.setattr(journal.os, "replace", _replace_snapshot_only(journal.os.replace))
+        assert not journal.compact(task_list)
+
+    assert (journal_backend / "todo.json").exists()
+    assert [t["title"] for t in storage.load_tasks()] == ["one"]
+
+
+def _replace_snapshot_only(replace):
+    def fake_replace(src, dst):
+        if str(dst).endswith(".journal"):
+            raise OSError("simulated crash")
+        replace(src, dst)
+    return fake_replace
+
+
+@pytest.fixture
+def sqlite_backend(data_dir, monkeypatch):
+    from core import sqlite_store
+    monkeypatch.setattr(storage, "DB_PATH", str(data_dir / "todo.db"))
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", "sqlite")
+    yield sqlite_store
+    sqlite_store.close()
+
+
+def test_sqlite_queries_run_in_database(sqlite_backend):
+    task_list = tasks.add_task([], "Buy groceries", description="milk and eggs", category="Home")
+    task_list = tasks.add_task(task_list, "Quarterly report", category="work", priority="high",
+                               due_date="2000-01-01")
+    task_list = tasks.add_task(task_list, "Dentist", due_date=date.today().isoformat())
+    assert storage.save_tasks(task_list)
+
+    assert [t["title"] for t in storage.query_tasks(None, search_term="egg")] == ["Buy groceries"]
+    assert [t["title"] for t in storage.query_tasks(None, category="home")] == ["Buy groceries"]
+    assert [t["title"] for t in storage.query_tasks(None, "overdue")] == ["Quarterly report"]
+    assert [t["title"] for t in storage.query_tasks(None, "due_week")] == ["Dentist"]
+    assert [t["title"] for t in sqlite_backend.search_tasks("work")] == ["Quarterly report"]
+    assert sqlite_backend.get_categories() == ["Home", "work"]
+
+
+def test_sqlite_changes_are_applied_in_place(sqlite_backend):
+    task_list = tasks.add_task([], "one")
+    storage.save_change(task_list, "add", data=task_list[-1:])
+    task_list = tasks.add_task(task_list, "two")
+    storage.save_change(task_list, "add", data=task_list[-1:])
+    storage.save_change(task_list, "update", 1, {"done": True, "title": "two!"})
+    storage.save_change(task_list, "delete", 0)
+
+    loaded = storage.load_tasks()
+    assert [(t["title"], t["done"]) for t in loaded] == [("two!", True)]
+    assert [t["title"] for t in storage.query_tasks(None, search_term="two")] == ["two!"]
+
+
+def test_backups_are_deduplicated(data_dir):
+    task_list = []
+    for i in range(200):
+        task_list = tasks.add_task(task_list, f"task {i}")
+        # Fixed ids and times keep the chunk boundaries deterministic
+        task_list[-1].update(id=f"id{i}", created_at="2024-01-01T00:00:00", updated_at="2024-01-01T00:00:00")
+    assert storage.save_tasks(task_list)
+    assert storage.save_tasks(task_list)
+    assert len(backup.load_manifest()) == 1
+
+    objects = _stored_objects(data_dir)
+    task_list[100]["done"] = True
+    assert storage.save_tasks(task_list)
+
+    snapshots = backup.load_manifest()
+    assert len(snapshots) == 2
+    assert len(set(snapshots[1]["chunks"]) - set(snapshots[0]["chunks"])) == 1
+    assert len(_stored_objects(data_dir)) == len(objects) + 1
+    assert backup.restore(snapshots[0]["id"])[100]["done"] is False
+    assert backup.restore()[100]["done"] is True
+
+
+def _stored_objects(data_dir):
+    return [p for p in (data_dir / "backup" / "objects").rglob("*") if p.is_file()]
+
+
+def test_backup_retention_policy():
+    now = datetime(2025, 1, 31, 12, 0)
+    snapshots = [
+        {"id": str(i), "time": (now - timedelta(minutes=20 * i)).isoformat(), "chunks": []}
+        for i in reversed(range(200))
+    ]
+    kept, pruned = backup.apply_retention(snapshots, now)
+
+    assert len(kept) + len(pruned) == 200
+    kept_ids = [int(r["id"]) for r in kept]
+    # Last 10, then one per hour for a day, then one per day
+    assert kept_ids[-10:] == list(reversed(range(10)))
+    assert len(kept) < 10 + backup.KEEP_HOURLY + 4
+
+
+def test_iter_tasks_streams_lists_and_exports(data_dir, monkeypatch):
+    monkeypatch.setattr(storage._JsonStream, "CHUNK_SIZE", 7)
+    task_list = []
+    for i in range(50):
+        task_list = tasks.add_task(task_list, f"task {i}", description="x" * i, tags=["t"])
+    assert storage.save_tasks(task_list)
+    export_file = data_dir / "export.json"
+    assert storage.export_tasks(task_list, str(export_file))
+
+    streamed = list(storage.iter_tasks())
+    assert [t["title"] for t in streamed] == [t["title"] for t in task_list]
+    assert storage.import_tasks(str(export_file)) == streamed
+
+    stats = storage.get_task_statistics(storage.iter_tasks())
+    assert stats["total"] == 50 and stats["medium_priority"] == 50
+
+
+def test_iter_tasks_rejects_truncated_file(data_dir):
+    (data_dir / "todo.json").write_text('[{"title": "a"}, {"title": ')
+    with pytest.raises(ValueError):
+        list(storage.iter_tasks())
+    assert storage.load_tasks() == []
+
+
+def test_columnar_snapshot_roundtrip_and_statistics(data_dir, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", "columnar")
+    task_list = []
+    for i in range(40):
+        task_list = tasks.add_task(task_list, f"task {i % 7}", category=["work", "home"][i % 2],
+                                   priority=["high", "medium", "low"][i % 3],
+                                   due_date="2000-01-01" if i % 4 == 0 else None, tags=["a", "b"][:i % 3])
+        if i % 5 == 0:
+            task_list = tasks.toggle_task(task_list, i)
+    # Values the columns can't encode go through the extras section
+    task_list[3]["priority"] = "urgent"
+    task_list[4]["created_at"] = "yesterday"
+    task_list[5]["due_date"] = "soon"
+    task_list[6]["done"] = 1
+
+    assert storage.save_tasks(task_list)
+    assert not (data_dir / "todo.json").exists()
+    assert storage.load_tasks() == storage.validate_tasks(task_list)
+    assert storage.get_stored_statistics() == storage.get_task_statistics(task_list)
+
+    with columnar.ColumnarSnapshot(storage.COLUMNAR_PATH) as snapshot:
+        assert len(snapshot) == 40
+        # One string per task id, shared titles/categories/tags stored once
+        assert snapshot.string_count < 40 + 15
+
+
+def test_write_behind_coalesces_changes(data_dir, monkeypatch):
+    writes = []
+    monkeypatch.setattr(storage, "_saver", None)
+    monkeypatch.setattr(storage, "_write_validated", lambda t: writes.append(len(t)) or True)
+
+    task_list = []
+    for i in range(20):
+        task_list = tasks.add_task(task_list, f"task {i}")
+        assert storage.save_change(task_list, "add", data=task_list[-1:])
+    assert writes == []
+
+    assert storage.flush()
+    assert writes == [20]
+    assert storage.flush()
+    assert writes == [20]
+
+
+def test_write_behind_writes_a_copy(data_dir, monkeypatch):
+    written = []
+    monkeypatch.setattr(storage, "_saver", None)
+    monkeypatch.setattr(storage, "_write_validated", lambda t: written.append(t) or True)
+
+    task_list = tasks.add_task([], "before", tags=["a"])
+    assert storage.save_change(task_list, "add", data=task_list)
+    # Changes after save_change (e.g. while the timer thread writes) don't leak in
+    task_list = tasks.update_task(task_list, 0, title="after")
+    task_list[0]["tags"].append("b")
+    task_list.append({"title": "later"})
+    assert storage.flush()
+    assert [(t["title"], t["tags"]) for t in written[0]] == [("before", ["a"])]
+
+
+def test_write_behind_copies_only_changed_tasks(data_dir, monkeypatch):
+    monkeypatch.setattr(storage, "_saver", None)
+    store, _ = tasks.add_tasks(TaskStore(), [{"title": f"task {i}"} for i in range(50)])
+    assert storage.save_batch(store, "add", store.to_list())
+    assert storage.flush()
+
+    copied = []
+    original_copy = storage.validate_task
+    monkeypatch.setattr(storage._saver, "_copy", lambda t: copied.append(t["id"]) or original_copy(t))
+    validated = []
+    original_validate = storage.validate_tasks
+    monkeypatch.setattr(storage, "validate_tasks", lambda t: validated.append(t) or original_validate(t))
+
+    first, last = store.ids()[0], store.ids()[-1]
+    tasks.toggle_task(store, first)
+    storage.save_change(store, "update", data={"done": True}, task_id=first)
+    tasks.delete_task(store, last)
+    storage.save_change(store, "delete", task_id=last)
+    assert copied == [first]
+    assert storage.flush() and validated == []
+
+    storage.invalidate_cache()
+    loaded = storage.load_tasks()
+    assert len(loaded) == 49 and loaded[0]["done"] is True
+
+
+def test_write_behind_debounce_timer():
+    import threading
+    from core.writer import WriteBehindSaver
+
+    written = threading.Event()
+    saver = WriteBehindSaver(lambda t: written.set() or True, delay=0.01)
+    saver.mark_dirty([])
+    assert saver.dirty
+    assert written.wait(2)
+    assert not saver.dirty
+
+
+def test_load_tasks_reuses_parsed_file(data_dir, monkeypatch):
+    task_list = tasks.add_task([], "cached")
+    assert storage.save_tasks(task_list)
+    first = storage.load_tasks()
+
+    parsed = []
+    original_validate = storage.validate_task
+    monkeypatch.setattr(storage, "validate_task", lambda t: parsed.append(t) or original_validate(t))
+
+    second = storage.load_tasks()
+    assert second == first and parsed == []
+    # Callers get their own copies
+    second[0]["title"] = "changed"
+    second[0]["tags"].append("x")
+    assert storage.load_tasks() == first
+
+    task_list = tasks.toggle_task(task_list, 0)
+    assert storage.save_tasks(task_list)
+    assert storage.load_tasks()[0]["done"] is True
+
+
+def test_parse_cache_keeps_only_recent_files(data_dir, monkeypatch):
+    monkeypatch.setattr(storage, "CACHE_MAX_FILES", 2)
+    storage.invalidate_cache()
+    paths = []
+    for i in range(4):
+        path = str(data_dir / f"import{i}.json")
+        assert storage.export_tasks(tasks.add_task([], f"task {i}"), path)
+        paths.append(path)
+
+    storage.import_tasks(paths[0])
+    storage.import_tasks(paths[1])
+    storage.import_tasks(paths[0])
+    storage.import_tasks(paths[2])
+    assert list(storage._cache) == [paths[0], paths[2]]
+    storage.import_tasks(paths[3])
+    assert list(storage._cache) == [paths[2], paths[3]]
+    storage.invalidate_cache()
+
+
+@pytest.mark.parametrize("backend", ["json", "journal", "columnar"])
+def test_recurring_tasks_persist_rule_and_overrides(data_dir, monkeypatch, backend):
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", backend)
+    store = tasks.add_task(TaskStore(), "Standup", due_date="2025-01-06", recurrence="weekly")
+    storage.save_change(store, "add", data=[store.last()])
+    task = tasks.update_occurrence(store, store.last()["id"] + "@2025-01-13", done=True)
+    storage.save_change(store, "update", data={"occurrences": task["occurrences"]}, task_id=task["id"])
+    assert storage.flush()
+
+    loaded = storage.load_tasks()
+    assert len(loaded) == 1
+    assert loaded[0]["recurrence"] == {"freq": "weekly", "interval": 1}
+    assert loaded[0]["occurrences"] == {"2025-01-13": {"done": True}}
+
+
+def test_sqlite_keeps_recurrence_and_expands_occurrences(sqlite_backend):
+    store = tasks.add_task(TaskStore(), "Standup", due_date="2025-01-06", recurrence="weekly")
+    store = tasks.add_task(store, "Pay rent", due_date="2025-01-01")
+    storage.save_change(store, "add", data=store.to_list())
+    task = tasks.update_occurrence(store, store[0]["id"] + "@2025-01-13", done=True)
+    storage.save_change(store, "update", data={"occurrences": task["occurrences"]}, task_id=task["id"])
+
+    loaded = storage.load_tasks()
+    assert loaded[0]["recurrence"] == {"freq": "weekly", "interval": 1}
+    assert loaded[0]["occurrences"] == {"2025-01-13": {"done": True}}
+    assert "recurrence" not in loaded[1]
+
+    overdue = storage.query_tasks(loaded, "overdue")
+    assert overdue == tasks.filter_tasks(loaded, "overdue")
+    assert overdue[0]["title"] == "Pay rent"
+    due_dates = [t["due_date"] for t in overdue[1:]]
+    assert due_dates[:2] == ["2025-01-06", "2025-01-20"]
+
+
+def test_analytics_from_tasks_and_snapshot(data_dir, monkeypatch):
+    pytest.importorskip("numpy")
+    from core import analytics
+
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", "columnar")
+    task_list = []
+    for i in range(6):
+        task_list = tasks.add_task(task_list, f"task {i}", category=["work", "home"][i % 2])
+        task_list[-1]["created_at"] = f"2025-01-0{i + 1}T09:00:00"
+        task_list[-1]["updated_at"] = f"2025-01-0{i + 1}T09:00:00"
+    for i in (0, 1, 2):
+        task_list[i].update(done=True, updated_at=f"2025-01-0{i + 3}T21:00:00")
+    task_list[5]["created_at"] = "not a time"
+    assert storage.save_tasks(task_list)
+
+    with columnar.ColumnarSnapshot(storage.COLUMNAR_PATH) as snapshot:
+        from_snapshot = analytics.TaskColumns.from_snapshot(snapshot)
+    for columns in (analytics.TaskColumns.from_tasks(task_list), from_snapshot,
+                    analytics.TaskColumns.from_tasks(TaskStore(task_list))):
+        assert analytics.completion_times(columns).round(1).tolist() == [2.5, 2.5, 2.5]
+        assert analytics.completion_time_histogram(columns)["2-7d"] == 3
+        assert analytics.daily_counts(columns)["completed"] == {"2025-01-03": 1, "2025-01-04": 1, "2025-01-05": 1}
+        days, open_counts = analytics.burndown(columns, end=date(2025, 1, 6))
+        assert days[0] == "2025-01-01" and len(days) == 6
+        assert open_counts["work"] == [1] * 6 and open_counts["home"] == [0, 1, 1, 1, 1, 1]
+        assert analytics.aging_buckets(columns, today=date(2025, 1, 20))["7-30d"] == 2
+
+
+def test_benchmark_suite_runs_on_a_small_list(data_dir):
+    from benchmarks.generate import make_tasks
+    from benchmarks.run import compare, run
+
+    assert make_tasks(20, seed=1) == make_tasks(20, seed=1) != make_tasks(20, seed=2)
+    assert storage.validate_tasks(make_tasks(20)) == make_tasks(20)
+
+    results = run([50], repeat=1, backends=["json", "journal"], memory=False, log=lambda line: None)
+    names = {r["operation"] for r in results}
+    assert {"list.filter.pending", "store.search.ranked", "storage.journal.load"} <= names
+    assert all(r["best"] >= 0 for r in results)
+    assert len(compare(results, {"results": results})) == len(results)
+    assert storage.DATA_DIR == str(data_dir)
+
+
+def test_metrics_time_calls_and_count_bytes(data_dir, monkeypatch):
+    from core import metrics
+
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    metrics.reset()
+    namespace = {"save_tasks": storage.save_tasks, "load_tasks": storage.load_tasks}
+    metrics.instrument(namespace, ("save_tasks", "load_tasks"), "storage")
+    try:
+        task_list = []
+        tasks.add_task(task_list, "Write report")
+        assert namespace["save_tasks"](task_list)
+        storage.invalidate_cache()
+        for _ in range(3):
+            assert len(namespace["load_tasks"]()) == 1
+
+        data = metrics.summary()
+        assert data["functions"]["storage.load_tasks"]["calls"] == 3
+        load = data["functions"]["storage.load_tasks"]
+        assert 0 <= load["p50"] <= load["p95"] <= load["p99"]
+        size = (data_dir / "todo.json").stat().st_size
+        assert data["counters"]["bytes_written"] == size
+        assert data["counters"]["bytes_read"] == size
+
+        assert metrics.write(str(data_dir / "metrics.prom"))
+        text = (data_dir / "metrics.prom").read_text()
+        assert 'todo_function_seconds_count{function="storage.save_tasks"} 1' in text
+        assert f"todo_bytes_written_total {size}" in text
+        assert metrics.write(str(data_dir / "metrics.json"))
+        assert json.loads((data_dir / "metrics.json").read_text()) == data
+    finally:
+        metrics.reset()
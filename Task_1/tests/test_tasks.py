@@ -0,0 +1,435 @@
+# test_tasks.py
+import pytest
+
+from core import tasks
+from core.store import TaskStore
+
+
+def make_store(count=5):
+    store = TaskStore()
+    for i in range(count):
+        tasks.add_task(store, f"task {i}", category="work" if i % 2 else "home")
+    return store
+
+
+def test_ids_are_stable_across_deletes():
+    store = make_store()
+    third_id = store.id_at(2)
+    tasks.delete_task(store, 0)
+    assert store.get(third_id)["title"] == "task 2"
+    assert store.id_at(1) == third_id
+
+
+def test_wrappers_accept_ids_and_positions():
+    store = make_store()
+    task_id = store.id_at(3)
+    tasks.toggle_task(store, task_id)
+    assert store.get(task_id)["done"] is True
+    tasks.mark_pending(store, 3)
+    assert store.get(task_id)["done"] is False
+    tasks.update_task(store, task_id, title="renamed", tags="a, b", id="ignored")
+    assert store.get(task_id)["title"] == "renamed"
+    assert store.get(task_id)["tags"] == ["a", "b"]
+
+
+def test_add_assigns_new_id_to_duplicates():
+    store = make_store(2)
+    copy = dict(store[0])
+    new_id = store.add(copy)
+    assert new_id != store.id_at(0)
+    assert len(store) == 3
+
+
+def test_duplicate_and_clear_completed():
+    store = make_store(3)
+    tasks.duplicate_task(store, store.id_at(0))
+    assert store.last()["title"] == "task 0 (Copy)"
+    assert store.last()["id"] != store.id_at(0)
+
+    tasks.mark_done(store, store.id_at(1))
+    tasks.clear_completed_tasks(store)
+    assert [t["title"] for t in store] == ["task 0", "task 2", "task 0 (Copy)"]
+
+
+def test_list_api_unchanged():
+    task_list = tasks.add_task([], "one")
+    task_list = tasks.add_task(task_list, "two")
+    task_list = tasks.duplicate_task(task_list, 0)
+    assert [t["title"] for t in task_list] == ["one", "one (Copy)", "two"]
+    task_list = tasks.delete_task(task_list, 1)
+    task_list = tasks.toggle_task(task_list, 1)
+    assert task_list[1]["done"] is True
+    assert [t["title"] for t in tasks.filter_tasks(make_store(), category="home")] == \
+        ["task 0", "task 2", "task 4"]
+
+
+def test_task_round_trips_validated_dicts():
+    from core import storage
+    from core.model import Task
+
+    validated = storage.validate_task({"title": "x", "due_date": "2024-02-29", "tags": ["a", "b"],
+                                       "priority": "high", "created_at": "2024-01-01T10:00:00.123456"})
+    task = Task.from_dict(validated)
+    assert task.to_dict() == validated
+    assert list(task) == list(validated)
+    assert task.priority == 2 and task.tags == ("a", "b")
+    assert storage.validate_task(task) == validated
+
+
+def test_task_keeps_values_it_cannot_encode():
+    from core.model import RAW, Task
+
+    fields = {"title": "x", "priority": "urgent", "due_date": "tomorrow", "tags": "a,b",
+              "created_at": "2024-01-01T10:00:00+02:00", "extra": 1}
+    task = Task(fields)
+    assert task.priority == RAW and task.due == RAW
+    assert {key: task[key] for key in fields} == fields
+    task["priority"] = "low"
+    assert task["priority"] == "low" and "priority" not in task._raw
+
+
+def test_store_holds_task_objects():
+    from core.model import Task
+
+    store = make_store(2)
+    assert all(isinstance(task, Task) for task in store)
+    assert store.to_dicts()[0]["title"] == "task 0"
+    tasks.update_task(store, 0, due_date="2000-01-01")
+    assert [t["title"] for t in tasks.filter_tasks(store, "overdue")] == ["task 0"]
+
+
+def test_token_index_follows_changes():
+    store = TaskStore()
+    tasks.add_task(store, "Buy milk", description="oat milk", tags=["Groceries"])
+    tasks.add_task(store, "Call mom", category="family")
+    tasks.add_task(store, "Buy stamps")
+    assert [t["title"] for t in tasks.search_tasks(store, "bu")] == ["Buy milk", "Buy stamps"]
+    assert [t["title"] for t in tasks.search_tasks(store, "oat buy")] == ["Buy milk"]
+    assert [t["title"] for t in tasks.search_tasks(store, "groc")] == ["Buy milk"]
+    # filter_tasks only searches title and description
+    assert tasks.filter_tasks(store, search_term="groc") == []
+
+    tasks.update_task(store, 0, title="Sell milk")
+    tasks.delete_task(store, 2)
+    tasks.add_task(store, "Buy bread")
+    assert [t["title"] for t in tasks.search_tasks(store, "buy")] == ["Buy bread"]
+    assert [t["title"] for t in tasks.filter_tasks(store, "pending", "MILK")] == ["Sell milk"]
+
+
+def test_store_filters_match_list_filters():
+    from datetime import date, timedelta
+
+    today = date.today()
+    store = TaskStore()
+    for i in range(30):
+        due = (today + timedelta(days=i % 11 - 4)).isoformat() if i % 3 else None
+        tasks.add_task(store, f"task {i}", category=["Work", "work", "home"][i % 3],
+                       priority=["high", "medium", "low"][i % 3], due_date=due)
+    for i in range(0, 30, 4):
+        tasks.mark_done(store, i)
+    tasks.update_task(store, 5, due_date=today.isoformat(), category="Home")
+    tasks.delete_task(store, 7)
+
+    plain = store.to_dicts()
+    for filter_type in ("all", "pending", "completed", "overdue", "due_week"):
+        for category, priority in (("", ""), ("WORK", ""), ("home", "low"), ("", "High")):
+            expected = [t["id"] for t in tasks.filter_tasks(plain, filter_type, "", category, priority)]
+            actual = [t["id"] for t in tasks.filter_tasks(store, filter_type, "", category, priority)]
+            assert actual == expected, (filter_type, category, priority)
+    assert tasks.get_categories(store) == tasks.get_categories(plain) == ["Home", "Work", "home", "work"]
+    assert tasks.get_tasks_by_category(store, "Home") == [store.get(store.id_at(5))]
+
+
+def test_query_pages_match_full_sort():
+    from core.query import Query
+
+    store = TaskStore()
+    for i in range(40):
+        tasks.add_task(store, f"task {i % 7} {i}", priority=["high", "medium", "low"][i % 3],
+                       due_date=f"2030-01-{i % 28 + 1:02d}" if i % 4 else None,
+                       tags=["x"] if i % 5 == 0 else [])
+    plain = store.to_dicts()
+    for order_by in ("created", "due_date", "priority", "title"):
+        for reverse in (False, True):
+            full = [t["id"] for t in tasks.sort_tasks(plain, order_by, reverse)]
+            for source in (store, plain):
+                page = Query(order_by=order_by, reverse=reverse, limit=5, offset=3).run(source)
+                assert [t["id"] for t in page] == full[3:8], (order_by, reverse, source is store)
+
+    query = Query(status="pending", due_from="2030-01-02", due_to="2030-01-10", tags=["X"])
+    expected = [t["id"] for t in plain if t["tags"] == ["x"] and "2030-01-02" <= (t["due_date"] or "") <= "2030-01-10"]
+    assert expected
+    assert [t["id"] for t in query.run(store)] == [t["id"] for t in query.run(plain)] == expected
+
+
+def test_sorted_views_follow_changes():
+    from core.query import sort_key
+
+    store = TaskStore()
+    for i, (title, priority) in enumerate([("b", "low"), ("a", "high"), ("c", "low"), ("d", "medium")]):
+        tasks.add_task(store, title, priority=priority, due_date=f"2030-01-0{4 - i}")
+    for sort_by in ("title", "priority", "due_date", "created"):
+        store.sorted_view(sort_by)
+
+    tasks.update_task(store, 0, title="z", priority="high")
+    tasks.delete_task(store, 1)
+    tasks.add_task(store, "e", priority="low", due_date="2030-01-01")
+    tasks.duplicate_task(store, 0)
+
+    plain = store.to_dicts()
+    for sort_by in ("title", "priority", "due_date", "created", "category"):
+        for reverse in (False, True):
+            expected = [t["id"] for t in sorted(plain, key=sort_key(sort_by), reverse=reverse)]
+            assert [t["id"] for t in tasks.sort_tasks(store, sort_by, reverse)] == expected, (sort_by, reverse)
+
+
+def test_fuzzy_search_tolerates_typos():
+    store = TaskStore()
+    tasks.add_task(store, "Quarterly report", description="send to finance")
+    tasks.add_task(store, "Buy groceries", tags=["shopping"])
+    tasks.add_task(store, "Report bug", category="work")
+    plain = store.to_dicts()
+
+    for source in (store, plain):
+        assert [t["title"] for t in tasks.search_tasks(source, "reprot", mode="fuzzy")] == \
+            ["Quarterly report", "Report bug"]
+        assert [t["title"] for t in tasks.search_tasks(source, "grocreies shoping", mode="fuzzy")] == \
+            ["Buy groceries"]
+        assert tasks.search_tasks(source, "xyz", mode="fuzzy") == []
+
+    tasks.update_task(store, 2, title="Fix crash")
+    assert [t["title"] for t in tasks.search_tasks(store, "reprot", mode="fuzzy")] == ["Quarterly report"]
+    assert [t["title"] for t in tasks.search_tasks(store, "crsh", mode="fuzzy")] == ["Fix crash"]
+
+
+def test_ranked_search_prefers_title_matches():
+    store = TaskStore()
+    tasks.add_task(store, "Call plumber", description="about the report")
+    tasks.add_task(store, "Write report", description="quarterly numbers")
+    tasks.add_task(store, "Lunch", tags=["report"])
+    tasks.add_task(store, "Report report", description="draft the report outline")
+    tasks.add_task(store, "Unrelated")
+    plain = store.to_dicts()
+
+    for source in (store, plain):
+        titles = [t["title"] for t in tasks.search_tasks(source, "report", mode="ranked")]
+        assert titles[:2] == ["Report report", "Write report"]
+        assert sorted(titles) == ["Call plumber", "Lunch", "Report report", "Write report"]
+        assert [t["title"] for t in tasks.search_tasks(source, "quarterly report", mode="ranked", limit=1)] == \
+            ["Write report"]
+
+    tasks.update_task(store, 3, title="Outline")
+    tasks.delete_task(store, 1)
+    assert sorted(t["title"] for t in tasks.search_tasks(store, "report", mode="ranked")) == \
+        ["Call plumber", "Lunch", "Outline"]
+    assert store.token_index()._total_length == sum(store.token_index()._lengths.values())
+
+
+def test_batch_mutations_share_one_timestamp():
+    store = TaskStore()
+    store, added = tasks.add_tasks(store, [{"title": "a", "tags": "x, y"}, {"title": "b"}, {"title": "c"}])
+    assert len(store) == 3 and len({t["created_at"] for t in added}) == 1
+    with pytest.raises(ValueError):
+        tasks.add_tasks(store, [{"title": "d"}, {"title": " "}])
+    assert len(store) == 3
+
+    for source in (store, store.to_dicts()):
+        source, updated = tasks.update_where(source, lambda t: t["title"] != "a", category="work", id="nope")
+        assert [t["title"] for t in updated] == ["b", "c"]
+        assert len({t["updated_at"] for t in updated}) == 1 and updated[0]["id"] != "nope"
+        source, done = tasks.mark_done_where(source, lambda t: t["category"] == "work")
+        source, done_again = tasks.mark_done_where(source, lambda t: t["category"] == "work")
+        assert len(done) == 2 and done_again == []
+        source, deleted = tasks.delete_where(source, lambda t: t["done"])
+        assert [t["title"] for t in source] == ["a"] and len(deleted) == 2
+    assert tasks.filter_tasks(store, "completed") == []
+
+
+def test_history_undoes_and_redoes_actions():
+    from core.history import History
+
+    store = TaskStore()
+    store, _ = tasks.add_tasks(store, [{"title": t, "tags": ["x"]} for t in ("a", "b", "c")])
+    history = History(store)
+    before = store.to_dicts()
+
+    with history.action():
+        tasks.update_task(store, store.ids()[0], title="A", tags=["y"])
+    with history.action():
+        tasks.delete_task(store, store.ids()[1])
+    with history.action():
+        tasks.delete_where(store, lambda t: t["title"] == "c")
+        tasks.add_task(store, "d")
+    after = store.to_dicts()
+    assert [t["title"] for t in after] == ["A", "d"]
+
+    while history.undo():
+        pass
+    assert store.to_dicts() == before
+    assert [t["title"] for t in tasks.search_tasks(store, "b")] == ["b"]
+    while history.redo():
+        pass
+    assert store.to_dicts() == after
+
+    assert history.undo() and history.can_redo()
+    with history.action():
+        tasks.toggle_task(store, store.ids()[0])
+    assert not history.can_redo()
+
+
+def test_category_and_tag_counts_follow_changes():
+    store = TaskStore()
+    for i in range(9):
+        tasks.add_task(store, f"task {i}", category=["work", "Work", ""][i % 3], tags=["a", "b", "a"][:i % 4])
+    plain = store.to_dicts()
+    assert tasks.get_category_counts(store) == tasks.get_category_counts(plain) == {"": 3, "Work": 3, "work": 3}
+    assert tasks.get_tag_counts(store) == tasks.get_tag_counts(plain) == {"a": 6, "b": 4}
+
+    tasks.update_task(store, store.ids()[0], category="home", tags=["c"])
+    tasks.delete_task(store, store.ids()[1])
+    assert tasks.get_category_counts(store) == tasks.get_category_counts(store.to_dicts())
+    assert tasks.get_tag_counts(store) == tasks.get_tag_counts(store.to_dicts())
+    assert tasks.get_categories(store) == ["Work", "home", "work"]
+
+    from core.query import Query
+
+    query = Query(tags=["A", "b"])
+    assert [t["id"] for t in query.run(store)] == [t["id"] for t in query.run(store.to_dicts())]
+
+
+def test_merge_tasks_recognizes_duplicates():
+    store = TaskStore()
+    store, _ = tasks.add_tasks(store, [{"title": "Buy milk", "tags": ["a"]}, {"title": "Call mom"}])
+    export = [dict(task) for task in store]
+    fresh = [{"title": "  buy MILK ", "tags": ["A"], "done": True}, {"title": "New"}, {"title": "new"}]
+
+    for source in (store, store.to_dicts()):
+        source, report = tasks.merge_tasks(source, export)
+        assert len(source) == 2 and len(report["skipped"]) == 2
+        source, report = tasks.merge_tasks(source, fresh, on_duplicate="merge")
+        assert [t["title"] for t in report["added"]] == ["New"] and len(report["skipped"]) == 1
+        assert [(t["title"], t["tags"], t["done"]) for t in report["updated"]] == [("Buy milk", ["a"], True)]
+        source, report = tasks.merge_tasks(source, export, on_duplicate="update")
+        assert [t["done"] for t in report["updated"]] == [False]
+        assert [t["title"] for t in source] == ["Buy milk", "Call mom", "New"]
+    with pytest.raises(ValueError):
+        tasks.merge_tasks(store, [], on_duplicate="replace")
+
+
+def test_merge_tasks_validates_imported_items():
+    task_list, report = tasks.merge_tasks([], [{"title": "x", "tags": "oops"}])
+    assert report["added"] == task_list
+    assert task_list[0]["done"] is False and task_list[0]["tags"] == [] and task_list[0]["id"]
+    assert tasks.filter_tasks(task_list, "pending") == task_list
+
+
+def test_store_finds_imported_integer_ids_by_id():
+    store, _ = tasks.add_tasks(TaskStore(), [{"title": "a"}, {"title": "b"}])
+    store, _ = tasks.merge_tasks(store, [{"id": 1, "title": "c"}])
+    store, report = tasks.merge_tasks(store, [{"id": 1, "title": "c", "done": True}], on_duplicate="merge")
+    assert [(t["title"], t["done"]) for t in store] == [("a", False), ("b", False), ("c", True)]
+    assert store.resolve(1) == 1 and store.resolve(0) == store.id_at(0)
+
+
+def test_due_date_index_handles_mixed_id_types():
+    store = tasks.add_task(TaskStore(), "mine", due_date="2020-01-01")
+    assert len(tasks.filter_tasks(store, "overdue")) == 1
+    store, _ = tasks.merge_tasks(store, [{"id": 1, "title": "x", "due_date": "2020-01-01"},
+                                         {"id": 2, "title": "y", "due_date": "2020-01-01"}])
+    assert [t["title"] for t in tasks.filter_tasks(store, "overdue")] == ["mine", "x", "y"]
+    tasks.update_task(store, 1, title="x2")
+    tasks.delete_task(store, 2)
+    assert [t["title"] for t in tasks.filter_tasks(store, "overdue")] == ["mine", "x2"]
+
+
+def test_task_tags_refuse_in_place_changes():
+    from core.model import Task
+
+    task = Task({"title": "x", "tags": ["a"]})
+    with pytest.raises(TypeError):
+        task["tags"].append("b")
+    task["tags"] = task["tags"] + ["b"]
+    assert task["tags"] == ["a", "b"]
+    plain = task.to_dict()
+    plain["tags"].append("c")
+    assert task["tags"] == ["a", "b"] and type(plain["tags"]) is list
+
+
+def test_recurring_tasks_expand_lazily():
+    from datetime import date, timedelta
+    from core.recurrence import iter_dates, make_rule
+
+    assert list(iter_dates(make_rule("monthly", until="2025-05-31"), date(2025, 1, 31))) == \
+        [date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30), date(2025, 5, 31)]
+    weekly = make_rule("weekly", interval=2, weekdays=[0, 3], count=3)
+    assert list(iter_dates(weekly, date(2025, 1, 2))) == [date(2025, 1, 2), date(2025, 1, 13), date(2025, 1, 16)]
+    with pytest.raises(ValueError):
+        make_rule("hourly")
+
+    today = date.today()
+    for source in (TaskStore(), []):
+        source = tasks.add_task(source, "Water plants", due_date=(today - timedelta(days=3)).isoformat(),
+                                recurrence="daily")
+        source = tasks.add_task(source, "One-off", due_date=(today - timedelta(days=1)).isoformat())
+        assert len(source) == 2
+        overdue = tasks.filter_tasks(source, "overdue")
+        assert [t["title"] for t in overdue] == ["One-off"] + ["Water plants"] * 3
+        series = tasks.update_occurrence(source, overdue[1]["id"], done=True)
+        assert list(series["occurrences"]) == [(today - timedelta(days=3)).isoformat()]
+        assert len(tasks.filter_tasks(source, "overdue")) == 3
+        assert len(tasks.filter_tasks(source, "due_week")) == 7
+
+
+def test_store_sends_change_events():
+    from core.events import REMOVED
+
+    store = tasks.add_task(TaskStore(), "a")
+    events = []
+    store.subscribe(events.append)
+    removals = store.subscribe(lambda event: events.append("removed"), kinds=[REMOVED])
+
+    tasks.add_task(store, "b", category="work")
+    task_id = store.last()["id"]
+    tasks.update_task(store, task_id, title="B", category="work")
+    tasks.update_occurrence(store, task_id + "@2025-01-01", done=True)
+    tasks.delete_task(store, task_id)
+    store.unsubscribe(removals)
+    tasks.delete_task(store, store.ids()[0])
+
+    assert [getattr(event, "kind", event) for event in events] == \
+        ["added", "updated", "updated", "removed", "removed", "removed"]
+    assert set(events[1].changes) == {"title", "updated_at"} and events[1].changes["title"] == ("b", "B")
+    assert events[2].changes["occurrences"][0] is None
+    assert events[3].task["title"] == "B" and events[3].rank == 1
+
+
+def test_statistics_follow_changes():
+    from datetime import date, timedelta
+    from core import storage
+
+    today = date.today()
+    store = TaskStore()
+    stats = store.statistics()
+    for i in range(30):
+        tasks.add_task(store, f"task {i}", priority=["high", "medium", "low"][i % 3],
+                       due_date=(today + timedelta(days=i % 7 - 3)).isoformat() if i % 2 else None)
+    ids = store.ids()
+    tasks.mark_done_where(store, ids[:5])
+    tasks.update_where(store, ids[10:20], due_date=(today - timedelta(days=1)).isoformat(), priority="high")
+    tasks.update_task(store, ids[11], due_date=None)
+    tasks.delete_where(store, ids[25:])
+    tasks.toggle_task(store, ids[0])
+
+    assert stats.snapshot() == storage.get_task_statistics(store)
+    assert stats.overdue(today.toordinal() + 10) == len(store.field_index().pending & {
+        t["id"] for t in store if t["due_date"]})
+    assert stats.verify()
+    stats.total += 1
+    assert not stats.verify() and stats.verify()
+
+    # Imported tasks may keep integer ids next to uuid strings
+    due = (today - timedelta(days=1)).isoformat()
+    for i in range(1, 21):
+        tasks.add_task(store, f"mine {i}", due_date=due)
+        tasks.merge_tasks(store, [{"id": i, "title": f"imported {i}", "due_date": due}])
+    assert stats.snapshot() == storage.get_task_statistics(store)
@@ -1,25 +1,31 @@
 from core import tasks, storage
+from core.history import History
+from core.model import due_ordinal
+from core.recurrence import FREQUENCIES, next_pending
+from core.store import TaskStore
 from datetime import datetime, timedelta
 import json
 import os
 
 def show_tasks(task_list, filter_type="all", search_term=""):
-    filtered_tasks = tasks.filter_tasks(task_list, filter_type, search_term)
+    filtered_tasks = storage.query_tasks(task_list, filter_type, search_term)
     
     if not filtered_tasks:
         print("\n✅ No tasks found!\n")
-        return
+        return []
     
     print(f"\n📌 Your To-Do List ({filter_type} tasks):")
+    today = datetime.now().date().toordinal()
     for i, task in enumerate(filtered_tasks, start=1):
         status = "✔" if task["done"] else "❌"
         priority_icons = {"high": "🔴", "medium": "🟡", "low": "🟢"}
         priority_icon = priority_icons.get(task.get("priority", "medium"), "⚪")
         
         due_info = ""
-        if task.get("due_date"):
-            due_date = datetime.strptime(task["due_date"], "%Y-%m-%d")
-            days_left = (due_date - datetime.now()).days
+        due = due_ordinal(task)
+        if due is not None:
+            # Whole days from now until midnight of the due date
+            days_left = due - today - 1
             if days_left < 0:
                 due_info = f" [OVERDUE: {-days_left}d]"
             elif days_left == 0:
@@ -27,6 +33,11 @@ def show_tasks(task_list, filter_type="all", search_term=""):
             else:
                 due_info = f" [Due: {days_left}d]"
         
+        if task.get("recurrence"):
+            due_info += f" [🔁 {task['recurrence']['freq']}]"
+        elif task.get("recurring_id"):
+            due_info += " [🔁]"
+        
         category_info = f" [{task['category']}]" if task.get("category") else ""
         tags_info = f" {''.join(['#' + tag for tag in task.get('tags', [])])}" if task.get('tags') else ""
         
@@ -34,22 +45,23 @@ def show_tasks(task_list, filter_type="all", search_term=""):
         
         if task.get('description'):
             print(f"   📝 {task['description']}")
+    
+    return filtered_tasks
 
 def show_statistics(task_list):
-    total_tasks = len(task_list)
-    completed_tasks = len([t for t in task_list if t["done"]])
-    pending_tasks = total_tasks - completed_tasks
-    
-    high_priority = len([t for t in task_list if t.get("priority") == "high" and not t["done"]])
-    overdue_tasks = len([t for t in task_list if t.get("due_date") and 
-                        datetime.strptime(t["due_date"], "%Y-%m-%d") < datetime.now() and not t["done"]])
+    if isinstance(task_list, TaskStore):
+        stats = task_list.statistics().snapshot()
+    else:
+        stats = storage.get_task_statistics(task_list)
+    total_tasks = stats["total"]
+    completed_tasks = stats["completed"]
     
     print("\n📊 Task Statistics:")
     print(f"Total tasks: {total_tasks}")
-    print(f"Completed: {completed_tasks} ({completed_tasks/total_tasks*100:.1f}%)" if total_tasks > 0 else "Completed: 0")
-    print(f"Pending: {pending_tasks}")
-    print(f"High priority pending: {high_priority}")
-    print(f"Overdue: {overdue_tasks}")
+    print(f"Completed: {completed_tasks} ({stats['completion_rate']:.1f}%)" if total_tasks > 0 else "Completed: 0")
+    print(f"Pending: {stats['pending']}")
+    print(f"High priority pending: {stats['high_priority']}")
+    print(f"Overdue: {stats['overdue']}")
 
 def input_priority():
     while True:
@@ -89,7 +101,7 @@ def export_tasks(task_list, filename="tasks_export.json"):
     export_data = {
         "export_date": datetime.now().isoformat(),
         "total_tasks": len(task_list),
-        "tasks": task_list
+        "tasks": [dict(task) for task in task_list]
     }
     
     with open(filename, 'w') as f:
@@ -118,15 +130,30 @@ def import_tasks():
         return []
 
 def show_categories(task_list):
-    categories = set(task.get("category", "Uncategorized") for task in task_list)
     print("\n📂 Categories:")
-    for i, category in enumerate(sorted(categories), 1):
-        count = len([t for t in task_list if t.get("category", "Uncategorized") == category])
-        print(f"{i}. {category} ({count} tasks)")
+    for i, (category, count) in enumerate(tasks.get_category_counts(task_list).items(), 1):
+        print(f"{i}. {category or 'Uncategorized'} ({count} tasks)")
+    
+    tag_counts = tasks.get_tag_counts(task_list)
+    if tag_counts:
+        print("🏷️ Tags: " + ", ".join(f"#{tag} ({count})" for tag, count in tag_counts.items()))
+
+def save_history_changes(task_list, changes):
+    """Save only the tasks an undo or redo changed"""
+    if any(op == "restore" for op, _, _ in changes):
+        # The backends only append added tasks; a task restored to its
+        # former position needs the list saved in its new order
+        storage.save_tasks(task_list)
+        return
+    for op, task_id, data in changes:
+        if op == "add":
+            storage.save_change(task_list, "add", data=data)
+        else:
+            storage.save_change(task_list, op, data=data, task_id=task_id)
 
 def run_cli():
-    task_list = storage.load_tasks()
-    history = []  # For undo functionality
+    task_list = TaskStore(storage.load_tasks())
+    history = History(task_list)  # For undo/redo
 
     while True:
         print("\n" + "="*50)
@@ -143,9 +170,10 @@ def run_cli():
         print("9. 💾 Export tasks")
         print("10. 📥 Import tasks")
         print("11. ↩️ Undo last action")
-        print("12. 🚪 Exit")
+        print("12. ↪️ Redo last undone action")
+        print("13. 🚪 Exit")
 
-        choice = input("\nChoose option (1-12): ").strip()
+        choice = input("\nChoose option (1-13): ").strip()
 
         if choice == "1":
             print("\n🔍 View Options:")
@@ -154,9 +182,11 @@ def run_cli():
             print("c. Completed tasks")
             print("d. High priority tasks")
             print("e. Overdue tasks")
+            print("f. Due this week")
             view_choice = input("Choose view option: ").lower()
             
-            filters = {"a": "all", "b": "pending", "c": "completed", "d": "high", "e": "overdue"}
+            filters = {"a": "all", "b": "pending", "c": "completed", "d": "high", "e": "overdue",
+                       "f": "due_week"}
             filter_type = filters.get(view_choice, "all")
             
             search_term = ""
@@ -166,11 +196,6 @@ def run_cli():
             show_tasks(task_list, filter_type, search_term)
 
         elif choice == "2":
-            # Save state for undo
-            history.append(task_list.copy())
-            if len(history) > 10:  # Keep only last 10 actions
-                history.pop(0)
-                
             title = input("Enter task title: ").strip()
             if not title:
                 print("❌ Title cannot be empty!")
@@ -181,24 +206,37 @@ def run_cli():
             priority = input_priority()
             due_date = input_due_date()
             tags = input_tags()
+            recurrence = input("Repeat (daily/weekly/monthly/yearly) [no]: ").lower().strip()
+            if recurrence not in FREQUENCIES:
+                recurrence = None
 
-            task_list = tasks.add_task(task_list, title, description, category, priority, due_date, tags)
-            storage.save_tasks(task_list)
+            with history.action():
+                task_list = tasks.add_task(task_list, title, description, category, priority, due_date, tags,
+                                           recurrence)
+            storage.save_change(task_list, "add", data=[task_list.last()])
             print("✅ Task added successfully!")
 
         elif choice == "3":
-            show_tasks(task_list)
+            shown = show_tasks(task_list)
             try:
                 num = int(input("Enter task number to toggle: ")) - 1
-                if 0 <= num < len(task_list):
-                    # Save state for undo
-                    history.append(task_list.copy())
-                    if len(history) > 10:
-                        history.pop(0)
-                        
-                    task_list = tasks.toggle_task(task_list, num)
-                    storage.save_tasks(task_list)
-                    status = "done" if task_list[num]["done"] else "pending"
+                if 0 <= num < len(shown):
+                    task_id = shown[num]["id"]
+                    occurrence = next_pending(shown[num]) if shown[num].get("recurrence") else None
+                    if occurrence is not None:
+                        # Complete the next pending occurrence; the series goes on
+                        with history.action():
+                            task = tasks.update_occurrence(task_list, occurrence["id"], done=True)
+                        changed = {"occurrences": task["occurrences"], "updated_at": task["updated_at"]}
+                        storage.save_change(task_list, "update", data=changed, task_id=task_id)
+                        print(f"✅ Occurrence due {occurrence['due_date']} marked as done!")
+                        continue
+                    with history.action():
+                        task_list = tasks.toggle_task(task_list, task_id)
+                    task = task_list.get(task_id)
+                    changed = {"done": task["done"], "updated_at": task["updated_at"]}
+                    storage.save_change(task_list, "update", data=changed, task_id=task_id)
+                    status = "done" if task["done"] else "pending"
                     print(f"✅ Task marked as {status}!")
                 else:
                     print("❌ Invalid task number!")
@@ -206,17 +244,14 @@ def run_cli():
                 print("❌ Invalid input!")
 
         elif choice == "4":
-            show_tasks(task_list)
+            shown = show_tasks(task_list)
             try:
                 num = int(input("Enter task number to delete: ")) - 1
-                if 0 <= num < len(task_list):
-                    # Save state for undo
-                    history.append(task_list.copy())
-                    if len(history) > 10:
-                        history.pop(0)
-                        
-                    task_list = tasks.delete_task(task_list, num)
-                    storage.save_tasks(task_list)
+                if 0 <= num < len(shown):
+                    task_id = shown[num]["id"]
+                    with history.action():
+                        task_list = tasks.delete_task(task_list, task_id)
+                    storage.save_change(task_list, "delete", task_id=task_id)
                     print("🗑️ Task deleted!")
                 else:
                     print("❌ Invalid task number!")
@@ -224,38 +259,38 @@ def run_cli():
                 print("❌ Invalid input!")
 
         elif choice == "5":
-            show_tasks(task_list)
+            shown = show_tasks(task_list)
             try:
                 num = int(input("Enter task number to edit: ")) - 1
-                if 0 <= num < len(task_list):
-                    # Save state for undo
-                    history.append(task_list.copy())
-                    if len(history) > 10:
-                        history.pop(0)
-                        
-                    task = task_list[num]
+                if 0 <= num < len(shown):
+                    task_id = shown[num]["id"]
+                    task = task_list.get(task_id)
+                    changes = {}
                     print(f"Editing: {task['title']}")
                     
                     new_title = input(f"New title [{task['title']}]: ").strip()
                     if new_title:
-                        task['title'] = new_title
+                        changes['title'] = new_title
                     
                     new_desc = input(f"New description [{task.get('description', '')}]: ").strip()
-                    task['description'] = new_desc if new_desc else task.get('description', '')
+                    changes['description'] = new_desc if new_desc else task.get('description', '')
                     
                     new_category = input(f"New category [{task.get('category', '')}]: ").strip()
-                    task['category'] = new_category if new_category else task.get('category', '')
+                    changes['category'] = new_category if new_category else task.get('category', '')
                     
                     print(f"Current priority: {task.get('priority', 'medium')}")
-                    task['priority'] = input_priority()
+                    changes['priority'] = input_priority()
                     
                     print(f"Current due date: {task.get('due_date', 'None')}")
-                    task['due_date'] = input_due_date()
+                    changes['due_date'] = input_due_date()
                     
                     print(f"Current tags: {', '.join(task.get('tags', []))}")
-                    task['tags'] = input_tags()
+                    changes['tags'] = input_tags()
                     
-                    storage.save_tasks(task_list)
+                    with history.action():
+                        task_list = tasks.update_task(task_list, task_id, **changes)
+                    changes["updated_at"] = task["updated_at"]
+                    storage.save_change(task_list, "update", data=changes, task_id=task_id)
                     print("✅ Task updated!")
                 else:
                     print("❌ Invalid task number!")
@@ -264,7 +299,13 @@ def run_cli():
 
         elif choice == "6":
             search_term = input("Enter search term: ").strip()
-            show_tasks(task_list, "all", search_term)
+            if not show_tasks(task_list, "all", search_term) and search_term:
+                # Nothing matched exactly: suggest typo-tolerant matches
+                close_matches = tasks.search_tasks(task_list, search_term, mode="fuzzy")[:10]
+                if close_matches:
+                    print("🔎 Did you mean:")
+                    for task in close_matches:
+                        print(f"   • {task['title']}")
 
         elif choice == "7":
             show_statistics(task_list)
@@ -279,26 +320,36 @@ def run_cli():
             export_tasks(task_list, filename)
 
         elif choice == "10":
-            # Save state for undo
-            history.append(task_list.copy())
-            if len(history) > 10:
-                history.pop(0)
-                
             imported_tasks = import_tasks()
             if imported_tasks:
-                task_list.extend(imported_tasks)
-                storage.save_tasks(task_list)
-                print(f"✅ Imported {len(imported_tasks)} tasks!")
+                policy = input("Existing tasks (skip/merge/update) [skip]: ").lower().strip()
+                if policy not in tasks.DUPLICATE_POLICIES:
+                    policy = "skip"
+                with history.action():
+                    task_list, report = tasks.merge_tasks(task_list, imported_tasks, policy)
+                if report["updated"]:
+                    storage.save_tasks(task_list)
+                else:
+                    storage.save_batch(task_list, "add", report["added"])
+                print(f"✅ Imported {len(report['added'])} tasks, updated {len(report['updated'])}, "
+                      f"skipped {len(report['skipped'])}!")
 
         elif choice == "11":
-            if history:
-                task_list = history.pop()
-                storage.save_tasks(task_list)
+            if history.can_undo():
+                save_history_changes(task_list, history.undo())
                 print("✅ Last action undone!")
             else:
                 print("❌ No actions to undo!")
 
         elif choice == "12":
+            if history.can_redo():
+                save_history_changes(task_list, history.redo())
+                print("✅ Action redone!")
+            else:
+                print("❌ No actions to redo!")
+
+        elif choice == "13":
+            storage.flush()
             print("👋 Goodbye! Keep being productive! 🚀")
             break
 